@@ -0,0 +1,42 @@
+"""Benchmark multi-hop HYP networks and their statistics on a synthetic pathway.
+
+Run from the repository root with ``python -m benchmarks.bench_depth``. The time should grow
+with the number of reached nodes, about tenfold per step on this pathway.
+"""
+
+import time
+
+import numpy as np
+
+from benchmarks.bench_kam import make_synthetic_pathway
+from src.neurommsig.inference import CausalInference
+from src.neurommsig.kam import DirectedKAM
+
+N_EDGES = 200000
+DEPTHS = (1, 2, 3)
+
+
+def main():
+    """Time the expansion and the statistics of HYP networks of each depth."""
+    # load the statistics dependencies, imported on first use, before timing
+    import scipy.special  # noqa: F401
+    import scipy.stats  # noqa: F401
+
+    kam = DirectedKAM.from_pathway(make_synthetic_pathway(N_EDGES))
+    states = np.random.default_rng(0).choice([-1, 0, 0, 1], len(kam.nodes))
+    print(f"{len(kam.nodes)} nodes, {len(kam.indices)} directed edges")
+    print(f"{'depth':>8} {'edges':>12} {'expand s':>10} {'stats s':>10}")
+    for depth in DEPTHS:
+        start = time.perf_counter()
+        expanded = kam.expand(depth)
+        expand = time.perf_counter() - start
+        start = time.perf_counter()
+        inference = CausalInference.from_kam(expanded, states)
+        inference.get_concordance()
+        inference.get_richness()
+        stats = time.perf_counter() - start
+        print(f"{depth:>8} {len(expanded.indices):>12} {expand:>10.2f} {stats:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark the directed KAM arrays against a networkx multigraph of the same pathway.
+
+Run from the repository root with ``python -m benchmarks.bench_directed``. The arrays should
+take several times less memory than the graph, and breadth-first traversal over them should be
+faster than networkx. Scoring directed HYP networks, which hold each edge once, should take about
+half the time of scoring the undirected ones, which hold it from both ends.
+"""
+
+import time
+import tracemalloc
+
+import networkx as nx
+import numpy as np
+
+from benchmarks.bench_kam import make_synthetic_pathway
+from src.neurommsig.inference import CausalInference
+from src.neurommsig.kam import KAM, DirectedKAM, csr_positions
+
+SIZES = (10**4, 10**5, 10**6)
+N_SOURCES = 20
+
+
+def retained_memory(build) -> tuple:
+    """Return the result of a build function and the memory it retains, in MiB."""
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current / 2**20
+
+
+def bfs_csr(kam: DirectedKAM, source: int) -> int:
+    """Count the nodes reachable from a node, expanding whole frontiers at once."""
+    seen = np.zeros(len(kam.nodes), dtype=bool)
+    seen[source] = True
+    frontier = np.array([source])
+    while len(frontier):
+        targets = np.unique(kam.indices[csr_positions(kam.indptr, frontier)])
+        frontier = targets[~seen[targets]]
+        seen[frontier] = True
+    return int(seen.sum())
+
+
+def score_seconds(kam: KAM, states: np.ndarray) -> float:
+    """Return the seconds taken to score all HYP networks of a KAM network."""
+    start = time.perf_counter()
+    inference = CausalInference.from_kam(kam, states)
+    inference.get_concordance()
+    inference.get_richness()
+    return time.perf_counter() - start
+
+
+def main():
+    """Time and measure both representations for each synthetic pathway size."""
+    # load the statistics dependencies, imported on first use, before timing
+    import scipy.special  # noqa: F401
+    import scipy.stats  # noqa: F401
+
+    print(f"{'edges':>10} {'':>10} {'MiB':>10} {'bfs s':>10}")
+    for n_edges in SIZES:
+        pathway = make_synthetic_pathway(n_edges)
+        kam, kam_memory = retained_memory(lambda: DirectedKAM.from_pathway(pathway))
+        G, nx_memory = retained_memory(
+            lambda: nx.from_pandas_edgelist(
+                pathway, "source", "target", ["relation"], create_using=nx.MultiDiGraph
+            )
+        )
+        sources = np.random.default_rng(0).choice(len(kam.nodes), N_SOURCES, replace=False)
+
+        start = time.perf_counter()
+        reached = [bfs_csr(kam, source) for source in sources]
+        kam_time = time.perf_counter() - start
+        start = time.perf_counter()
+        expected = [
+            len(nx.single_source_shortest_path_length(G, kam.nodes[source])) for source in sources
+        ]
+        nx_time = time.perf_counter() - start
+        assert reached == expected
+
+        print(f"{len(pathway):>10} {'csr':>10} {kam_memory:>10.1f} {kam_time:>10.3f}")
+        print(f"{'':>10} {'networkx':>10} {nx_memory:>10.1f} {nx_time:>10.3f}")
+
+    print(f"\n{'edges':>10} {'':>10} {'HYP edges':>10} {'score s':>10}")
+    for n_edges in SIZES:
+        kam = DirectedKAM.from_pathway(make_synthetic_pathway(n_edges))
+        states = np.random.default_rng(0).choice([-1, 0, 0, 1], len(kam.nodes))
+        for name, directed in (("undirected", False), ("directed", True)):
+            hyps = kam.to_kam(directed)
+            seconds = score_seconds(hyps, states)
+            label = n_edges if not directed else ""
+            print(f"{label:>10} {name:>10} {len(hyps.indices):>10} {seconds:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
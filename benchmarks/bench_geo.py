@@ -0,0 +1,74 @@
+"""Benchmark reading large GEO top tables with and without streaming.
+
+Run from the repository root with ``python -m benchmarks.bench_geo``. The peak memory of the
+streaming reader should stay roughly constant as the number of probes grows, while reading the
+whole table grows linearly.
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from src.neurommsig.constants import GEO_FILE_COLS
+from src.neurommsig.reader import DataReader
+
+SIZES = (10**5, 10**6)
+N_ANNOTATIONS = 20
+
+
+def make_synthetic_geo_table(path: str, n_probes: int, seed: int = 0):
+    """
+    Write a random GEO top table with annotation columns.
+    :param path: output path
+    :param n_probes: number of rows
+    :param seed: random seed
+    """
+    rng = np.random.default_rng(seed)
+    table = pd.DataFrame(
+        {
+            "ID": np.arange(n_probes),
+            "adj.P.Val": rng.uniform(0, 1, n_probes),
+            "logFC": rng.normal(0, 1, n_probes),
+            "Gene.symbol": np.char.add("GENE", rng.integers(0, 20000, n_probes).astype(str)),
+            **{f"annotation{i}": "probe annotation text" for i in range(N_ANNOTATIONS)},
+        }
+    )
+    table.to_csv(path, sep="\t", index=False)
+
+
+def read_full(path: str) -> pd.DataFrame:
+    """Read the whole table, then select the columns."""
+    df = pd.read_csv(path, sep="\t")[list(GEO_FILE_COLS)]
+    df.columns = list(GEO_FILE_COLS.values())
+    return df
+
+
+def measure(read, path: str) -> tuple:
+    """Return the number of rows, seconds and peak traced memory in MiB of a read."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    n_rows = len(read(path))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return n_rows, elapsed, peak / 2**20
+
+
+def main():
+    """Compare full and streaming reads for an increasing number of probes."""
+    print(f"{'probes':>10} {'reader':>10} {'rows':>10} {'seconds':>10} {'peak MiB':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "geo.tsv")
+        for n_probes in SIZES:
+            make_synthetic_geo_table(path, n_probes)
+            for name, read in (("full", read_full), ("streaming", DataReader.read_geo_file)):
+                n_rows, elapsed, peak = measure(read, path)
+                print(f"{n_probes:>10} {name:>10} {n_rows:>10} {elapsed:>10.3f} {peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark the cold import time of the command line interface and the library.
+
+Run from the repository root with ``python -m benchmarks.bench_import``. Each module is imported
+in a fresh interpreter with ``python -X importtime``. The exit status is non-zero when a module
+exceeds its budget or pulls in a module that should only load on demand.
+"""
+
+import subprocess
+import sys
+
+N_RUNS = 5
+# module: (budget in seconds, modules that must not be imported)
+BUDGETS = {
+    "src.neurommsig.cli": (0.2, ("pandas", "numpy", "networkx", "matplotlib", "scipy")),
+    "src.neurommsig.neurommsig": (1.0, ("networkx", "matplotlib", "scipy")),
+}
+
+
+def import_time(module: str) -> tuple:
+    """
+    Import a module in a fresh interpreter.
+    :param module: module name
+    :return: cumulative import time in seconds and names of all imported modules
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # lines look like "import time: self [us] | cumulative | imported package"
+    rows = [
+        line.split("|") for line in result.stderr.splitlines() if line.startswith("import time:")
+    ]
+    imported = {name.strip() for _, _, name in rows[1:]}
+    cumulative = next(int(cum) for _, cum, name in rows[1:] if name.strip() == module)
+    return cumulative / 1e6, imported
+
+
+def main():
+    """Check the import time of each module against its budget."""
+    failed = False
+    print(f"{'module':>28} {'seconds':>8} {'budget':>8}  eager heavy modules")
+    for module, (budget, lazy) in BUDGETS.items():
+        runs = [import_time(module) for _ in range(N_RUNS)]
+        seconds = min(seconds for seconds, _ in runs)
+        eager = sorted(name for name in lazy if name in runs[0][1])
+        failed |= seconds > budget or bool(eager)
+        print(f"{module:>28} {seconds:>8.3f} {budget:>8.3f}  {', '.join(eager) or '-'}")
+    sys.exit(int(failed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark KAM construction on synthetic pathways of increasing size.
+
+Run from the repository root with ``python -m benchmarks.bench_kam``. The time per edge
+should stay roughly constant as the number of edges grows.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.neurommsig.kam import derive_kam
+
+SIZES = (10**4, 10**5, 10**6)
+RELATIONS = np.array(["activation", "inhibition"])
+
+
+def make_synthetic_pathway(n_edges: int, ambiguous_ratio: float = 0.1, seed: int = 0):
+    """
+    Generate a random merged pathway dataframe.
+    :param n_edges: number of (source, target) rows
+    :param ambiguous_ratio: fraction of rows duplicated with the opposite relation
+    :param seed: random seed
+    :return: dataframe with "source", "target" and "relation" columns
+    """
+    rng = np.random.default_rng(seed)
+    n_nodes = max(n_edges // 5, 10)
+    codes = rng.integers(0, 2, n_edges)
+    pathway = pd.DataFrame(
+        {
+            "source": np.char.add("G", rng.integers(0, n_nodes, n_edges).astype(str)),
+            "target": np.char.add("G", rng.integers(0, n_nodes, n_edges).astype(str)),
+            "relation": RELATIONS[codes],
+        }
+    ).drop_duplicates(subset=["source", "target"])
+    conflicts = pathway.sample(frac=ambiguous_ratio, random_state=seed)
+    flipped = np.where(conflicts.relation == "activation", "inhibition", "activation")
+    conflicts = conflicts.assign(relation=flipped)
+    return pd.concat([pathway, conflicts], ignore_index=True)
+
+
+def main():
+    """Time KAM construction for each synthetic pathway size."""
+    print(f"{'edges':>10} {'seconds':>10} {'us/edge':>10}")
+    for n_edges in SIZES:
+        pathway = make_synthetic_pathway(n_edges)
+        start = time.perf_counter()
+        derive_kam(pathway)
+        elapsed = time.perf_counter() - start
+        print(f"{len(pathway):>10} {elapsed:>10.3f} {elapsed / len(pathway) * 1e6:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Benchmark network layouts against networkx spring layouts.
+
+Run from the repository root with ``python -m benchmarks.bench_layout``. The grid approximation
+should scale close to linearly with the number of nodes, and a cached layout should be read back
+in milliseconds.
+"""
+
+import tempfile
+import time
+
+from benchmarks.bench_kam import make_synthetic_pathway
+from src.neurommsig import cache, layout
+from src.neurommsig.kam import KAM
+
+SIZES = (10**3, 10**4, 10**5)
+# spring layouts of larger networks take minutes
+SPRING_MAX_EDGES = 10**4
+
+
+def main():
+    """Time networkx, the layout engine and cached layouts for each synthetic pathway size."""
+    import networkx as nx
+    import scipy.signal  # noqa: F401
+
+    cache.configure(directory=tempfile.mkdtemp())
+    print(f"{'nodes':>10} {'edges':>10} {'spring s':>10} {'layout s':>10} {'cached ms':>10}")
+    for n_edges in SIZES:
+        kam = KAM.from_pathway(make_synthetic_pathway(n_edges))
+        spring = float("nan")
+        if n_edges <= SPRING_MAX_EDGES:
+            G = kam.to_networkx()
+            start = time.perf_counter()
+            nx.spring_layout(G, k=0.1, seed=0)
+            spring = time.perf_counter() - start
+        start = time.perf_counter()
+        layout.get_layout(kam)
+        elapsed = time.perf_counter() - start
+        # a new process only finds the layout in the on-disk cache
+        layout._layouts.clear()
+        start = time.perf_counter()
+        layout.get_layout(kam)
+        cached = time.perf_counter() - start
+        print(
+            f"{len(kam.nodes):>10} {len(kam.indices) // 2:>10} {spring:>10.3f} "
+            f"{elapsed:>10.3f} {cached * 1e3:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark resolving many pathways against a gene interaction map, one join per pathway and
+with one batched lookup in an edge index of the map.
+
+Run from the repository root with ``python -m benchmarks.bench_mapping``. The edge index is built
+once, after which the lookup of all pathways should take a fraction of the joins.
+"""
+
+import time
+
+import numpy as np
+
+from benchmarks.bench_kam import make_synthetic_pathway
+from src.neurommsig.mapping import EdgeIndex
+from src.neurommsig.vocabulary import SymbolVocabulary
+
+N_MAPPING = 10**6
+N_PATHWAYS = 200
+N_PATHWAY = 2000
+COLS = ["source", "target"]
+
+
+def main():
+    """Time per-pathway joins against building the edge index and one batched lookup."""
+    mapping = make_synthetic_pathway(N_MAPPING)
+    vocabulary = SymbolVocabulary()
+    ids = mapping.assign(**{col: vocabulary.encode(mapping[col]) for col in COLS})
+    pathways = [
+        ids.sample(N_PATHWAY, random_state=seed)[COLS].reset_index(drop=True)
+        for seed in range(N_PATHWAYS)
+    ]
+
+    start = time.perf_counter()
+    for pathway in pathways:
+        pathway.merge(ids, how="left", on=COLS).drop_duplicates()
+    joins = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = EdgeIndex(ids["source"], ids["target"], ids["relation"])
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    sources = np.concatenate([pathway["source"].to_numpy() for pathway in pathways])
+    targets = np.concatenate([pathway["target"].to_numpy() for pathway in pathways])
+    rows, relations = index.lookup(sources, targets)
+    bounds = np.searchsorted(rows, np.arange(0, len(sources) + 1, N_PATHWAY))
+    parts = [relations[bounds[i] : bounds[i + 1]] for i in range(N_PATHWAYS)]
+    lookup = time.perf_counter() - start
+    assert len(parts) == N_PATHWAYS
+
+    print(f"{len(mapping)} interactions, {N_PATHWAYS} pathways of {N_PATHWAY} rows")
+    print(f"{'joins':>12} {joins:>10.3f} s")
+    print(f"{'index build':>12} {built:>10.3f} s")
+    print(f"{'lookup':>12} {lookup:>10.3f} s")
+
+
+if __name__ == "__main__":
+    main()
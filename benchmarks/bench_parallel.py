@@ -0,0 +1,62 @@
+"""Benchmark parallel scoring of many pathways and contrasts.
+
+Run from the repository root with ``python -m benchmarks.bench_parallel``. The speedup over a
+single worker should grow close to linearly up to the number of CPUs.
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_kam import make_synthetic_pathway
+from src.neurommsig.parallel import ParallelRCRstat
+
+N_PATHWAYS = 8
+N_EDGES = 20000
+N_CONTRASTS = 128
+
+
+def make_synthetic_gene_sets(genes: list, n_contrasts: int, seed: int = 0) -> dict:
+    """
+    Generate random differential expression tables.
+    :param genes: gene symbols
+    :param n_contrasts: number of contrasts
+    :param seed: random seed
+    :return: mapping of contrast name to gene set
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        f"contrast{i}": pd.DataFrame(
+            {
+                "gene_symbol": genes,
+                "log_fold_change": rng.normal(0, 1, len(genes)),
+                "p_value": rng.uniform(0, 0.05, len(genes)),
+            }
+        )
+        for i in range(n_contrasts)
+    }
+
+
+def main():
+    """Time parallel scoring for an increasing number of workers."""
+    pathways = {f"pathway{i}": make_synthetic_pathway(N_EDGES, seed=i) for i in range(N_PATHWAYS)}
+    genes = sorted(set().union(*(set(p.source) | set(p.target) for p in pathways.values())))
+    gene_sets = make_synthetic_gene_sets(genes, N_CONTRASTS)
+
+    n_cpus = os.cpu_count() or 1
+    workers = sorted({1, *(2**i for i in range(1, n_cpus.bit_length()) if 2**i <= n_cpus), n_cpus})
+    print(f"{'workers':>8} {'seconds':>10} {'speedup':>8}")
+    serial = None
+    for n_workers in workers:
+        runner = ParallelRCRstat(pathways, gene_sets, n_workers=n_workers, chunk_size=32)
+        start = time.perf_counter()
+        runner.get_stat()
+        elapsed = time.perf_counter() - start
+        serial = serial or elapsed
+        print(f"{n_workers:>8} {elapsed:>10.3f} {serial / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
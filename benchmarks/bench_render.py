@@ -0,0 +1,54 @@
+"""Benchmark bulk plotting of HYP networks against one figure per plot_hyp_network call.
+
+Run from the repository root with ``python -m benchmarks.bench_render``. Bulk export should keep
+memory flat, while figures opened by plot_hyp_network stay alive until pyplot closes them.
+"""
+
+import tempfile
+import time
+import tracemalloc
+
+from src.neurommsig.neurommsig import Graph
+
+
+def profile(func) -> tuple:
+    """
+    Run a plotting function.
+    :return: time in seconds and peak memory in MiB
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main():
+    """Plot every HYP network of the default pathway one by one and in bulk."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    graph = Graph()
+    genes = graph.get_all_genes()
+    directory = tempfile.mkdtemp()
+
+    def one_by_one():
+        for gene in genes:
+            graph.plot_hyp_network(gene, output=f"{directory}/{gene}.png")
+
+    print(f"{len(genes)} HYP networks")
+    print(f"{'':>10} {'seconds':>10} {'peak MiB':>10}")
+    for name, func in (
+        ("single", one_by_one),
+        ("bulk", lambda: graph.export_hyp_networks(directory)),
+        ("bulk x4", lambda: graph.export_hyp_networks(directory, n_workers=4)),
+        ("pdf", lambda: graph.export_hyp_networks(f"{directory}/hyps.pdf")),
+    ):
+        elapsed, peak = profile(func)
+        print(f"{name:>10} {elapsed:>10.3f} {peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark writing a large statistics table, row by row against column by column.
+
+Run from the repository root with ``python -m benchmarks.bench_results``. The columnar table
+should be several times faster to build and to write than a list of formatted row tuples.
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.neurommsig.results import StatTable
+
+N_GENES = 20000
+N_CONTRASTS = 50
+
+
+def main():
+    """Time building and writing the statistics of many contrasts."""
+    rng = np.random.default_rng(0)
+    n_rows = N_GENES * N_CONTRASTS
+    genes = np.char.add("G", np.arange(N_GENES).astype(str)).astype(object)
+    contrasts = [f"contrast{i}" for i in range(N_CONTRASTS)]
+    weights = rng.integers(-5, 6, n_rows)
+    concs = np.where(rng.random(n_rows) < 0.3, np.nan, rng.random(n_rows))
+    richs = rng.random(n_rows)
+    print(f"{n_rows} rows")
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        rows = [
+            (contrast, gene, weight, "{:.3f}".format(conc) if conc == conc else None, f"{rich:.2e}")
+            for contrast, gene, weight, conc, rich in zip(
+                np.repeat(contrasts, N_GENES), np.tile(genes, N_CONTRASTS), weights, concs, richs
+            )
+        ]
+        frame = pd.DataFrame(
+            rows, columns=["contrast", "gene", "weight", "concordance", "richness"]
+        )
+        frame.to_csv(os.path.join(directory, "rows.tsv"), sep="\t", index=False)
+        print(f"{'rows':>10} {time.perf_counter() - start:>10.3f} s")
+
+        for extension in (".tsv", ".parquet"):
+            start = time.perf_counter()
+            stat_table = StatTable(
+                {
+                    "contrast": pd.Categorical.from_codes(
+                        np.repeat(np.arange(N_CONTRASTS), N_GENES), categories=contrasts
+                    ),
+                    "gene": pd.Categorical.from_codes(
+                        np.tile(np.arange(N_GENES), N_CONTRASTS), categories=genes
+                    ),
+                    "weight": weights,
+                    "concordance": concs,
+                    "richness": richs,
+                }
+            )
+            try:
+                stat_table.write(os.path.join(directory, f"columns{extension}"))
+            except ImportError as e:
+                print(f"{extension:>10} skipped: {e}")
+                continue
+            print(f"{extension:>10} {time.perf_counter() - start:>10.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Benchmark scoring requests against a warm job server and against a fresh session per request.
+
+Run from the repository root with ``python -m benchmarks.bench_server``. A fresh session per
+request stands for one command line call per request, without the interpreter startup. The
+server keeps the KAM network warm and scores concurrent requests in batches, so it should serve
+many times more requests per second. Scoring and rendering throughput is then measured for
+increasing numbers of worker threads, up to the number of CPUs, to show how the server scales
+with cores.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from src.neurommsig import cache
+from src.neurommsig.config import RunConfig
+from src.neurommsig.reader import DataSession
+from src.neurommsig.server import JobServer, read_contrast, score_batch
+from src.neurommsig.utils import make_fake_geo, make_fake_mapping, make_scale_free_pathway
+
+N_EDGES = 10**5
+N_REQUESTS = 200
+P_THRED, FC_THRED = 0.01, 0.5
+# pathway rendered by the render requests, small enough to draw in well under a second
+RENDER_EDGES = 10**3
+N_RENDERS = 16
+# worker thread counts compared, capped at the number of CPUs
+WORKER_COUNTS = (1, 2, 4, 8, 16, 32)
+
+
+async def post(port: int, path: str, body: dict) -> bytes:
+    """Send a POST request to a local server and return the response."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = json.dumps(body).encode()
+    writer.write(f"POST {path} HTTP/1.1\r\nContent-Length: {len(payload)}\r\n\r\n".encode())
+    writer.write(payload)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+def make_pathway(n_edges: int, directory: str) -> tuple:
+    """Write a synthetic pathway and its mapping file, returning their paths and gene symbols."""
+    pathway_file = os.path.join(directory, f"pathway_{n_edges}.txt")
+    mapping_file = os.path.join(directory, f"mapping_{n_edges}.tsv")
+    pathway = make_scale_free_pathway(n_edges, output_path=pathway_file)
+    make_fake_mapping(pathway, output_path=mapping_file)
+    return pathway_file, mapping_file, sorted(set(pathway[0]) | set(pathway[2]))
+
+
+def measure(job_server: JobServer, requests: list) -> float:
+    """
+    Send requests concurrently to a job server, after one warm-up request of each route.
+    :param job_server: server, shut down once the requests are answered
+    :param requests: route and body of each request
+    :return: requests per second
+    """
+
+    async def serve_requests():
+        server = await job_server.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        # the first request of each route loads the KAM network and lays it out
+        for path in sorted({path for path, _ in requests}):
+            await post(port, path, next(body for route, body in requests if route == path))
+        start = time.perf_counter()
+        await asyncio.gather(*[post(port, path, body) for path, body in requests])
+        elapsed = time.perf_counter() - start
+        server.close()
+        await server.wait_closed()
+        return len(requests) / elapsed
+
+    try:
+        return asyncio.run(serve_requests())
+    finally:
+        job_server.shutdown()
+
+
+def main():
+    """Time scoring the same requests both ways, then scoring and rendering per worker count."""
+    cache.configure(enabled=False)
+    cpus = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        pathway_file, mapping_file, genes = make_pathway(N_EDGES, directory)
+        contrasts = [make_fake_geo(genes, seed=seed).to_dict(orient="records") for seed in range(8)]
+        render_file, render_mapping_file, render_genes = make_pathway(RENDER_EDGES, directory)
+        render_contrast = make_fake_geo(render_genes).to_dict(orient="records")
+
+        start = time.perf_counter()
+        for i in range(N_REQUESTS // 20):
+            kam = DataSession().get_kam(pathway_file, mapping_file)
+            score_batch(kam, {"contrast": read_contrast(contrasts[i % 8])}, P_THRED, FC_THRED)
+        fresh = (N_REQUESTS // 20) / (time.perf_counter() - start)
+
+        scores = [
+            ("/score", {"pathway": "pathway", "contrasts": {"contrast": contrasts[i % 8]}})
+            for i in range(N_REQUESTS)
+        ]
+        renders = [
+            ("/render", {"pathway": "render", "contrast": render_contrast, "dpi": 36})
+            for _ in range(N_RENDERS)
+        ]
+        results = dict()
+        for n_workers in sorted({n for n in WORKER_COUNTS if n <= cpus} | {cpus}):
+            score_server = JobServer(
+                {"pathway": pathway_file}, RunConfig(mapping_file=mapping_file), n_workers
+            )
+            render_server = JobServer(
+                {"render": render_file}, RunConfig(mapping_file=render_mapping_file), n_workers
+            )
+            results[n_workers] = (measure(score_server, scores), measure(render_server, renders))
+
+    print(f"{N_EDGES} edges, {len(genes)} genes, {cpus} CPUs")
+    print(f"{'fresh session':>14} {fresh:>10.1f} requests/s")
+    print(f"{'workers':>8} {'scores/s':>10} {'speedup':>8} {'renders/s':>10} {'speedup':>8}")
+    scored_1, rendered_1 = results[1]
+    for n_workers, (scored, rendered) in results.items():
+        print(
+            f"{n_workers:>8} {scored:>10.1f} {scored / scored_1:>7.1f}x "
+            f"{rendered:>10.2f} {rendered / rendered_1:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Benchmark file reads, time and peak memory of repeated analyses with and without a session.
+
+Run from the repository root with ``python -m benchmarks.bench_session``. With a shared session
+every file is parsed once for all analyses instead of once per analysis. The on-disk cache is
+disabled so that every read parses the source files.
+"""
+
+import time
+import tracemalloc
+
+from src.neurommsig import cache
+from src.neurommsig.neurommsig import RCRstat
+from src.neurommsig.reader import DataSession
+
+N_ANALYSES = 5
+
+
+def run(shared: bool) -> tuple:
+    """
+    Run several analyses.
+    :param shared: whether all analyses share one session
+    :return: number of file reads, seconds and peak traced memory in MiB
+    """
+    sessions = [DataSession()] if shared else [DataSession() for _ in range(N_ANALYSES)]
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(N_ANALYSES):
+        RCRstat(sessions[i % len(sessions)])
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    reads = sum(sum(session.file_reads.values()) for session in sessions)
+    return reads, elapsed, peak / 2**20
+
+
+def main():
+    """Compare analyses with a session each against analyses sharing one session."""
+    cache.configure(enabled=False)
+    print(f"{'session':>8} {'reads':>6} {'seconds':>10} {'peak MiB':>10}")
+    for shared in (False, True):
+        reads, elapsed, peak = run(shared)
+        print(f"{'shared' if shared else 'own':>8} {reads:>6} {elapsed:>10.3f} {peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
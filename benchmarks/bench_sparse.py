@@ -0,0 +1,54 @@
+"""Benchmark sparse matrix scoring of many contrasts against the inference of each edge.
+
+Run from the repository root with ``python -m benchmarks.bench_sparse``. Sparse scoring should
+need a fraction of the peak memory, since it never builds edges x contrasts arrays.
+"""
+
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.bench_kam import make_synthetic_pathway
+from src.neurommsig.inference import CausalInference, SparseInference
+from src.neurommsig.kam import KAM
+
+N_EDGES = 200000
+N_CONTRASTS = 100
+
+
+def profile(inference_class, kam: KAM, states: np.ndarray) -> tuple:
+    """
+    Score all contrasts.
+    :return: time in seconds, and peak memory in MiB of the inference and of the statistics
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    inference = inference_class.from_kam(kam, states)
+    _, inference_peak = tracemalloc.get_traced_memory()
+    inference.get_concordance()
+    inference.get_richness()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, inference_peak / 2**20, peak / 2**20
+
+
+def main():
+    """Time and measure both scorers."""
+    # load the statistics dependencies, imported on first use, before timing
+    import scipy.sparse  # noqa: F401
+    import scipy.special  # noqa: F401
+    import scipy.stats  # noqa: F401
+
+    kam = KAM.from_pathway(make_synthetic_pathway(N_EDGES))
+    states = np.random.default_rng(0).choice([-1, 0, 0, 1], (len(kam.nodes), N_CONTRASTS))
+    print(f"{len(kam.nodes)} nodes, {len(kam.indices)} edges, {N_CONTRASTS} contrasts")
+    print(f"{'':>10} {'seconds':>10} {'infer MiB':>10} {'peak MiB':>10}")
+    for name, inference_class in (("edges", CausalInference), ("sparse", SparseInference)):
+        elapsed, inference_peak, peak = profile(inference_class, kam, states)
+        print(f"{name:>10} {elapsed:>10.3f} {inference_peak:>10.1f} {peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
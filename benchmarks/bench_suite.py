@@ -0,0 +1,273 @@
+"""Benchmark every stage of an analysis on synthetic scale-free pathways of increasing size.
+
+Run from the repository root with ``python -m benchmarks.bench_suite``. Each stage is timed on
+pathways of 10^2 to 10^6 edges, taking the best of several runs, and its peak traced memory is
+measured in a separate run:
+
+- load: parse the GEO top table and join the pathway to the gene interaction map
+- kam: derive the KAM network
+- inference: run causal inference on all HYP networks
+- stats: compute concordance, richness and the statistics table
+- plot: lay out and draw the full network, on pathways of at most ``PLOT_MAX_EDGES`` edges
+
+``--save`` writes the results to ``benchmarks/baselines.json``, and ``--check`` compares them
+with the stored baselines and exits with status 1 if any stage got slower or bigger than the
+tolerance allows. Times depend on the machine, so baselines should be saved on the machine that
+checks them. ``--compare REF`` instead benchmarks the merge-base of HEAD and REF in a git worktree
+on the same machine and fails on regressions against it, which is what CI runs.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Optional
+
+from src.neurommsig import cache, layout
+from src.neurommsig.config import RunConfig
+from src.neurommsig.neurommsig import Graph
+from src.neurommsig.reader import DataSession
+from src.neurommsig.utils import make_fake_geo, make_fake_mapping, make_scale_free_pathway
+
+SIZES = (10**2, 10**3, 10**4, 10**5, 10**6)
+STAGES = ("load", "kam", "inference", "stats", "plot")
+# larger networks are not drawn, a plot of them is unreadable
+PLOT_MAX_EDGES = 10**4
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIR = os.path.dirname(BENCHMARKS_DIR)
+BASELINES_FILE = os.path.join(BENCHMARKS_DIR, "baselines.json")
+# allowed relative increase of time and of peak memory over the baseline
+TIME_TOLERANCE = 1.0
+MEMORY_TOLERANCE = 0.25
+# stages faster than this are not compared, their times are mostly noise
+MIN_SECONDS = 0.01
+
+
+def make_inputs(n_edges: int, directory: str) -> RunConfig:
+    """
+    Write a synthetic pathway, gene interaction map and GEO top table.
+    :param n_edges: number of pathway edges
+    :param directory: directory of the files
+    :return: run configuration reading the files
+    """
+    config = RunConfig(
+        gene_file=os.path.join(directory, f"geo_{n_edges}.tsv"),
+        pathway_file=os.path.join(directory, f"pathway_{n_edges}.txt"),
+        mapping_file=os.path.join(directory, f"mapping_{n_edges}.tsv"),
+    )
+    pathway = make_scale_free_pathway(n_edges, output_path=config.pathway_file)
+    make_fake_mapping(pathway, output_path=config.mapping_file)
+    genes = sorted(set(pathway[0]) | set(pathway[2]))
+    make_fake_geo(genes, output_path=config.gene_file)
+    return config
+
+
+def run_stages(config: RunConfig, n_edges: int, directory: str, measure: Callable) -> dict:
+    """
+    Run all stages of an analysis in order on a new session.
+    :param config: run configuration
+    :param n_edges: number of pathway edges
+    :param directory: directory of the plots
+    :param measure: function measuring a stage, given as a function of no arguments
+    :return: measurement of each stage by name
+    """
+    session = DataSession()
+    results = dict()
+
+    def load():
+        session.get_gene_set(config.gene_file, config.p_thred, config.fc_thred)
+        session.get_pathway(config.pathway_file, config.mapping_file)
+
+    results["load"] = measure(load)
+    results["kam"] = measure(lambda: session.get_kam(config.pathway_file, config.mapping_file))
+    graph = Graph(session, config)
+
+    def infer():
+        graph._inference = graph._infer()
+        graph._weights = graph._inference.get_weight_table()
+
+    def stats():
+        graph._concs = graph._cal_concordance()
+        graph._richs = graph._cal_richness()
+        graph.get_stat_table()
+
+    results["inference"] = measure(infer)
+    results["stats"] = measure(stats)
+    if n_edges <= PLOT_MAX_EDGES:
+        layout._layouts.clear()
+        output = os.path.join(directory, f"network_{n_edges}.png")
+        results["plot"] = measure(lambda: graph.plot_full_network(output).close("all"))
+    return results
+
+
+def timed(stage: Callable) -> float:
+    """Return the seconds taken by a stage."""
+    start = time.perf_counter()
+    stage()
+    return time.perf_counter() - start
+
+
+def traced(stage: Callable) -> float:
+    """Return the peak traced memory of a stage in MiB."""
+    tracemalloc.start()
+    try:
+        stage()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes=SIZES, repeat: int = 3) -> Dict[str, dict]:
+    """
+    Benchmark all stages at every size.
+    :param sizes: numbers of pathway edges
+    :param repeat: number of timed runs, the fastest one is kept
+    :return: seconds and peak MiB of every stage, keyed "<stage>/<edges>"
+    """
+    # the disk cache would time cache reads instead of the stages
+    enabled = cache.is_enabled()
+    cache.configure(enabled=False)
+    results = dict()
+    print(f"{'stage':>10} {'edges':>10} {'seconds':>10} {'peak MiB':>10}")
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for n_edges in sizes:
+                config = make_inputs(n_edges, directory)
+                runs = [run_stages(config, n_edges, directory, timed) for _ in range(repeat)]
+                peaks = run_stages(config, n_edges, directory, traced)
+                for stage in STAGES:
+                    if stage not in peaks:
+                        continue
+                    seconds = min(times[stage] for times in runs)
+                    results[f"{stage}/{n_edges}"] = {
+                        "seconds": round(seconds, 4),
+                        "peak_mib": round(peaks[stage], 2),
+                    }
+                    print(f"{stage:>10} {n_edges:>10} {seconds:>10.3f} {peaks[stage]:>10.1f}")
+    finally:
+        cache.configure(enabled=enabled)
+    return results
+
+
+def run_ref(ref: str, max_edges: int, repeat: int) -> Optional[Dict[str, dict]]:
+    """
+    Benchmark the merge-base of HEAD and a git ref with its own suite, in a temporary worktree.
+    :param ref: git ref, e.g. the base branch of a pull request
+    :param max_edges: largest size to run
+    :param repeat: number of timed runs per size
+    :return: results keyed "<stage>/<edges>", None if the merge-base has no suite to run
+    """
+
+    def git(*args: str) -> str:
+        result = subprocess.run(
+            ["git", *args], cwd=REPOSITORY_DIR, capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip()
+
+    base = git("merge-base", "HEAD", ref)
+    with tempfile.TemporaryDirectory() as directory:
+        worktree = os.path.join(directory, "base")
+        git("worktree", "add", "--detach", worktree, base)
+        try:
+            if not os.path.exists(os.path.join(worktree, "benchmarks", "bench_suite.py")):
+                print(f"No benchmark suite at {base}.")
+                return None
+            output = os.path.join(directory, "base.json")
+            print(f"Benchmarking {base}:")
+            command = ["--max-edges", str(max_edges), "--repeat", str(repeat), "--output", output]
+            result = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_suite", *command], cwd=worktree
+            )
+            if result.returncode != 0 or not os.path.exists(output):
+                print(f"The benchmark suite of {base} failed.")
+                return None
+            with open(output) as file:
+                return json.load(file)
+        finally:
+            git("worktree", "remove", "--force", worktree)
+
+
+def compare(
+    results: Dict[str, dict],
+    baselines: Dict[str, dict],
+    time_tolerance: float = TIME_TOLERANCE,
+    memory_tolerance: float = MEMORY_TOLERANCE,
+) -> list:
+    """
+    Compare benchmark results with baselines.
+    :param results: seconds and peak MiB keyed "<stage>/<edges>"
+    :param baselines: baseline seconds and peak MiB, with the same keys
+    :param time_tolerance: allowed relative increase of time
+    :param memory_tolerance: allowed relative increase of peak memory
+    :return: description of every regression
+    """
+    regressions = []
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        if baseline is None:
+            continue
+        limit = baseline["seconds"] * (1 + time_tolerance)
+        if result["seconds"] > max(limit, MIN_SECONDS):
+            regressions.append(
+                f"{key}: {result['seconds']:.3f} s, baseline {baseline['seconds']:.3f} s"
+            )
+        limit = baseline["peak_mib"] * (1 + memory_tolerance)
+        if result["peak_mib"] > max(limit, 1.0):
+            regressions.append(
+                f"{key}: {result['peak_mib']:.1f} MiB, baseline {baseline['peak_mib']:.1f} MiB"
+            )
+    return regressions
+
+
+def main(argv: Optional[list] = None) -> int:
+    """Run the benchmarks, then report them, save them as baselines or check them."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-edges", type=int, default=max(SIZES), help="largest size to run")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs per size")
+    parser.add_argument("--save", action="store_true", help="store the results as baselines")
+    parser.add_argument("--check", action="store_true", help="fail on regressions")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    parser.add_argument("--baselines", default=BASELINES_FILE, help="path to the baselines")
+    parser.add_argument("--output", help="path of a JSON file to write the results to")
+    parser.add_argument("--compare", metavar="REF", help="fail on regressions against a git ref")
+    args = parser.parse_args(argv)
+
+    # the merge-base is benchmarked in the same job, on the same machine as HEAD
+    references = run_ref(args.compare, args.max_edges, args.repeat) if args.compare else None
+    if references is not None:
+        print("Benchmarking HEAD:")
+    results = run([size for size in SIZES if size <= args.max_edges], args.repeat)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+    if args.save:
+        baselines = dict()
+        if os.path.exists(args.baselines):
+            with open(args.baselines) as file:
+                baselines = json.load(file)
+        baselines.update(results)
+        with open(args.baselines, "w") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+    if args.check:
+        with open(args.baselines) as file:
+            baselines = json.load(file)
+        regressions = compare(results, baselines, args.time_tolerance, args.memory_tolerance)
+        for regression in regressions:
+            print(f"Regression in {regression}")
+        if regressions:
+            return 1
+    if references is not None:
+        regressions = compare(results, references, args.time_tolerance, args.memory_tolerance)
+        for regression in regressions:
+            print(f"Regression against {args.compare} in {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
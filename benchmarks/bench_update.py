@@ -0,0 +1,70 @@
+"""Benchmark single-gene state edits against re-running inference on the whole network.
+
+Run from the repository root with ``python -m benchmarks.bench_update``. An edit only touches the
+HYP networks containing the gene, so it should stay well under a millisecond on large networks.
+Toggling a gene between regulated and unregulated changes the number of regulated nodes, on which
+the statistics of every HYP network depend, so such an edit recomputes all statistics.
+"""
+
+import time
+
+import numpy as np
+
+from benchmarks.bench_kam import make_synthetic_pathway
+from src.neurommsig.inference import CausalInference
+from src.neurommsig.kam import KAM
+
+N_EDGES = 200000
+N_EDITS = 1000
+# edits toggling regulation, each recomputing the statistics of all HYP networks
+N_TOGGLES = 20
+
+
+def main():
+    """Time single-gene edits and full recomputes of the statistics."""
+    # load the statistics dependencies, imported on first use, before timing
+    import scipy.special  # noqa: F401
+    import scipy.stats  # noqa: F401
+
+    kam = KAM.from_pathway(make_synthetic_pathway(N_EDGES))
+    n_nodes = len(kam.nodes)
+    rng = np.random.default_rng(0)
+    states = rng.choice([-1, 0, 0, 1], n_nodes)
+    inference = CausalInference.from_kam(kam, states)
+    m = np.count_nonzero(states)
+    print(f"{n_nodes} nodes, {len(kam.indices)} edges")
+
+    # flip between the two regulated states so that the number of regulated nodes is unchanged
+    nodes = rng.choice(np.flatnonzero(states), N_EDITS)
+    inference.update_states(nodes[:1], -inference.states[nodes[:1]])
+    start = time.perf_counter()
+    for node in nodes:
+        upstream = inference.update_states([node], [-inference.states[node]])
+        inference.get_concordance(m=m, nodes=upstream)
+        inference.get_richness(N=n_nodes, m=m, nodes=upstream)
+    edit = (time.perf_counter() - start) / N_EDITS
+    print(f"{'edit':>8} {edit * 1e3:>10.3f} ms")
+
+    # toggle between regulated and unregulated, the documented full-recompute path
+    nodes = rng.choice(n_nodes, N_TOGGLES)
+    start = time.perf_counter()
+    for node in nodes:
+        state = 0 if inference.states[node] else 1
+        m += 1 if state else -1
+        inference.update_states([node], [state])
+        inference.get_concordance(m=m)
+        inference.get_richness(N=n_nodes, m=m)
+    toggle = (time.perf_counter() - start) / N_TOGGLES
+    print(f"{'toggle':>8} {toggle * 1e3:>10.3f} ms")
+
+    start = time.perf_counter()
+    inference = CausalInference.from_kam(kam, inference.states)
+    inference.get_concordance(m=m)
+    inference.get_richness(N=n_nodes, m=m)
+    full = time.perf_counter() - start
+    print(f"{'full':>8} {full * 1e3:>10.3f} ms")
+    print(f"speedup {full / edit:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
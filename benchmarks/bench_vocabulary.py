@@ -0,0 +1,52 @@
+"""Benchmark joining a pathway to a gene interaction map on gene symbols and on vocabulary ids.
+
+Run from the repository root with ``python -m benchmarks.bench_vocabulary``. Interned tables
+should take a fraction of the memory of string tables, and the join on ids should be faster.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_kam import make_synthetic_pathway
+from src.neurommsig.vocabulary import SymbolVocabulary
+
+N_MAPPING = 10**6
+N_PATHWAY = 10**4
+COLS = ["source", "target"]
+
+
+def main():
+    """Time both joins and measure the memory of both tables."""
+    mapping = make_synthetic_pathway(N_MAPPING)
+    pathway = mapping.sample(N_PATHWAY, random_state=0)[COLS].reset_index(drop=True)
+
+    start = time.perf_counter()
+    pathway.merge(mapping, how="left", on=COLS).drop_duplicates()
+    symbols = time.perf_counter() - start
+
+    vocabulary = SymbolVocabulary()
+    interned = {
+        name: table.assign(**{col: vocabulary.categorical(table[col]) for col in COLS})
+        for name, table in (("mapping", mapping), ("pathway", pathway))
+    }
+    ids = {
+        name: table.assign(**{col: table[col].cat.codes.astype(np.int64) for col in COLS})
+        for name, table in interned.items()
+    }
+    start = time.perf_counter()
+    ids["pathway"].merge(ids["mapping"], how="left", on=COLS).drop_duplicates()
+    interned_seconds = time.perf_counter() - start
+
+    def mib(table: pd.DataFrame) -> float:
+        return table[COLS].memory_usage(deep=True).sum() / 2**20
+
+    print(f"{len(mapping)} interactions, {len(pathway)} pathway rows")
+    print(f"{'':>10} {'join s':>10} {'map MiB':>10}")
+    print(f"{'symbols':>10} {symbols:>10.3f} {mib(mapping):>10.1f}")
+    print(f"{'ids':>10} {interned_seconds:>10.3f} {mib(interned['mapping']):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import logging
+import os
+from typing import Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from src.neurommsig.config import RunConfig
+from src.neurommsig.inference import CausalInference, SparseInference
+from src.neurommsig.preprocessing import get_state_matrix
+from src.neurommsig.reader import DataReader, DataSession
+from src.neurommsig.results import StatTable
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CONTRAST_EXTENSIONS = (".tsv", ".txt")
+
+
+def read_contrasts(source: str) -> dict:
+    """
+    Resolve differential expression tables from a directory or a manifest file.
+    :param source: directory of GEO top tables, or a manifest listing one table per line either as
+        "path" or as "name<TAB>path", relative paths being resolved against the manifest directory
+    :return: mapping of contrast name to file path
+    """
+    if os.path.isdir(source):
+        return {
+            os.path.splitext(name)[0]: os.path.join(source, name)
+            for name in sorted(os.listdir(source))
+            if name.endswith(CONTRAST_EXTENSIONS)
+        }
+    contrasts = dict()
+    with open(source) as manifest:
+        for line in manifest:
+            fields = line.strip().split("\t")
+            if not fields[0]:
+                continue
+            path = os.path.join(os.path.dirname(source), fields[-1])
+            name = fields[0] if len(fields) > 1 else os.path.splitext(os.path.basename(path))[0]
+            contrasts[name] = path
+    return contrasts
+
+
+def score_contrasts(
+    inference: Union[CausalInference, SparseInference], contrasts: Sequence[str]
+) -> StatTable:
+    """
+    Get the statistics of all upstream nodes from causal inference over a state matrix.
+    :param inference: causal inference over a gene x contrast state matrix
+    :param contrasts: contrast names, the columns of the state matrix
+    :return: statistics table with one row per contrast and upstream node
+    """
+    n_nodes = len(inference.nodes)
+    return StatTable(
+        {
+            "contrast": pd.Categorical.from_codes(
+                np.repeat(np.arange(len(contrasts)), n_nodes), categories=list(contrasts)
+            ),
+            "gene": pd.Categorical.from_codes(
+                np.tile(np.arange(n_nodes), len(contrasts)), categories=inference.nodes
+            ),
+            "weight": inference.total_weights.ravel(order="F"),
+            "concordance": inference.get_concordance().ravel(order="F"),
+            "richness": inference.get_richness().ravel(order="F"),
+        }
+    )
+
+
+class BatchRCRstat:
+    """Get statistics of many expression contrasts against one pathway."""
+
+    def __init__(
+        self,
+        contrasts: Union[str, dict],
+        session: Optional[DataSession] = None,
+        config: Optional[RunConfig] = None,
+    ):
+        """
+        :param contrasts: mapping of contrast name to GEO top table path, or a directory or
+            manifest of GEO top tables
+        :param session: session sharing loaded tables across analyses, a new session if None
+        :param config: pathway, mapping file and thresholds of the run, the defaults if None
+        """
+        session = DataSession() if session is None else session
+        config = RunConfig() if config is None else config
+        if isinstance(contrasts, str):
+            contrasts = read_contrasts(contrasts)
+        # the pathway and its KAM network are loaded once for all contrasts
+        self._kam = DataReader.from_config(config, session, read_genes=False).get_kam()
+
+        gene_sets = {
+            name: session.get_gene_set(path, config.p_thred, config.fc_thred)
+            for name, path in contrasts.items()
+        }
+        self._states = get_state_matrix(gene_sets, self._kam.nodes, config.p_thred, config.fc_thred)
+        logger.info(f"Scoring {len(gene_sets)} contrasts.")
+
+        self._inference = SparseInference.from_kam(self._kam, self._states.values)
+        self._stat_table = score_contrasts(self._inference, list(self._states.columns))
+
+    def get_state_matrix(self) -> pd.DataFrame:
+        """Return the gene x contrast matrix of state changes."""
+        return self._states
+
+    def get_stat(self, output: str = None) -> pd.DataFrame:
+        """
+        Get the statistics of all upstream nodes in all contrasts.
+        :param output: path to write the combined statistics table, as TSV, Parquet or Arrow
+            depending on its extension
+        :return: statistics table with one row per contrast and upstream node
+        """
+        if output:
+            self._stat_table.write(output)
+        return self._stat_table.to_frame()
+
+    def get_stat_table(self) -> StatTable:
+        """Return the columnar statistics table of all upstream nodes in all contrasts."""
+        return self._stat_table
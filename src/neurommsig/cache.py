@@ -0,0 +1,223 @@
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.neurommsig.kam import KAM
+from src.neurommsig.startup import PROJECT_DIR
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# default cache directory, entries are keyed by a hash of the content of their source files
+CACHE_DIR: str = os.path.join(PROJECT_DIR, "cache")
+# bump to invalidate all entries written in an older format, or whenever the tables derived from
+# the source files change, e.g. how pathways are merged or KAM networks are built
+CACHE_VERSION: int = 2
+# size of the blocks read when hashing source files
+HASH_BLOCK_SIZE: int = 1 << 20
+
+_settings: dict = {"enabled": True, "directory": CACHE_DIR}
+
+
+def configure(enabled: Optional[bool] = None, directory: Optional[str] = None):
+    """
+    Configure the on-disk cache.
+    :param enabled: whether cached tables are read and written
+    :param directory: directory of the cache entries
+    """
+    if enabled is not None:
+        _settings["enabled"] = enabled
+    if directory is not None:
+        _settings["directory"] = directory
+
+
+def is_enabled() -> bool:
+    """Return whether the on-disk cache is enabled."""
+    return _settings["enabled"]
+
+
+def file_digest(*paths: str) -> str:
+    """
+    Hash the content of source files.
+    :param paths: paths of the source files
+    :return: hex digest, changing whenever any file content or the cache format changes
+    """
+    digest = hashlib.blake2b(f"neurommsig-cache-{CACHE_VERSION}".encode(), digest_size=20)
+    for path in paths:
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        # separate files so that moving bytes between them changes the digest
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def array_digest(*arrays: np.ndarray) -> str:
+    """
+    Hash the content of arrays.
+    :param arrays: arrays, object arrays being hashed as strings
+    :return: hex digest, changing whenever any array content or the cache format changes
+    """
+    digest = hashlib.blake2b(f"neurommsig-cache-{CACHE_VERSION}".encode(), digest_size=20)
+    for array in arrays:
+        array = np.asarray(array)
+        if array.dtype == object:
+            array = array.astype(str)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def _entry_path(kind: str, key: str) -> str:
+    return os.path.join(_settings["directory"], f"{kind}-{key}.npz")
+
+
+def _load(kind: str, key: str) -> Optional[dict]:
+    """Read the arrays of a cache entry, None on a miss."""
+    path = _entry_path(kind, key)
+    if not is_enabled() or not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as entry:
+            arrays = {name: entry[name] for name in entry.files}
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+        return None
+    logger.info(f"Loaded {kind} from cache.")
+    return arrays
+
+
+def _save(kind: str, key: str, **arrays: np.ndarray):
+    """Write the arrays of a cache entry atomically."""
+    if not is_enabled():
+        return
+    directory = _settings["directory"]
+    os.makedirs(directory, exist_ok=True)
+    # write to a temporary file first so that readers never see a partial entry
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(tmp_path, _entry_path(kind, key))
+    except OSError as e:
+        logger.warning(f"Could not write cache entry: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _encode_strings(values) -> dict:
+    """Encode a sequence of optional strings as a unicode array and a missing mask."""
+    values = pd.Series(values, dtype=object)
+    missing = values.isna().to_numpy()
+    return {"values": values.where(~missing, "").to_numpy(dtype=str), "missing": missing}
+
+
+def _decode_strings(values: np.ndarray, missing: np.ndarray) -> np.ndarray:
+    """Decode a unicode array and a missing mask into an object array with NaN values."""
+    decoded = values.astype(object)
+    decoded[missing] = np.nan
+    return decoded
+
+
+def load_pathway(key: str) -> Optional[pd.DataFrame]:
+    """
+    Read a merged pathway from the cache.
+    :param key: digest of the pathway and mapping files
+    :return: pathway with "source", "target" and "relation" columns, None on a miss
+    """
+    arrays = _load("pathway", key)
+    if arrays is None:
+        return None
+    columns = arrays["columns"].tolist()
+    return pd.DataFrame(
+        {col: _decode_strings(arrays[f"{col}.values"], arrays[f"{col}.missing"]) for col in columns}
+    )
+
+
+def save_pathway(key: str, pathway: pd.DataFrame):
+    """
+    Write a merged pathway to the cache.
+    :param key: digest of the pathway and mapping files
+    :param pathway: pathway with "source", "target" and "relation" columns
+    """
+    arrays = {"columns": np.asarray(pathway.columns, dtype=str)}
+    for col in pathway.columns:
+        encoded = _encode_strings(pathway[col])
+        arrays[f"{col}.values"] = encoded["values"]
+        arrays[f"{col}.missing"] = encoded["missing"]
+    _save("pathway", key, **arrays)
+
+
+def load_kam(key: str) -> Optional[KAM]:
+    """
+    Read the CSR edge arrays of a KAM network from the cache.
+    :param key: digest of the pathway and mapping files
+    :return: KAM network, None on a miss
+    """
+    arrays = _load("kam", key)
+    if arrays is None:
+        return None
+    return KAM(
+        arrays["nodes"].astype(object),
+        arrays["indptr"],
+        arrays["indices"],
+        arrays["relation_codes"],
+        arrays["relation_labels"].astype(object),
+    )
+
+
+def save_kam(key: str, kam: KAM):
+    """
+    Write the CSR edge arrays of a KAM network to the cache.
+    :param key: digest of the pathway and mapping files
+    :param kam: KAM network
+    """
+    _save(
+        "kam",
+        key,
+        nodes=kam.nodes.astype(str),
+        indptr=kam.indptr,
+        indices=kam.indices,
+        relation_codes=kam.relation_codes,
+        relation_labels=kam.relation_labels.astype(str),
+    )
+
+
+def load_layout(key: str) -> Optional[np.ndarray]:
+    """
+    Read the node positions of a network layout from the cache.
+    :param key: digest of the KAM network and the layout parameters
+    :return: node x 2 array of positions, None on a miss
+    """
+    arrays = _load("layout", key)
+    return None if arrays is None else arrays["positions"]
+
+
+def save_layout(key: str, positions: np.ndarray):
+    """
+    Write the node positions of a network layout to the cache.
+    :param key: digest of the KAM network and the layout parameters
+    :param positions: node x 2 array of positions
+    """
+    _save("layout", key, positions=positions)
+
+
+def clear() -> int:
+    """
+    Remove all cache entries.
+    :return: number of removed entries
+    """
+    directory = _settings["directory"]
+    if not os.path.isdir(directory):
+        return 0
+    removed = 0
+    for name in os.listdir(directory):
+        if name.endswith((".npz", ".tmp")):
+            os.remove(os.path.join(directory, name))
+            removed += 1
+    return removed
@@ -13,10 +13,23 @@ later, but that will cause problems--the code will get executed twice:
 .. seealso:: https://click.palletsprojects.com/en/7.x/setuptools/#setuptools-integration
 """
 
+import functools
 import logging
+from typing import Callable
 
 import click
 
+from src.neurommsig.config import RunConfig
+from src.neurommsig.constants import (
+    FC_THRED,
+    GEO_FILE,
+    HYP_DEPTH,
+    HYP_DIRECTED,
+    MAPPING_FILE,
+    P_THRED,
+    PATHWAY_FILE,
+)
+
 __all__ = [
     "main",
 ]
@@ -24,10 +37,350 @@ __all__ = [
 logger = logging.getLogger(__name__)
 
 
+def config_options(read_genes: bool = True) -> Callable:
+    """
+    Add input file and threshold options to a command, passed to it as a run configuration.
+    :param read_genes: whether the command reads a GEO top table
+    :return: command decorator
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(**kwargs):
+            config = RunConfig(
+                pathway_file=kwargs.pop("pathway_file"),
+                mapping_file=kwargs.pop("mapping_file"),
+                p_thred=kwargs.pop("p_threshold"),
+                fc_thred=kwargs.pop("fc_threshold"),
+                depth=kwargs.pop("depth"),
+                directed=kwargs.pop("directed"),
+            )
+            if read_genes:
+                config = config.replace(gene_file=kwargs.pop("gene_file"))
+            return func(config=config, **kwargs)
+
+        options = [
+            click.option(
+                "--pathway-file",
+                type=click.Path(exists=True, dir_okay=False),
+                default=PATHWAY_FILE,
+                show_default=True,
+                help="Pathway file.",
+            ),
+            click.option(
+                "--mapping-file",
+                type=click.Path(exists=True, dir_okay=False),
+                default=MAPPING_FILE,
+                show_default=True,
+                help="Gene interaction map with the relation of each interaction.",
+            ),
+            click.option(
+                "-p",
+                "--p-threshold",
+                type=float,
+                default=P_THRED,
+                show_default=True,
+                help="Adjusted p-value below which a gene is significant.",
+            ),
+            click.option(
+                "-f",
+                "--fc-threshold",
+                type=float,
+                default=FC_THRED,
+                show_default=True,
+                help="Absolute log fold change above which a significant gene is regulated.",
+            ),
+            click.option(
+                "-d",
+                "--depth",
+                type=click.IntRange(min=1),
+                default=HYP_DEPTH,
+                show_default=True,
+                help="Number of causal steps from an upstream node to its downstream nodes.",
+            ),
+            click.option(
+                "--directed/--undirected",
+                default=HYP_DIRECTED,
+                show_default=True,
+                help="Whether HYP networks hold only the targets of an upstream node.",
+            ),
+        ]
+        if read_genes:
+            options.insert(
+                0,
+                click.option(
+                    "-g",
+                    "--gene-file",
+                    type=click.Path(exists=True, dir_okay=False),
+                    default=GEO_FILE,
+                    show_default=True,
+                    help="GEO top table of differential expression.",
+                ),
+            )
+        for option in reversed(options):
+            wrapper = option(wrapper)
+        return wrapper
+
+    return decorator
+
+
 @click.group()
 @click.version_option()
-def main():
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    show_default=True,
+    help="Reuse parsed pathways and KAM networks cached on disk.",
+)
+@click.option("--cache-dir", type=click.Path(file_okay=False), help="Directory of the cache.")
+@click.option("--clear-cache", is_flag=True, help="Remove all cache entries before running.")
+@click.option(
+    "--metrics",
+    type=click.Path(dir_okay=False),
+    help="JSON file to write the time and peak memory of every stage of the run to.",
+)
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False),
+    help="File to dump a profile of the run to.",
+)
+@click.option(
+    "--profiler",
+    type=click.Choice(["cprofile", "pyinstrument"]),
+    default="cprofile",
+    show_default=True,
+    help="Profiler of --profile: cProfile for pstats or snakeviz, or pyinstrument for an HTML page "
+    'if the file ends with ".html" and a text report otherwise.',
+)
+@click.pass_context
+def main(
+    ctx: click.Context,
+    cache: bool,
+    cache_dir: str,
+    clear_cache: bool,
+    metrics: str,
+    profile: str,
+    profiler: str,
+):
     """CLI for neurommsig."""
+    from src.neurommsig.startup import setup_logging
+
+    setup_logging()
+    if metrics or profile:
+        from src.neurommsig.profiling import record
+
+        # recorded until the subcommand returns
+        labels = {"command": ctx.invoked_subcommand}
+        ctx.with_resource(record(report=metrics, profile=profile, profiler=profiler, labels=labels))
+    # heavy modules are imported by the subcommands that need them
+    if not cache or cache_dir or clear_cache:
+        from src.neurommsig import cache as disk_cache
+
+        disk_cache.configure(enabled=cache, directory=cache_dir)
+        if clear_cache:
+            removed = disk_cache.clear()
+            logger.info(f"Removed {removed} cache entries.")
+
+
+@main.command()
+@config_options()
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(),
+    help='Path of the statistics table, a ".tsv", ".parquet" or ".arrow" file.',
+)
+@click.option(
+    "--formatted/--numeric",
+    default=True,
+    show_default=True,
+    help="Round concordance, richness and p-values, or keep their full precision.",
+)
+@click.option(
+    "-n",
+    "--permutations",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Number of node state permutations for empirical p-values, none if 0.",
+)
+@click.option("--seed", type=int, default=0, show_default=True, help="Seed of the permutations.")
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of worker processes.",
+)
+def stats(
+    config: RunConfig, output: str, formatted: bool, permutations: int, seed: int, workers: int
+):
+    """Get the weight, concordance and richness of all HYP networks."""
+    from src.neurommsig.neurommsig import RCRstat
+
+    stat = RCRstat(config=config)
+    if permutations:
+        stat.permutation_test(n_perm=permutations, seed=seed, n_workers=workers)
+    stat.get_stat(output, formatted)
+
+
+@main.command()
+@config_options()
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(),
+    required=True,
+    help='Path of the image, a ".pdf", ".svg", ".png" or ".jpg" file.',
+)
+@click.option("--gene", help="Upstream gene of a HYP network to plot.")
+@click.option("--original", is_flag=True, help="Plot the pathway network without inference.")
+@click.option("--dpi", type=int, default=72, show_default=True, help="Resolution of the image.")
+def plot(config: RunConfig, output: str, gene: str, original: bool, dpi: int):
+    """Plot the full network, the pathway network or the HYP network of a gene."""
+    if gene and original:
+        raise click.UsageError("--gene and --original are mutually exclusive.")
+    from src.neurommsig.neurommsig import Graph
+
+    graph = Graph(config=config)
+    if gene:
+        if gene not in graph.get_all_genes():
+            raise click.BadParameter(f"No {gene} in the pathway.", param_hint="--gene")
+        graph.plot_hyp_network(gene, output=output, dpi=dpi)
+    elif original:
+        graph.plot_ori_network(output=output, dpi=dpi)
+    else:
+        graph.plot_full_network(output=output, dpi=dpi)
+
+
+@main.command("plot-hyps")
+@config_options()
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(),
+    required=True,
+    help='A ".pdf" file with one page per HYP network, or a directory of images.',
+)
+@click.option("--gene", multiple=True, help="Upstream gene to plot, all upstream genes if none.")
+@click.option(
+    "--max-concordance", type=float, help="Concordance at or below which a network is plotted."
+)
+@click.option("--max-richness", type=float, help="Richness at or below which a network is plotted.")
+@click.option(
+    "--format",
+    "image_format",
+    type=click.Choice(["pdf", "svg", "png", "jpg"]),
+    default="png",
+    show_default=True,
+    help="Format of the images written to a directory.",
+)
+@click.option("--dpi", type=int, default=72, show_default=True, help="Resolution of the images.")
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of worker processes.",
+)
+def plot_hyps(
+    config: RunConfig,
+    output: str,
+    gene: tuple,
+    max_concordance: float,
+    max_richness: float,
+    image_format: str,
+    dpi: int,
+    workers: int,
+):
+    """Plot the HYP networks of many upstream genes to a PDF file or a directory."""
+    from src.neurommsig.neurommsig import Graph
+
+    graph = Graph(config=config)
+    unknown = sorted(set(gene) - set(graph.get_all_genes()))
+    if unknown:
+        raise click.BadParameter(f"No {', '.join(unknown)} in the pathway.", param_hint="--gene")
+    plotted = graph.export_hyp_networks(
+        output,
+        genes=gene or None,
+        conc_thred=max_concordance,
+        rich_thred=max_richness,
+        image_format=image_format,
+        dpi=dpi,
+        n_workers=workers,
+    )
+    click.echo(f"Plotted {len(plotted)} HYP networks to {output}.")
+
+
+@main.command()
+@config_options(read_genes=False)
+@click.argument("contrasts", type=click.Path(exists=True))
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(),
+    help='Path of the combined statistics table, a ".tsv", ".parquet" or ".arrow" file.',
+)
+def batch(config: RunConfig, contrasts: str, output: str):
+    """Score a directory or manifest of GEO top tables against the pathway."""
+    from src.neurommsig.batch import BatchRCRstat
+
+    stat_table = BatchRCRstat(contrasts, config=config).get_stat(output)
+    if not output:
+        click.echo(stat_table.to_markdown())
+
+
+@main.command()
+@config_options(read_genes=False)
+@click.option(
+    "--pathway",
+    "pathways",
+    multiple=True,
+    help='Another pathway file to serve, as "path" or "name=path".',
+)
+@click.option("--host", default="127.0.0.1", show_default=True, help="Host to listen on.")
+@click.option("--port", type=int, default=8765, show_default=True, help="Port to listen on.")
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    help="Number of worker threads, the number of CPUs if unset.",
+)
+@click.option(
+    "--max-concurrency",
+    type=click.IntRange(min=1),
+    help="Number of jobs run at once, the number of workers if unset.",
+)
+@click.option(
+    "--cache-size",
+    type=click.IntRange(min=1),
+    default=16,
+    show_default=True,
+    help="Number of KAM networks kept in memory.",
+)
+def serve(
+    config: RunConfig,
+    pathways: tuple,
+    host: str,
+    port: int,
+    workers: int,
+    max_concurrency: int,
+    cache_size: int,
+):
+    """Score contrasts and render networks over a local HTTP API."""
+    import os
+
+    from src.neurommsig.server import read_pathways
+    from src.neurommsig.server import serve as run_server
+
+    named = read_pathways([config.pathway_file, *pathways])
+    missing = sorted(path for path in named.values() if not os.path.isfile(path))
+    if missing:
+        raise click.BadParameter(f"No file {', '.join(missing)}.", param_hint="--pathway")
+    click.echo(f"Serving {', '.join(sorted(named))} on http://{host}:{port}.")
+    run_server(named, config, host, port, workers, max_concurrency, cache_size)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+from src.neurommsig.constants import (
+    FC_THRED,
+    GEO_FILE,
+    HYP_DEPTH,
+    HYP_DIRECTED,
+    MAPPING_FILE,
+    P_THRED,
+    PATHWAY_FILE,
+)
+
+
+class RunConfig:
+    """Input files, thresholds and HYP network depth and direction of a run.
+
+    Built once, e.g. from command line options, and passed to :class:`DataReader`,
+    :class:`PreProcessing` and the RCR classes instead of reading module constants, so one
+    interpreter can run many jobs with different inputs.
+    """
+
+    def __init__(
+        self,
+        gene_file: str = GEO_FILE,
+        pathway_file: str = PATHWAY_FILE,
+        mapping_file: str = MAPPING_FILE,
+        p_thred: float = P_THRED,
+        fc_thred: float = FC_THRED,
+        depth: int = HYP_DEPTH,
+        directed: bool = HYP_DIRECTED,
+    ):
+        """
+        :param gene_file: path to a GEO top table
+        :param pathway_file: path to the pathway file
+        :param mapping_file: path to the gene interaction map
+        :param p_thred: adjusted p-value below which a gene is significant
+        :param fc_thred: absolute log fold change above which a significant gene is regulated
+        :param depth: number of causal steps from an upstream node to its downstream nodes
+        :param directed: whether HYP networks hold only the targets of an upstream node
+        """
+        self.gene_file = gene_file
+        self.pathway_file = pathway_file
+        self.mapping_file = mapping_file
+        self.p_thred = p_thred
+        self.fc_thred = fc_thred
+        self.depth = depth
+        self.directed = directed
+
+    def replace(self, **changes) -> "RunConfig":
+        """
+        Return a copy of the configuration with some values changed.
+        :param changes: new values by parameter name
+        :return: run configuration
+        """
+        return RunConfig(**{**vars(self), **changes})
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={value!r}" for name, value in vars(self).items())
+        return f"RunConfig({values})"
@@ -1,11 +1,13 @@
 import os
 from typing import Optional
 
-from src.neurommsig.utils import make_fake_pathway
-
 # parameters
 P_THRED: float = 0.01
 FC_THRED: float = 0.5
+# number of causal steps from an upstream node to the downstream nodes of its HYP network
+HYP_DEPTH: int = 1
+# whether HYP networks hold only the targets of an upstream node, not all of its neighbours
+HYP_DIRECTED: bool = False
 IS_FAKE = False
 
 # file paths
@@ -13,11 +15,8 @@ WORKING_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR: str = os.path.abspath(os.path.join(WORKING_DIR, "../.."))
 GEO_FILE: str = os.path.join(ROOT_DIR, "data/GSE164191.top.table.tsv")
 MAPPING_FILE: str = os.path.join(ROOT_DIR, "data/gene_interaction_map.tsv")
-if IS_FAKE:  # fake pathway for testing
-    num_of_fake_edges = 20
-    gene_set = ["SMAD3", "SMAD4", "TGFBR2", "SPTBN1", "PML", "TGFB1", "DAB2"]
+if IS_FAKE:  # fake pathway for testing, generated with utils.make_fake_pathway
     PATHWAY_FILE = os.path.join(ROOT_DIR, "tests/test_data/fake_pathway.txt")
-    make_fake_pathway(k=num_of_fake_edges, gene_set=gene_set, output_path=PATHWAY_FILE)
 else:  # real pathway
     PATHWAY_FILE: str = os.path.join(ROOT_DIR, "data/TGF-beta_receptor_pathway.txt")
 
@@ -31,3 +30,6 @@ GEO_FILE_COLS: dict = {
 }
 PATHWAY_FILE_COLS: dict = {0: "source", 1: "interaction", 2: "target"}
 MAPPING_FILE_COLS: dict = {"source": "source", "target": "target", "relation": "relation"}
+
+# sign of each causal relation, any other relation has sign 0
+RELATION_SIGNS: dict = {"activation": 1, "inhibition": -1}
@@ -0,0 +1,380 @@
+import copy
+import logging
+from functools import partial
+from typing import TYPE_CHECKING, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.neurommsig.constants import RELATION_SIGNS
+from src.neurommsig.kam import KAM, csr_positions, hyp_networks_to_csr
+from src.neurommsig.stats import concordance, map_unique, richness
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# integer codes of state changes and inference types
+STATE_CODES: dict = {None: 0, "increase": 1, "decrease": -1}
+TYPE_NONE, TYPE_CORRECT, TYPE_CONTRAST, TYPE_AMBIGUOUS = 0, 1, -1, 2
+
+# labels are looked up by code, negative codes index from the end
+STATE_LABELS = np.array([None, "increase", "decrease"], dtype=object)
+TYPE_LABELS = np.array([None, "correct", "ambiguous", "contrast"], dtype=object)
+
+
+class CausalInference:
+    """Array-backed RCR causal inference over all HYP networks of a KAM network.
+
+    HYP networks are stored as a CSR edge array: the downstream nodes of upstream node ``i`` are
+    ``indices[indptr[i]:indptr[i + 1]]``. Relations are factorized into integer codes and state
+    changes are encoded as +1 (increase), -1 (decrease) and 0 (no change). States are either a
+    vector over nodes or a gene x contrast matrix, in which case every per-edge and per-node array
+    gets a trailing contrast axis.
+    """
+
+    def __init__(
+        self,
+        nodes: Sequence[str],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        relations: Sequence,
+        states: np.ndarray,
+    ):
+        """
+        :param nodes: gene symbols of all nodes, in node index order
+        :param indptr: CSR row pointer of length ``len(nodes) + 1``
+        :param indices: CSR downstream node index of each edge
+        :param relations: causal relation of each edge
+        :param states: state change code of each node, or a node x contrast matrix of codes
+        """
+        self.nodes = np.asarray(nodes, dtype=object)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        # factorize relations, missing relations get code -1
+        self.relation_codes, labels = pd.factorize(pd.Series(relations, dtype=object))
+        self.relation_labels = np.append(np.asarray(labels, dtype=object), np.nan)
+        signs = [RELATION_SIGNS.get(label, 0) for label in self.relation_labels]
+        self.relation_signs = np.asarray(signs, dtype=np.int8)[self.relation_codes]
+
+        self.rows = np.repeat(np.arange(len(self.nodes)), np.diff(self.indptr))
+        self.__reverse = None
+        self.__infer(states)
+
+    def __infer(self, states: np.ndarray):
+        """Infer weights and types of all edges given the state changes of the nodes."""
+        self.states = np.array(states, dtype=np.int8)
+        self.edge_states = self.states[self.indices]
+        edge_signs = self.relation_signs.reshape((-1,) + (1,) * (self.states.ndim - 1))
+        self.weights = self.edge_states * edge_signs
+        self.total_weights = self.__segment_sum(self.weights)
+        self.types = self.__infer_types()
+
+    @classmethod
+    def from_hyp_networks(cls, hyps: dict, G: "nx.Graph", states: np.ndarray) -> "CausalInference":
+        """
+        Build the CSR edge array from HYP networks.
+        :param hyps: mapping of upstream node to its downstream nodes
+        :param G: KAM network holding the "relation" of each edge
+        :param states: state change codes of the nodes in ``hyps``, a vector or a matrix
+        :return: causal inference of all HYP networks
+        """
+        return cls(*hyp_networks_to_csr(hyps, G), states)
+
+    @classmethod
+    def from_kam(cls, kam: KAM, states: np.ndarray) -> "CausalInference":
+        """
+        Use the CSR edge array of a KAM network.
+        :param kam: KAM network
+        :param states: state change codes of the KAM nodes, a vector or a matrix
+        :return: causal inference of all HYP networks
+        """
+        return cls(kam.nodes, kam.indptr, kam.indices, kam.relations, states)
+
+    def with_states(self, states: np.ndarray) -> "CausalInference":
+        """
+        Run causal inference on the same HYP networks with other state changes.
+        :param states: state change code of each node, or a node x contrast matrix of codes
+        :return: causal inference sharing the CSR edge array and relation codes
+        """
+        inference = copy.copy(self)
+        inference.__infer(states)
+        return inference
+
+    def update_states(self, nodes: np.ndarray, states: np.ndarray) -> np.ndarray:
+        """
+        Change the states of some nodes, re-inferring only the HYP networks that contain them.
+        :param nodes: indices of the nodes, the last state of a node listed twice is kept
+        :param states: new state change code of each node
+        :return: indices of the upstream nodes whose HYP networks contain the nodes
+        """
+        if self.states.ndim != 1:
+            raise ValueError("States can only be updated for a vector of node states.")
+        nodes = np.asarray(nodes, dtype=np.int64)
+        states = np.broadcast_to(states, nodes.shape)
+        # each edge must be updated once, or its weight change is added to the total repeatedly
+        nodes, last = np.unique(nodes[::-1], return_index=True)
+        self.states[nodes] = states[::-1][last]
+        # edges into the nodes, found through the reverse adjacency
+        in_indptr, in_edges = self.__reverse_adjacency()
+        edges = in_edges[csr_positions(in_indptr, nodes)]
+        self.edge_states[edges] = self.states[self.indices[edges]]
+        delta = self.edge_states[edges] * self.relation_signs[edges] - self.weights[edges]
+        self.weights[edges] += delta
+        np.add.at(self.total_weights, self.rows[edges], delta)
+        # the types of all edges of an upstream node depend on its total weight
+        upstream = np.unique(self.rows[edges])
+        hyp_edges = csr_positions(self.indptr, upstream)
+        self.types[hyp_edges] = self.__infer_types(hyp_edges)
+        return upstream
+
+    def __reverse_adjacency(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the row pointer and the edges into each node, built on first use."""
+        if self.__reverse is None:
+            in_indptr = np.zeros(len(self.nodes) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=len(self.nodes)), out=in_indptr[1:])
+            self.__reverse = (in_indptr, np.argsort(self.indices, kind="stable"))
+        return self.__reverse
+
+    def __segment_sum(self, values: np.ndarray, nodes: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Sum per-edge values over each HYP network.
+        :param values: values of all edges, or of the edges of ``nodes`` in CSR order
+        :param nodes: indices of upstream nodes, all nodes if None
+        :return: sum per upstream node
+        """
+        if nodes is None:
+            indptr = self.indptr
+        else:
+            indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+            np.cumsum(self.indptr[nodes + 1] - self.indptr[nodes], out=indptr[1:])
+        sums = np.zeros((len(indptr) - 1,) + values.shape[1:], dtype=np.int64)
+        nonempty = np.diff(indptr) > 0
+        if nonempty.any():
+            starts = indptr[:-1][nonempty]
+            sums[nonempty] = np.add.reduceat(values, starts, axis=0, dtype=np.int64)
+        return sums
+
+    def __edges(self, nodes: Optional[np.ndarray] = None):
+        """Return the edges of the HYP networks of some upstream nodes, all edges if None."""
+        return slice(None) if nodes is None else csr_positions(self.indptr, nodes)
+
+    def __infer_types(self, edges=slice(None)) -> np.ndarray:
+        """Classify edges as correct, contrast or ambiguous given the upstream weight."""
+        edge_states = self.edge_states[edges]
+        direction = edge_states * np.sign(self.total_weights)[self.rows[edges]]
+        types = np.full(direction.shape, TYPE_AMBIGUOUS, dtype=np.int8)
+        types[direction > 0] = TYPE_CORRECT
+        types[direction < 0] = TYPE_CONTRAST
+        types[edge_states == 0] = TYPE_NONE
+        return types
+
+    def count_per_node(self, mask: np.ndarray) -> np.ndarray:
+        """
+        Count the edges of each HYP network selected by a mask.
+        :param mask: boolean array over edges, with a trailing contrast axis for state matrices
+        :return: number of selected edges per upstream node
+        """
+        return self.__segment_sum(mask)
+
+    def get_concordance(
+        self, m: Optional[int] = None, nodes: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Calculate concordance of all HYP networks.
+        :param m: number of nodes with a state change, counted from the states if None
+        :param nodes: indices of the upstream nodes to calculate, all nodes if None
+        :return: concordance per upstream node, NaN where undefined
+        """
+        nodes = None if nodes is None else np.asarray(nodes, dtype=np.int64)
+        edges = self.__edges(nodes)
+        edge_states, types = self.edge_states[edges], self.types[edges]
+        # many HYP networks share their counts, each distinct set of counts is evaluated once
+        return map_unique(
+            concordance,
+            n=self.__segment_sum(edge_states != 0, nodes),
+            k=self.__segment_sum(types == TYPE_CORRECT, nodes),
+            ambiguous=self.__segment_sum(types == TYPE_AMBIGUOUS, nodes),
+            m=np.count_nonzero(self.states, axis=0) if m is None else m,
+        )
+
+    def get_richness(
+        self, N: Optional[int] = None, m: Optional[int] = None, nodes: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Calculate richness of all HYP networks.
+        :param N: number of nodes, the length of the node list if None
+        :param m: number of nodes with a state change, counted from the states if None
+        :param nodes: indices of the upstream nodes to calculate, all nodes if None
+        :return: richness per upstream node, NaN where undefined
+        """
+        nodes = None if nodes is None else np.asarray(nodes, dtype=np.int64)
+        n = np.diff(self.indptr) if nodes is None else self.indptr[nodes + 1] - self.indptr[nodes]
+        return map_unique(
+            partial(richness, len(self.nodes) if N is None else N),
+            m=np.count_nonzero(self.states, axis=0) if m is None else m,
+            n=n.reshape((-1,) + (1,) * (self.states.ndim - 1)),
+            k=self.__segment_sum(self.edge_states[self.__edges(nodes)] != 0, nodes),
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the causal inference table with one row per edge."""
+        return pd.DataFrame(
+            {
+                "upstream": self.nodes[self.rows],
+                "downstream": self.nodes[self.indices],
+                "causal_rel": self.relation_labels[self.relation_codes],
+                "state_change": STATE_LABELS[self.edge_states],
+                "weight": pd.array(
+                    np.where(self.edge_states != 0, self.weights, None), dtype="Int64"
+                ),
+                "type": TYPE_LABELS[self.types],
+            }
+        )
+
+    def get_weight_table(self) -> dict:
+        """Return the total weight of each upstream node."""
+        return dict(zip(self.nodes.tolist(), self.total_weights.tolist()))
+
+    def get_infer_table(self) -> dict:
+        """Return the causal inference table as a dictionary of HYP networks."""
+        infer_table = dict()
+        downstream = self.nodes[self.indices].tolist()
+        causal_rels = self.relation_labels[self.relation_codes].tolist()
+        states = STATE_LABELS[self.edge_states].tolist()
+        weights = self.weights.tolist()
+        types = TYPE_LABELS[self.types].tolist()
+        for i, ups_node in enumerate(self.nodes.tolist()):
+            hyp = infer_table[ups_node] = dict()
+            for e in range(self.indptr[i], self.indptr[i + 1]):
+                hyp[downstream[e]] = {
+                    "causal_rel": causal_rels[e],
+                    "state_change": states[e],
+                    "weight": weights[e] if states[e] is not None else None,
+                    "type": types[e],
+                }
+        return infer_table
+
+
+class SparseInference:
+    """RCR statistics of all HYP networks as sparse matrix products.
+
+    The HYP networks form a sparse upstream x downstream matrix ``A`` holding the sign of each
+    relation, and its pattern ``P``. For a node x contrast state matrix ``S`` the total weights are
+    ``A @ S`` and the numbers of up- and down-regulated downstream nodes are ``P @ (S > 0)`` and
+    ``P @ (S < 0)``, from which the counts of concordance and richness follow. Memory grows with
+    the number of edges plus nodes x contrasts, never with edges x contrasts. Use
+    :class:`CausalInference` for the inference of each edge.
+    """
+
+    def __init__(
+        self,
+        nodes: Sequence[str],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        relation_signs: np.ndarray,
+        states: np.ndarray,
+    ):
+        """
+        :param nodes: gene symbols of all nodes, in node index order
+        :param indptr: CSR row pointer of length ``len(nodes) + 1``
+        :param indices: CSR downstream node index of each edge
+        :param relation_signs: sign of the causal relation of each edge, 0 if it has none
+        :param states: state change code of each node, or a node x contrast matrix of codes
+        """
+        from scipy import sparse
+
+        self.nodes = np.asarray(nodes, dtype=object)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        shape = (len(self.nodes), len(self.nodes))
+        indices = np.asarray(indices, dtype=np.int64)
+        signs = np.asarray(relation_signs, dtype=np.int32)
+        self.adjacency = sparse.csr_matrix((signs, indices, self.indptr), shape=shape)
+        ones = np.ones(len(indices), dtype=np.int32)
+        self.pattern = sparse.csr_matrix((ones, indices, self.indptr), shape=shape)
+        self.__infer(states)
+
+    def __infer(self, states: np.ndarray):
+        """Sum the weights and count the regulated downstream nodes of every HYP network."""
+        self.states = np.array(states, dtype=np.int8)
+        self.total_weights = np.asarray(self.adjacency @ self.states, dtype=np.int64)
+        self.n_up = np.asarray(self.pattern @ (self.states > 0).view(np.int8), dtype=np.int64)
+        self.n_down = np.asarray(self.pattern @ (self.states < 0).view(np.int8), dtype=np.int64)
+
+    @classmethod
+    def from_kam(cls, kam: KAM, states: np.ndarray) -> "SparseInference":
+        """
+        Use the CSR edge array of a KAM network.
+        :param kam: KAM network
+        :param states: state change codes of the KAM nodes, a vector or a matrix
+        :return: sparse inference of all HYP networks
+        """
+        return cls(kam.nodes, kam.indptr, kam.indices, kam.relation_signs, states)
+
+    @classmethod
+    def from_inference(cls, inference: CausalInference) -> "SparseInference":
+        """
+        Use the HYP networks and states of a causal inference.
+        :param inference: causal inference
+        :return: sparse inference of the same HYP networks and states
+        """
+        return cls(
+            inference.nodes,
+            inference.indptr,
+            inference.indices,
+            inference.relation_signs,
+            inference.states,
+        )
+
+    def with_states(self, states: np.ndarray) -> "SparseInference":
+        """
+        Score the same HYP networks with other state changes.
+        :param states: state change code of each node, or a node x contrast matrix of codes
+        :return: sparse inference sharing the sparse matrices
+        """
+        inference = copy.copy(self)
+        inference.__infer(states)
+        return inference
+
+    def get_counts(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Count the regulated, correct and ambiguous downstream nodes of every HYP network.
+        A regulated node is correct if its state follows the sign of the total weight and
+        ambiguous if the total weight is 0.
+        :return: n, k and ambiguous counts per upstream node
+        """
+        n = self.n_up + self.n_down
+        k = np.where(self.total_weights > 0, self.n_up, 0)
+        k = np.where(self.total_weights < 0, self.n_down, k)
+        ambiguous = np.where(self.total_weights == 0, n, 0)
+        return n, k, ambiguous
+
+    def get_concordance(self, m: Optional[int] = None) -> np.ndarray:
+        """
+        Calculate concordance of all HYP networks.
+        :param m: number of nodes with a state change, counted from the states if None
+        :return: concordance per upstream node, NaN where undefined
+        """
+        n, k, ambiguous = self.get_counts()
+        m = np.count_nonzero(self.states, axis=0) if m is None else m
+        return map_unique(concordance, n=n, k=k, ambiguous=ambiguous, m=m)
+
+    def get_richness(self, N: Optional[int] = None, m: Optional[int] = None) -> np.ndarray:
+        """
+        Calculate richness of all HYP networks.
+        :param N: number of nodes, the length of the node list if None
+        :param m: number of nodes with a state change, counted from the states if None
+        :return: richness per upstream node, NaN where undefined
+        """
+        return map_unique(
+            partial(richness, len(self.nodes) if N is None else N),
+            m=np.count_nonzero(self.states, axis=0) if m is None else m,
+            n=np.diff(self.indptr).reshape((-1,) + (1,) * (self.states.ndim - 1)),
+            k=self.n_up + self.n_down,
+        )
+
+    def get_weight_table(self) -> dict:
+        """Return the total weight of each upstream node."""
+        return dict(zip(self.nodes.tolist(), self.total_weights.tolist()))
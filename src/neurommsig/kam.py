@@ -0,0 +1,449 @@
+import logging
+from typing import TYPE_CHECKING, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.neurommsig.constants import RELATION_SIGNS
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# number of upstream nodes whose HYP networks are expanded at once, bounding memory
+EXPAND_CHUNK_SIZE: int = 1024
+# relation of a node more than one step away, by the sign of its shortest paths plus one
+MULTI_HOP_RELATIONS: list = ["inhibition", "ambiguous", "activation"]
+
+
+def derive_kam(pathway: pd.DataFrame) -> "nx.Graph":
+    """
+    Generate a KAM network from a pathway with causal relations.
+    :param pathway: dataframe with "source", "target" and "relation" columns
+    :return: KAM network, edges with more than one relation are labelled "ambiguous"
+    """
+    import networkx as nx
+
+    # create network
+    G = nx.from_pandas_edgelist(pathway, "source", "target", ["relation"])
+    # index ambiguous edges, i.e. (source, target) pairs with conflicting relations
+    conflicts = pathway.duplicated(subset=["source", "target"], keep="first")
+    ambiguous_edges = set(
+        zip(pathway["source"][conflicts].tolist(), pathway["target"][conflicts].tolist())
+    )
+    # update ambiguous edges
+    for source, target in ambiguous_edges:
+        G[source][target]["relation"] = "ambiguous"
+    return G
+
+
+def csr_positions(indptr: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    Return the positions of all entries of some rows of a CSR array.
+    :param indptr: CSR row pointer
+    :param rows: row indices
+    :return: entry positions, row by row
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+
+def hyp_networks_to_csr(hyps: dict, G: "nx.Graph") -> Tuple[list, np.ndarray, np.ndarray, list]:
+    """
+    Encode HYP networks as a CSR edge array.
+    :param hyps: mapping of upstream node to its downstream nodes
+    :param G: KAM network holding the "relation" of each edge
+    :return: nodes, CSR row pointer, CSR downstream node indices and relation of each edge
+    """
+    nodes = list(hyps)
+    index = {node: i for i, node in enumerate(nodes)}
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum([len(nbr) for nbr in hyps.values()], out=indptr[1:])
+    indices = np.fromiter(
+        (index[b] for nbr in hyps.values() for b in nbr), dtype=np.int64, count=indptr[-1]
+    )
+    relations = [G[a][b]["relation"] for a, nbr in hyps.items() for b in nbr]
+    return nodes, indptr, indices, relations
+
+
+def _merge_paths(keys: np.ndarray, signs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge the paths reaching each (upstream node, node) pair, disagreeing signs becoming 0.
+    :param keys: pair of each path, as upstream node index * number of nodes + node index
+    :param signs: sign of each path
+    :return: sorted distinct pairs and the sign of each
+    """
+    order = np.argsort(keys, kind="stable")
+    keys, signs = keys[order], signs[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    low = np.minimum.reduceat(signs, starts)
+    high = np.maximum.reduceat(signs, starts)
+    return keys[starts], np.where(low == high, low, 0).astype(np.int8)
+
+
+class DirectedKAM:
+    """Directed KAM network keeping every distinct relation of every (source, target) pair.
+
+    Edges are stored as CSR out-adjacency: the targets of node ``i`` are
+    ``indices[indptr[i]:indptr[i + 1]]`` and the relation of each edge is
+    ``relation_labels[relation_codes]``, code -1 marking a missing relation. The in-adjacency
+    ``in_indices[in_indptr[i]:in_indptr[i + 1]]`` holds the sources of node ``i``, and ``in_edges``
+    the positions of those edges in the out-adjacency.
+    """
+
+    def __init__(
+        self,
+        nodes: Sequence[str],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        relation_codes: np.ndarray,
+        relation_labels: Sequence[str],
+        pathway_rows: np.ndarray,
+    ):
+        """
+        :param nodes: gene symbols of all nodes, in node index order
+        :param indptr: CSR row pointer of the out-adjacency, of length ``len(nodes) + 1``
+        :param indices: target index of each edge
+        :param relation_codes: relation code of each edge, -1 for a missing relation
+        :param relation_labels: relation of each code
+        :param pathway_rows: row of the pathway each edge was first read from
+        """
+        self.nodes = np.asarray(nodes, dtype=object)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.relation_codes = np.asarray(relation_codes, dtype=np.int64)
+        self.relation_labels = np.asarray(relation_labels, dtype=object)
+        self.pathway_rows = np.asarray(pathway_rows, dtype=np.int64)
+        self.sources = np.repeat(np.arange(len(self.nodes)), np.diff(self.indptr))
+        self.in_edges = np.argsort(self.indices, kind="stable")
+        self.in_indptr = np.zeros(len(self.nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=len(self.nodes)), out=self.in_indptr[1:])
+        self.in_indices = self.sources[self.in_edges]
+        self.__node_index = None
+
+    @classmethod
+    def from_pathway(cls, pathway: pd.DataFrame) -> "DirectedKAM":
+        """
+        Encode a pathway with causal relations, dropping repeated (source, target, relation) rows.
+        :param pathway: dataframe with "source", "target" and "relation" columns
+        :return: directed KAM network
+        """
+        source, target = pathway["source"], pathway["target"]
+        # nodes are numbered in order of first appearance, sources before targets
+        if isinstance(source.dtype, pd.CategoricalDtype) and source.dtype == target.dtype:
+            # interned gene symbols are numbered by their integer codes
+            ends = np.column_stack([source.cat.codes, target.cat.codes]).ravel()
+            codes, symbol_codes = pd.factorize(ends)
+            nodes = np.append(source.cat.categories.to_numpy(dtype=object), np.nan)[symbol_codes]
+        else:
+            ends = np.column_stack([source.to_numpy(dtype=object), target.to_numpy(dtype=object)])
+            codes, nodes = pd.factorize(ends.ravel())
+        sources, targets = codes[0::2], codes[1::2]
+        relation_codes, relation_labels = pd.factorize(pathway["relation"].astype(object))
+        distinct = (
+            ~pd.DataFrame({"source": sources, "target": targets, "relation": relation_codes})
+            .duplicated()
+            .to_numpy()
+        )
+        pathway_rows = np.flatnonzero(distinct)
+        order = pathway_rows[np.argsort(sources[distinct], kind="stable")]
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources[order], minlength=len(nodes)), out=indptr[1:])
+        return cls(nodes, indptr, targets[order], relation_codes[order], relation_labels, order)
+
+    @property
+    def relations(self) -> np.ndarray:
+        """Relation of each edge, NaN for a missing relation."""
+        return np.append(self.relation_labels, np.nan)[self.relation_codes]
+
+    def __index(self, node: str) -> int:
+        """Return the index of a node."""
+        if self.__node_index is None:
+            self.__node_index = {node: i for i, node in enumerate(self.nodes.tolist())}
+        return self.__node_index[node]
+
+    def successors(self, node: str) -> list:
+        """Return the distinct targets of a node."""
+        i = self.__index(node)
+        targets = self.indices[self.indptr[i] : self.indptr[i + 1]]
+        return self.nodes[pd.unique(targets)].tolist()
+
+    def predecessors(self, node: str) -> list:
+        """Return the distinct sources of a node."""
+        i = self.__index(node)
+        sources = self.in_indices[self.in_indptr[i] : self.in_indptr[i + 1]]
+        return self.nodes[pd.unique(sources)].tolist()
+
+    def get_relations(self, source: str, target: str) -> list:
+        """
+        Return all relations from a source to a target gene.
+        :param source: source gene symbol
+        :param target: target gene symbol
+        :return: relations of the edges, empty if there are none
+        """
+        i, j = self.__index(source), self.__index(target)
+        edges = np.arange(self.indptr[i], self.indptr[i + 1])
+        return self.relations[edges[self.indices[edges] == j]].tolist()
+
+    def to_kam(self, directed: bool = False) -> "KAM":
+        """
+        Collapse the edges into a KAM network whose neighbours are the HYP networks.
+        Undirected, as :func:`derive_kam` does, a pair of genes takes the relation of its last
+        pathway row in either direction, or "ambiguous" if one direction has more than one
+        relation. Directed, the HYP network of a node holds only its targets, each edge taking
+        its relation or "ambiguous" if it has more than one, so every edge is scored once.
+        The neighbours of each node are ordered by the first pathway row of their pair.
+        :param directed: whether HYP networks follow the out-edges only
+        :return: KAM network
+        """
+        if directed:
+            return self.__to_directed_kam()
+        n_nodes = len(self.nodes)
+        sources, targets = self.sources, self.indices
+        ordered = sources * n_nodes + targets
+        _, inverse, counts = np.unique(ordered, return_inverse=True, return_counts=True)
+        conflicting = counts[inverse.ravel()] > 1
+        # group the edges by unordered pair, in pathway order within each pair
+        low, high = np.minimum(sources, targets), np.maximum(sources, targets)
+        order = np.lexsort((self.pathway_rows, low * n_nodes + high))
+        pairs = (low * n_nodes + high)[order]
+        starts = np.flatnonzero(np.r_[True, pairs[1:] != pairs[:-1]])
+        stops = np.r_[starts[1:], len(pairs)] - 1
+        relations = self.relations[order][stops]
+        if len(starts):
+            relations[np.logical_or.reduceat(conflicting[order], starts)] = "ambiguous"
+        first_rows = self.pathway_rows[order][starts]
+        low, high = low[order][starts], high[order][starts]
+        # both directions of every pair, a self-loop once
+        loop = low == high
+        rows = np.concatenate([low, high[~loop]])
+        cols = np.concatenate([high, low[~loop]])
+        symmetric = np.lexsort((np.concatenate([first_rows, first_rows[~loop]]), rows))
+        relations = np.concatenate([relations, relations[~loop]])[symmetric]
+        indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_nodes), out=indptr[1:])
+        relation_codes, relation_labels = pd.factorize(pd.Series(relations, dtype=object))
+        return KAM(self.nodes, indptr, cols[symmetric], relation_codes, relation_labels)
+
+    def __to_directed_kam(self) -> "KAM":
+        """Collapse the relations of each (source, target) pair, keeping the direction."""
+        keys = self.sources * len(self.nodes) + self.indices
+        _, first, inverse, counts = np.unique(
+            keys, return_index=True, return_inverse=True, return_counts=True
+        )
+        conflicting = counts[inverse.ravel()] > 1
+        # edges are grouped by source in pathway order, so are the first edges of the pairs
+        first = np.sort(first)
+        relations = self.relations[first]
+        relations[conflicting[first]] = "ambiguous"
+        relation_codes, relation_labels = pd.factorize(pd.Series(relations, dtype=object))
+        indptr = np.zeros(len(self.nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.sources[first], minlength=len(self.nodes)), out=indptr[1:])
+        return KAM(self.nodes, indptr, self.indices[first], relation_codes, relation_labels)
+
+    def expand(
+        self, depth: int, directed: bool = False, chunk_size: int = EXPAND_CHUNK_SIZE
+    ) -> "KAM":
+        """
+        Extend the HYP network of every node to all nodes within some number of causal steps.
+        The first step keeps the HYP networks of :meth:`to_kam`. Later steps only follow causal
+        out-edges, i.e. activations, inhibitions and pairs with both, so they never go upstream
+        or through bindings. A node more than one step away gets the product of the relation
+        signs along its shortest paths, or "ambiguous" if those paths disagree. The frontiers of
+        many upstream nodes are expanded at once over the CSR arrays, and paths reaching the same
+        node are merged before the next step, so the work grows with the number of reached
+        nodes, not of paths.
+        :param depth: maximum number of steps from an upstream node
+        :param directed: whether the first step follows the out-edges only
+        :param chunk_size: number of upstream nodes expanded at once
+        :return: KAM network whose neighbours are the HYP networks of the given depth
+        """
+        if depth < 1:
+            raise ValueError("depth must be a positive integer.")
+        kam = self.to_kam(directed)
+        if depth == 1:
+            return kam
+        n_nodes = len(self.nodes)
+        # later steps follow the causal edges of the directed KAM network, a pair with
+        # conflicting relations being followed with sign 0
+        steps = kam if directed else self.to_kam(directed=True)
+        signs = steps.relation_signs
+        causal = (signs != 0) | (steps.relations == "ambiguous")
+        indices, signs = steps.indices[causal], signs[causal]
+        step_rows = np.repeat(np.arange(n_nodes), np.diff(steps.indptr))[causal]
+        indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(step_rows, minlength=n_nodes), out=indptr[1:])
+        degrees = np.diff(indptr)
+        multi_hop_code = len(kam.relation_labels) + 1
+        rows, hyp_indices, relation_codes = [], [], []
+        for start in range(0, n_nodes, chunk_size):
+            sources = np.arange(start, min(start + chunk_size, n_nodes))
+            # the first step keeps the edges of the KAM network
+            edges = csr_positions(kam.indptr, sources)
+            chunk_rows = [np.repeat(sources, np.diff(kam.indptr)[sources])]
+            chunk_indices = [kam.indices[edges]]
+            chunk_codes = [kam.relation_codes[edges]]
+            visited = np.union1d(
+                sources * n_nodes + sources, chunk_rows[0] * n_nodes + chunk_indices[0]
+            )
+            edges = csr_positions(indptr, sources)
+            frontier = (
+                np.repeat(sources, degrees[sources]) * n_nodes + indices[edges],
+                signs[edges],
+            )
+            for _ in range(depth - 1):
+                keys, path_signs = frontier
+                frontier_rows, frontier_nodes = keys // n_nodes, keys % n_nodes
+                edges = csr_positions(indptr, frontier_nodes)
+                counts = degrees[frontier_nodes]
+                keys = np.repeat(frontier_rows, counts) * n_nodes + indices[edges]
+                path_signs = np.repeat(path_signs, counts) * signs[edges]
+                # drop nodes reached in fewer steps, i.e. already visited
+                found = np.searchsorted(visited, keys).clip(max=len(visited) - 1)
+                new = visited[found] != keys
+                if not new.any():
+                    break
+                frontier = _merge_paths(keys[new], path_signs[new])
+                keys, path_signs = frontier
+                visited = np.union1d(visited, keys)
+                chunk_rows.append(keys // n_nodes)
+                chunk_indices.append(keys % n_nodes)
+                chunk_codes.append(multi_hop_code + path_signs)
+            # group by upstream node, each step after the previous one
+            chunk_rows = np.concatenate(chunk_rows)
+            order = np.argsort(chunk_rows, kind="stable")
+            rows.append(chunk_rows[order])
+            hyp_indices.append(np.concatenate(chunk_indices)[order])
+            relation_codes.append(np.concatenate(chunk_codes)[order])
+        rows = np.concatenate(rows)
+        relation_codes = np.concatenate(relation_codes)
+        # merge the multi-hop relations with equal relations of the KAM network
+        labels = np.append(kam.relation_labels, MULTI_HOP_RELATIONS)
+        label_codes, relation_labels = pd.factorize(pd.Series(labels, dtype=object))
+        relation_codes = np.where(relation_codes >= 0, label_codes[relation_codes], -1)
+        indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_nodes), out=indptr[1:])
+        return KAM(self.nodes, indptr, np.concatenate(hyp_indices), relation_codes, relation_labels)
+
+    def to_networkx(self) -> "nx.MultiDiGraph":
+        """Return the directed KAM network as a networkx multigraph."""
+        import networkx as nx
+
+        G = nx.MultiDiGraph()
+        G.add_nodes_from(self.nodes.tolist())
+        G.add_edges_from(
+            (source, target, {"relation": relation})
+            for source, target, relation in zip(
+                self.nodes[self.sources].tolist(),
+                self.nodes[self.indices].tolist(),
+                self.relations.tolist(),
+            )
+        )
+        return G
+
+
+class KAM:
+    """KAM network stored as CSR edge arrays.
+
+    The neighbours of node ``i`` are ``indices[indptr[i]:indptr[i + 1]]`` and the relation of each
+    edge is ``relation_labels[relation_codes]``, code -1 marking a missing relation.
+    """
+
+    def __init__(
+        self,
+        nodes: Sequence[str],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        relation_codes: np.ndarray,
+        relation_labels: Sequence[str],
+    ):
+        """
+        :param nodes: gene symbols of all nodes, in node index order
+        :param indptr: CSR row pointer of length ``len(nodes) + 1``
+        :param indices: CSR neighbour index of each edge
+        :param relation_codes: relation code of each edge, -1 for a missing relation
+        :param relation_labels: relation of each code
+        """
+        self.nodes = np.asarray(nodes, dtype=object)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.relation_codes = np.asarray(relation_codes, dtype=np.int64)
+        self.relation_labels = np.asarray(relation_labels, dtype=object)
+        self.__node_index = None
+
+    @classmethod
+    def from_graph(cls, G: "nx.Graph") -> "KAM":
+        """
+        Encode a KAM network given as a networkx graph.
+        :param G: KAM network holding the "relation" of each edge
+        :return: KAM network
+        """
+        hyps = {node: list(G[node]) for node in G.nodes}
+        nodes, indptr, indices, relations = hyp_networks_to_csr(hyps, G)
+        relation_codes, relation_labels = pd.factorize(pd.Series(relations, dtype=object))
+        return cls(nodes, indptr, indices, relation_codes, relation_labels)
+
+    @classmethod
+    def from_pathway(cls, pathway: pd.DataFrame, directed: bool = False) -> "KAM":
+        """
+        Generate a KAM network from a pathway with causal relations.
+        :param pathway: dataframe with "source", "target" and "relation" columns
+        :param directed: whether HYP networks follow the out-edges only
+        :return: KAM network
+        """
+        return DirectedKAM.from_pathway(pathway).to_kam(directed)
+
+    @property
+    def relations(self) -> np.ndarray:
+        """Relation of each edge, NaN for a missing relation."""
+        return np.append(self.relation_labels, np.nan)[self.relation_codes]
+
+    @property
+    def relation_signs(self) -> np.ndarray:
+        """Sign of the relation of each edge, 0 for an ambiguous or missing relation."""
+        signs = [RELATION_SIGNS.get(label, 0) for label in self.relation_labels] + [0]
+        return np.asarray(signs, dtype=np.int8)[self.relation_codes]
+
+    def get_relation(self, source: str, target: str):
+        """
+        Return the relation between two genes.
+        :param source: source gene symbol
+        :param target: target gene symbol
+        :return: relation of the edge, NaN for a missing relation
+        """
+        if self.__node_index is None:
+            self.__node_index = {node: i for i, node in enumerate(self.nodes.tolist())}
+        i, j = self.__node_index[source], self.__node_index[target]
+        edges = np.arange(self.indptr[i], self.indptr[i + 1])
+        edges = edges[self.indices[edges] == j]
+        if not len(edges):
+            raise KeyError(target)
+        return self.relations[edges[0]]
+
+    def get_hyp_networks(self) -> dict:
+        """Return the neighbours of every node."""
+        neighbours = self.nodes[self.indices].tolist()
+        return {
+            node: neighbours[self.indptr[i] : self.indptr[i + 1]]
+            for i, node in enumerate(self.nodes.tolist())
+        }
+
+    def to_networkx(self) -> "nx.Graph":
+        """Return the KAM network as a networkx graph."""
+        import networkx as nx
+
+        G = nx.Graph()
+        G.add_nodes_from(self.nodes.tolist())
+        rows = np.repeat(self.nodes, np.diff(self.indptr))
+        G.add_edges_from(
+            (source, target, {"relation": relation})
+            for source, target, relation in zip(
+                rows.tolist(), self.nodes[self.indices].tolist(), self.relations.tolist()
+            )
+        )
+        return G
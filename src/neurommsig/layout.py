@@ -0,0 +1,257 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.neurommsig import cache
+from src.neurommsig.kam import KAM, csr_positions
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# number of force-directed iterations of a layout
+LAYOUT_ITERATIONS: int = 50
+# networks up to this many nodes get exact pairwise repulsion, larger ones the grid approximation
+EXACT_REPULSION_MAX_NODES: int = 1000
+# average number of nodes per cell of the grid approximating the repulsion of large networks
+GRID_NODES_PER_CELL: int = 4
+# pull towards the centre, keeping disconnected components together
+LAYOUT_GRAVITY: float = 1.0
+# number of layouts kept in memory, the least recently used one is dropped first
+LAYOUT_MEMO_SIZE: int = 32
+
+_layouts: "OrderedDict[str, np.ndarray]" = OrderedDict()
+# layouts are read and added from the worker threads of the job server
+_layouts_lock = threading.Lock()
+
+
+def _edge_pairs(indptr: np.ndarray, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the distinct unordered node pairs of a CSR edge array, without self-loops."""
+    n_nodes = len(indptr) - 1
+    rows = np.repeat(np.arange(n_nodes), np.diff(indptr))
+    low, high = np.minimum(rows, indices), np.maximum(rows, indices)
+    pairs = np.unique((low * n_nodes + high)[low != high])
+    return pairs // n_nodes, pairs % n_nodes
+
+
+def _grid(positions: np.ndarray, width: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bin nodes into square grid cells, with a margin of empty cells around the grid.
+    :param positions: node x 2 array of positions
+    :param width: cell width
+    :return: column and row of the cell of each node
+    """
+    cells = np.floor((positions - positions.min(axis=0)) / width).astype(np.int64) + 1
+    return cells[:, 0], cells[:, 1]
+
+
+def _near_pairs(columns: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the node pairs in the same or adjacent grid cells, each unordered pair once.
+    :param columns: grid column of each node
+    :param rows: grid row of each node
+    :return: first and second node of each pair
+    """
+    n_nodes = len(columns)
+    height = rows.max() + 2
+    cell_ids = columns * height + rows
+    n_cells = (columns.max() + 2) * height
+    order = np.argsort(cell_ids, kind="stable")
+    cell_indptr = np.zeros(n_cells + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cell_ids, minlength=n_cells), out=cell_indptr[1:])
+    firsts, seconds = [], []
+    # half of the neighbouring cells, so that every pair of cells is visited once
+    for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+        neighbours = cell_ids + dx * height + dy
+        first = np.repeat(np.arange(n_nodes), cell_indptr[neighbours + 1] - cell_indptr[neighbours])
+        second = order[csr_positions(cell_indptr, neighbours)]
+        if dx == dy == 0:
+            first, second = first[first < second], second[first < second]
+        firsts.append(first)
+        seconds.append(second)
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def _far_repulsion(columns: np.ndarray, rows: np.ndarray, k: float, width: float) -> np.ndarray:
+    """
+    Approximate the repulsion between nodes of non-adjacent grid cells on the grid.
+    The number of nodes per cell is convolved with the repulsion k^2 / d between cell centres,
+    by FFT, and every node takes the force at its cell.
+    :param columns: grid column of each node
+    :param rows: grid row of each node
+    :param k: ideal edge length
+    :param width: cell width
+    :return: node x 2 array of forces
+    """
+    from scipy.signal import fftconvolve
+
+    shape = (columns.max() + 2, rows.max() + 2)
+    density = np.zeros(shape)
+    np.add.at(density, (columns, rows), 1)
+    dx, dy = np.meshgrid(
+        np.arange(1 - shape[0], shape[0]), np.arange(1 - shape[1], shape[1]), indexing="ij"
+    )
+    squared = (dx**2 + dy**2).astype(float)
+    # adjacent cells repel exactly, pair by pair
+    squared[(np.abs(dx) <= 1) & (np.abs(dy) <= 1)] = np.inf
+    scale = k**2 / (width * squared)
+    return np.column_stack(
+        [fftconvolve(density, offset * scale, mode="same")[columns, rows] for offset in (dx, dy)]
+    )
+
+
+def _sum_by(nodes: np.ndarray, vectors: np.ndarray, n_nodes: int) -> np.ndarray:
+    """Sum 2D vectors per node."""
+    return np.column_stack(
+        [np.bincount(nodes, weights=vectors[:, axis], minlength=n_nodes) for axis in (0, 1)]
+    )
+
+
+def compute_layout(
+    indptr: np.ndarray, indices: np.ndarray, iterations: int = LAYOUT_ITERATIONS, seed: int = 0
+) -> np.ndarray:
+    """
+    Place the nodes of a network with the Fruchterman-Reingold force-directed algorithm.
+    Forces are summed over edge and node pair arrays. In networks of more than
+    :data:`EXACT_REPULSION_MAX_NODES` nodes, only nodes in adjacent cells of a grid holding
+    about :data:`GRID_NODES_PER_CELL` nodes per cell repel each other pair by pair, and the
+    repulsion of farther nodes is computed between grid cells, so an iteration takes time close
+    to linear in the number of nodes.
+    :param indptr: CSR row pointer of the network
+    :param indices: CSR neighbour index of each edge, edge directions are ignored
+    :param iterations: number of iterations
+    :param seed: seed of the initial positions
+    :return: node x 2 array of positions within [-1, 1]
+    """
+    n_nodes = len(indptr) - 1
+    if n_nodes == 0:
+        return np.zeros((0, 2))
+    rng = np.random.default_rng(seed)
+    # unit ideal edge length, on a square whose area grows with the number of nodes
+    k, width = 1.0, np.sqrt(n_nodes)
+    positions = rng.uniform(0, width, (n_nodes, 2))
+    sources, targets = _edge_pairs(np.asarray(indptr), np.asarray(indices))
+    exact = n_nodes <= EXACT_REPULSION_MAX_NODES
+    temperature = width / 10
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        if exact:
+            first, second = np.triu_indices(n_nodes, 1)
+            displacement = np.zeros((n_nodes, 2))
+        else:
+            # cells over the extent of the layout, so that near pairs grow linearly with nodes
+            extent = np.ptp(positions, axis=0).max()
+            cell_width = max(extent / np.sqrt(n_nodes / GRID_NODES_PER_CELL), 0.01 * k)
+            columns, rows = _grid(positions, cell_width)
+            first, second = _near_pairs(columns, rows)
+            displacement = _far_repulsion(columns, rows, k, cell_width)
+        delta = positions[first] - positions[second]
+        distance = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 0.01 * k)
+        # repulsion k^2 / d along the unit vector between the nodes
+        push = delta * (k**2 / distance**2)[:, None]
+        displacement += _sum_by(first, push, n_nodes) - _sum_by(second, push, n_nodes)
+        # attraction d^2 / k along the edges
+        delta = positions[sources] - positions[targets]
+        pull = delta * (np.hypot(delta[:, 0], delta[:, 1]) / k)[:, None]
+        displacement += _sum_by(targets, pull, n_nodes) - _sum_by(sources, pull, n_nodes)
+        displacement -= LAYOUT_GRAVITY * (positions - positions.mean(axis=0)) / width
+        # every node moves at most by the temperature, which cools down linearly
+        length = np.maximum(np.hypot(displacement[:, 0], displacement[:, 1]), 1e-12)
+        positions += displacement * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= cooling
+    positions -= positions.mean(axis=0)
+    scale = np.abs(positions).max()
+    return positions / scale if scale > 0 else positions
+
+
+def get_layout(kam: KAM, iterations: int = LAYOUT_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """
+    Return the layout of a KAM network, computed once and then read from memory or the cache.
+    Layouts are keyed by a hash of the CSR arrays and the layout parameters, so every contrast
+    scored against one pathway is drawn with the same positions.
+    :param kam: KAM network
+    :param iterations: number of force-directed iterations
+    :param seed: seed of the initial positions
+    :return: read-only node x 2 array of positions within [-1, 1], in node index order
+    """
+    key = cache.array_digest(kam.indptr, kam.indices, np.array([iterations, seed]))
+    with _layouts_lock:
+        positions = _layouts.get(key)
+        if positions is not None:
+            _layouts.move_to_end(key)
+            return positions
+    # computed outside the lock, threads laying out one network at once get the same positions
+    positions = cache.load_layout(key)
+    if positions is None:
+        positions = compute_layout(kam.indptr, kam.indices, iterations, seed)
+        cache.save_layout(key, positions)
+    positions.flags.writeable = False
+    with _layouts_lock:
+        _layouts[key] = positions
+        if len(_layouts) > LAYOUT_MEMO_SIZE:
+            _layouts.popitem(last=False)
+    return positions
+
+
+def draw_network(
+    ax,
+    positions: np.ndarray,
+    sources: np.ndarray,
+    targets: np.ndarray,
+    node_colors: Union[str, Sequence] = "orange",
+    edge_colors: Union[str, Sequence] = "lightgrey",
+    edge_widths: Union[float, np.ndarray] = 1.0,
+    labels: Optional[Sequence[str]] = None,
+    node_size: float = 300,
+    alpha: Optional[float] = None,
+):
+    """
+    Draw a network on matplotlib axes with one collection of edges and one of nodes.
+    :param ax: matplotlib axes
+    :param positions: node x 2 array of positions
+    :param sources: source node index of each edge
+    :param targets: target node index of each edge
+    :param node_colors: color of all nodes, or of each node
+    :param edge_colors: color of all edges, or of each edge
+    :param edge_widths: width of all edges, or of each edge
+    :param labels: label of each node, none if None
+    :param node_size: marker area of the nodes, in points squared
+    :param alpha: opacity of nodes and edges
+    """
+    from matplotlib.collections import LineCollection
+    from matplotlib.colors import to_rgba_array
+
+    n_edges = len(sources)
+    edge_colors = to_rgba_array(edge_colors)
+    edge_colors = (
+        np.broadcast_to(edge_colors, (n_edges, 4)) if len(edge_colors) == 1 else edge_colors
+    )
+    edge_widths = np.broadcast_to(np.asarray(edge_widths, dtype=float), (n_edges,))
+    # wide edges are drawn last, on top of thin ones
+    order = np.argsort(edge_widths, kind="stable")
+    segments = np.stack([positions[sources], positions[targets]], axis=1)[order]
+    ax.add_collection(
+        LineCollection(
+            segments,
+            colors=edge_colors[order],
+            linewidths=edge_widths[order],
+            alpha=alpha,
+            zorder=1,
+        )
+    )
+    ax.scatter(
+        positions[:, 0],
+        positions[:, 1],
+        s=node_size,
+        c=to_rgba_array(node_colors),
+        alpha=alpha,
+        linewidths=0,
+        zorder=2,
+    )
+    if labels is not None:
+        for (x, y), label in zip(positions.tolist(), labels):
+            ax.text(x, y, label, fontsize=12, ha="center", va="center", zorder=3)
+    ax.autoscale_view()
+    ax.set_axis_off()
@@ -0,0 +1,73 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ids are packed into one int64 key, the source in the high and the target in the low 32 bits
+ID_BITS: int = 32
+
+
+def pack_pairs(sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """
+    Pack (source, target) id pairs into int64 keys.
+    :param sources: source ids, -1 for a missing value
+    :param targets: target ids, -1 for a missing value
+    :return: key of each pair, equal pairs having equal keys
+    """
+    sources, targets = np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+    return sources * (1 << ID_BITS) + targets
+
+
+class EdgeIndex:
+    """Relations of a gene interaction map, indexed by the (source, target) ids of interactions.
+
+    Interactions are stored as sorted int64 keys packing both ids, with distinct relations kept in
+    map order within a key. The relations of a batch of pairs are found with one binary search per
+    pair, instead of joining a table against the whole map.
+    """
+
+    def __init__(self, sources: np.ndarray, targets: np.ndarray, relations: Sequence):
+        """
+        :param sources: source id of each interaction
+        :param targets: target id of each interaction
+        :param relations: relation of each interaction
+        """
+        keys = pack_pairs(sources, targets)
+        relation_codes, relation_labels = pd.factorize(pd.Series(relations, dtype=object))
+        distinct = ~pd.DataFrame({"key": keys, "relation": relation_codes}).duplicated().to_numpy()
+        order = np.argsort(keys[distinct], kind="stable")
+        self.keys = keys[distinct][order]
+        self.relation_codes = relation_codes[distinct][order]
+        self.relation_labels = np.asarray(relation_labels, dtype=object)
+
+    @classmethod
+    def from_mapping(cls, mapping: pd.DataFrame) -> "EdgeIndex":
+        """
+        Index a gene interaction map whose gene symbols are interned as vocabulary ids.
+        :param mapping: dataframe with categorical "source" and "target" and a "relation" column
+        :return: edge index
+        """
+        return cls(mapping["source"].cat.codes, mapping["target"].cat.codes, mapping["relation"])
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, sources: np.ndarray, targets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return all relations of (source, target) pairs, as a left join of the pairs on the map.
+        :param sources: source id of each pair
+        :param targets: target id of each pair
+        :return: pair of each result row, in pair order, and its relation, NaN for a pair without
+            any interaction in the map
+        """
+        keys = pack_pairs(sources, targets)
+        starts = np.searchsorted(self.keys, keys, side="left")
+        stops = np.searchsorted(self.keys, keys, side="right")
+        # a pair without interactions keeps one row with a missing relation
+        counts = np.maximum(stops - starts, 1)
+        rows = np.repeat(np.arange(len(keys)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        positions = np.repeat(starts, counts) + offsets
+        found = np.repeat(stops > starts, counts)
+        codes = np.append(self.relation_codes, -1)[np.where(found, positions, -1)]
+        return rows, np.append(self.relation_labels, np.nan)[codes]
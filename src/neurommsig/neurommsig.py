@@ -1,125 +1,83 @@
 import logging
 import os
-from math import factorial
-from typing import Optional, Tuple
+from typing import TYPE_CHECKING, Optional, Tuple
 
-import matplotlib.pyplot as plt
-import networkx as nx
+import numpy as np
 import pandas as pd
 
-import src.neurommsig.startup
+from src.neurommsig.config import RunConfig
+from src.neurommsig.inference import CausalInference
+from src.neurommsig.kam import derive_kam  # noqa: F401
+from src.neurommsig.layout import get_layout
 from src.neurommsig.preprocessing import PreProcessing
-from src.neurommsig.reader import DataReader
+from src.neurommsig.profiling import stage
+from src.neurommsig.reader import DataReader, DataSession
+from src.neurommsig.results import StatTable
+
+if TYPE_CHECKING:
+    import networkx as nx
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.WARNING)
 
 
 class RCR:
-    def __init__(self):
-        self.__pathway = None
+    def __init__(self, session: Optional[DataSession] = None, config: Optional[RunConfig] = None):
+        """
+        :param session: session sharing loaded tables across analyses, a new session if None
+        :param config: input files and thresholds of the run, the defaults if None
+        """
+        self.__session = DataSession() if session is None else session
+        self.__config = RunConfig() if config is None else config
+        self.__reader = None
         self._upregu_genes = None
         self._downregu_genes = None
-        self._G = None
+        self._kam = None
+        self.__G = None
+        self._context = None
 
         self.__preprocessing()
         self._derive_kam_from_pathway()
+        self._context = self.__preprocessor.get_context(self.get_all_genes())
 
     def __preprocessing(self):
-        p = PreProcessing()
-        reader = DataReader()
-        self._upregu_genes = p.get_upregu_genes()
-        self._downregu_genes = p.get_downregu_genes()
-        self.__pathway = reader.get_pathway()
+        self.__reader = DataReader.from_config(self.__config, self.__session)
+        self.__preprocessor = PreProcessing(session=self.__session, config=self.__config)
+        self._upregu_genes = self.__preprocessor.get_upregu_genes()
+        self._downregu_genes = self.__preprocessor.get_downregu_genes()
 
     def _derive_kam_from_pathway(self):
         """Generate a KAM network from prior pathway knowledge."""
-        # create network
-        self._G = nx.from_pandas_edgelist(self.__pathway, "source", "target", ["relation"])
-        # define ambiguous edges
-        ambiguous_edges = (
-            self.__pathway[["source", "target"]][
-                self.__pathway.duplicated(subset=["source", "target"], keep="first")
-            ]
-            .to_records(index=False)
-            .tolist()
-        )
-        # update ambiguous edges
-        for node in self._G:
-            for nbr in self._G[node]:
-                if (node, nbr) in ambiguous_edges:
-                    self._G[node][nbr]["relation"] = "ambiguous"
+        self._kam = self.__reader.get_kam()
+
+    @property
+    def _G(self) -> "nx.Graph":
+        """KAM network as a networkx graph, built on first access."""
+        if self.__G is None:
+            self.__G = self._kam.to_networkx()
+        return self.__G
 
     def _generate_hyp_networks(self) -> dict:
         """Generate a list of HYP network."""
-        return {node: list(self._G[node]) for node in list(self._G.nodes)}
-
-    @staticmethod
-    def __causal_inference(state_change: str, causal_rel: str) -> Optional[int]:
-        """RCR causal inference."""
-        if state_change is None:
-            return None
-        elif state_change == "increase" and causal_rel == "activation":
-            return 1
-        elif state_change == "decrease" and causal_rel == "activation":
-            return -1
-        elif state_change == "increase" and causal_rel == "inhibition":
-            return -1
-        elif state_change == "decrease" and causal_rel == "inhibition":
-            return 1
-        else:
-            return 0
+        return self._kam.get_hyp_networks()
 
-    def __which_state_change(self, gene: str) -> Optional[str]:
-        if gene in self._upregu_genes:
-            return "increase"
-        elif gene in self._downregu_genes:
-            return "decrease"
-        else:
-            return None
+    @stage("inference")
+    def _infer(self) -> CausalInference:
+        """Run causal inference on all HYP networks at once."""
+        return CausalInference.from_kam(self._kam, self._context.states)
 
     def get_causal_inference(self) -> Tuple[dict, dict]:
         """Return a dictionary containing causal inference table for all HYP network."""
-        hyps = self._generate_hyp_networks()
-        infer_table = dict().fromkeys(list(self._G.nodes))
-        weight_table = dict()
-        for ups_node, nbr in hyps.items():
-            infer_table[ups_node] = dict().fromkeys(list(nbr))
-            total_weights = 0
-            for b in nbr:
-                infer_table[ups_node][b] = dict()
-                infer_table[ups_node][b]["causal_rel"] = causal_rel = self._G[ups_node][b][
-                    "relation"
-                ]  # causal edge relationship
-                infer_table[ups_node][b]["state_change"] = state_change = self.__which_state_change(
-                    b
-                )  # state change of downstream node
-                infer_table[ups_node][b]["weight"] = weight = self.__causal_inference(
-                    state_change, causal_rel
-                )  # causal weight
-                if state_change is not None:
-                    total_weights += weight
-            # weight of upstream nodes
-            weight_table[ups_node] = total_weights
-            # causal inference type
-            for b in nbr:
-                if infer_table[ups_node][b]["state_change"] is None:
-                    infer_table[ups_node][b]["type"] = None
-                elif total_weights > 0 and infer_table[ups_node][b]["state_change"] == "increase":
-                    infer_table[ups_node][b]["type"] = "correct"
-                elif total_weights > 0 and infer_table[ups_node][b]["state_change"] == "decrease":
-                    infer_table[ups_node][b]["type"] = "contrast"
-                elif total_weights < 0 and infer_table[ups_node][b]["state_change"] == "decrease":
-                    infer_table[ups_node][b]["type"] = "correct"
-                elif total_weights < 0 and infer_table[ups_node][b]["state_change"] == "increase":
-                    infer_table[ups_node][b]["type"] = "contrast"
-                else:
-                    infer_table[ups_node][b]["type"] = "ambiguous"
-        return weight_table, infer_table
+        inference = self._infer()
+        return inference.get_weight_table(), inference.get_infer_table()
+
+    def get_inference_table(self) -> pd.DataFrame:
+        """Return the causal inference table of all HYP networks with one row per edge."""
+        return self._infer().to_frame()
 
     def get_all_genes(self) -> list:
         """Return a list of all the genes in the network."""
-        return list(self._G.nodes)
+        return self._kam.nodes.tolist()
 
     def get_relation(self, source: str, target: str) -> str:
         """
@@ -128,85 +86,92 @@ class RCR:
         :param target: target gene symbol
         :return: relation between source and target
         """
-        return self._G[source][target]["relation"]
+        return self._kam.get_relation(source, target)
 
 
 class RCRstat(RCR):
     """Get statistics from causal inference table."""
 
-    def __init__(self):
-        super().__init__()
-        self._weights, self._infer_table = self.get_causal_inference()
+    def __init__(self, session: Optional[DataSession] = None, config: Optional[RunConfig] = None):
+        """
+        :param session: session sharing loaded tables across analyses, a new session if None
+        :param config: input files and thresholds of the run, the defaults if None
+        """
+        super().__init__(session, config)
+        self._inference = self._infer()
+        self._weights = self._inference.get_weight_table()
+        self.__infer_table = None
         self._concs = self._cal_concordance()
         self._richs = self._cal_richness()
+        self._empirical = None
+
+    @property
+    def _infer_table(self) -> dict:
+        """Causal inference table as a dictionary of HYP networks, built on first access."""
+        if self.__infer_table is None:
+            self.__infer_table = self._inference.get_infer_table()
+        return self.__infer_table
 
+    @stage("concordance")
     def _cal_concordance(self) -> dict:
         """Calculate concordance for HYP networks"""
-        conc_all_hyps = dict()
-        # set full set parameters
-        p = 0.5
-        m = 0
-        for gene in self._infer_table.keys():
-            if (gene in self._upregu_genes) or (gene in self._downregu_genes):
-                m += 1
-        # iterate all upstream nodes
-        for ups_node in self._infer_table.keys():
-            hyp = self._infer_table[ups_node]
-            # set subset parameters
-            n = 0
-            l = 0
-            k = 0
-            for downs_node in hyp.keys():
-                if hyp[downs_node]["state_change"] is not None:
-                    n += 1
-                if hyp[downs_node]["type"] == "correct":
-                    k += 1
-                if hyp[downs_node]["type"] == "ambiguous":
-                    l += 1
-            # calculate concordance for a HYP network
-            if (n - l >= k) and (k > 0):
-                conc = sum(
-                    [
-                        factorial(n - l)
-                        / (factorial(j) * factorial(n - l - j))
-                        * p**j
-                        * (1 - p) ** (n - l - j)
-                        for j in range(k, min(n - l, m) + 1)
-                    ]
-                )
-                conc_all_hyps[ups_node] = conc
-        return conc_all_hyps
+        concs = self._inference.get_concordance(m=self._context.n_regulated)
+        defined = ~np.isnan(concs)
+        return dict(zip(self._inference.nodes[defined].tolist(), concs[defined].tolist()))
 
+    @stage("richness")
     def _cal_richness(self) -> dict:
-        """Calculate richness for a HYP network"""
-        rich_all_hyps = dict()
-        # set full set parameters
-        N = len(self._infer_table)
-        m = 0
-        for gene in self._infer_table.keys():
-            if (gene in self._upregu_genes) or (gene in self._downregu_genes):
-                m += 1
-        # iterate all upstream nodes
-        for ups_node in self._infer_table.keys():
-            hyp = self._infer_table[ups_node]
-            # set subset parameters
-            n = len(hyp)
-            k = 0
-            for downs_node in hyp.keys():
-                if hyp[downs_node]["state_change"] is not None:
-                    k += 1
-            # calculate richness for a HYP network
-            if (n >= k) and (m >= k):
-                rich = sum(
-                    [
-                        (factorial(j) / (factorial(m) * factorial(m - j)))
-                        * (factorial(n - j) / (factorial(N - m) * factorial(N - m - n + j)))
-                        / (factorial(n) / (factorial(N) * factorial(N - n)))
-                        for j in range(k, min(n, m) + 1)
-                    ]
-                )
-                rich_all_hyps[ups_node] = rich
-        return rich_all_hyps
+        """Calculate richness for HYP networks"""
+        richs = self._inference.get_richness(N=self._context.n_nodes, m=self._context.n_regulated)
+        defined = ~np.isnan(richs)
+        return dict(zip(self._inference.nodes[defined].tolist(), richs[defined].tolist()))
+
+    @stage("update")
+    def update_states(self, changes: dict) -> list:
+        """
+        Change the state of some genes and update the statistics of the HYP networks containing
+        them, leaving all other HYP networks untouched.
+        :param changes: mapping of gene symbol to "increase", "decrease" or None
+        :return: upstream genes whose weight, concordance or richness changed
+        """
+        unknown = [gene for gene in changes if gene not in self._context.node_index]
+        if unknown:
+            raise ValueError(f"No {', '.join(unknown)} in full set.")
+        n_regulated = self._context.n_regulated
+        for gene, state in changes.items():
+            self._context.set_state_change(gene, state)
+        nodes = [self._context.node_index[gene] for gene in changes]
+        states = self._context.states[nodes]
+        upstream = self._inference.update_states(nodes, states)
+        # the statistics of all HYP networks depend on the number of regulated nodes
+        rows = None if self._context.n_regulated != n_regulated else upstream
+        concs = self._inference.get_concordance(m=self._context.n_regulated, nodes=rows)
+        richs = self._inference.get_richness(
+            N=self._context.n_nodes, m=self._context.n_regulated, nodes=rows
+        )
+        rows = np.arange(len(self._inference.nodes)) if rows is None else rows
+        changed = []
+        for i, conc, rich in zip(rows.tolist(), concs.tolist(), richs.tolist()):
+            gene = self._inference.nodes[i]
+            weight = int(self._inference.total_weights[i])
+            conc, rich = (None if np.isnan(value) else value for value in (conc, rich))
+            if (weight, conc, rich) == (
+                self._weights[gene],
+                self._concs.get(gene),
+                self._richs.get(gene),
+            ):
+                continue
+            changed.append(gene)
+            self._weights[gene] = weight
+            for table, value in ((self._concs, conc), (self._richs, rich)):
+                if value is None:
+                    table.pop(gene, None)
+                else:
+                    table[gene] = value
+        # the states of the HYP networks and the permutation null distribution are stale
+        self.__infer_table = None
+        self._empirical = None
+        return changed
 
     def get_gene_conc(self, gene: str) -> Optional[str]:
         """
@@ -234,64 +199,81 @@ class RCRstat(RCR):
             print(f"No {gene} in full set. Please enter another gene symbol.")
             logger.warning(f"No {gene} in full set.")
 
-    def get_stat(self, output: str = None):
-        stat = []
-        for gene, weight in self._weights.items():
-            conc = self.get_gene_conc(gene)
-            rich = self.get_gene_rich(gene)
-            stat.append((gene, weight, conc, rich))
-        stat_table = pd.DataFrame(stat, columns=["gene", "weight", "concordance", "richness"])
+    @stage("permutation")
+    def permutation_test(
+        self, n_perm: int = 1000, seed: int = 0, n_workers: int = 1
+    ) -> pd.DataFrame:
+        """
+        Estimate empirical p-values of concordance and richness by permuting node states.
+        The results are added as columns to the statistics table of :meth:`get_stat`.
+        :param n_perm: number of permutations
+        :param seed: random seed
+        :param n_workers: number of worker processes
+        :return: empirical p-values and false discovery rates per upstream node
+        """
+        from src.neurommsig.permutation import permutation_test
+
+        self._empirical = permutation_test(self._inference, n_perm, seed, n_workers)
+        return self._empirical
+
+    def get_stat_table(self) -> StatTable:
+        """Return the columnar statistics table of all upstream nodes, NaN where undefined."""
+        genes = list(self._weights)
+        columns = {
+            "gene": pd.Categorical(genes, categories=genes),
+            "weight": np.fromiter(self._weights.values(), dtype=np.int64, count=len(genes)),
+            "concordance": pd.Series(self._concs, dtype=float).reindex(genes).to_numpy(),
+            "richness": pd.Series(self._richs, dtype=float).reindex(genes).to_numpy(),
+        }
+        if self._empirical is not None:
+            empirical = self._empirical.reindex(genes)
+            columns.update((col, values.to_numpy()) for col, values in empirical.items())
+        return StatTable(columns)
+
+    @stage("write")
+    def get_stat(self, output: str = None, formatted: bool = True) -> pd.DataFrame:
+        """
+        Get the weight, concordance and richness of all upstream nodes.
+        :param output: path to write the statistics table, as TSV, Parquet or Arrow depending on
+            its extension, printed as markdown if None
+        :param formatted: render concordance, richness and p-values as rounded strings
+        :return: statistics table with numeric columns
+        """
+        stat_table = self.get_stat_table()
         if output:
-            stat_table.to_csv(output, sep="\t", index=False, header=True)
+            stat_table.write(output, formatted=formatted)
         else:
-            print(stat_table.to_markdown())
+            print(stat_table.to_markdown(formatted))
+        return stat_table.to_frame()
 
 
 class Graph(RCRstat):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, session: Optional[DataSession] = None, config: Optional[RunConfig] = None):
+        """
+        :param session: session sharing loaded tables across analyses, a new session if None
+        :param config: input files and thresholds of the run, the defaults if None
+        """
+        super().__init__(session, config)
 
+    @stage("plot")
     def plot_hyp_network(self, gene: str, output: str = None, dpi: int = 72):
         """Plot HYP network."""
-        hyp = self._infer_table[gene]
-        G = nx.DiGraph({gene: hyp})
-        # styling the graph
-        node_color_map = []
-        for node in G.nodes:
-            if node == gene:
-                node_color_map.append("orange")
-            elif hyp[node]["state_change"] == "increase":
-                node_color_map.append("darkred")
-            elif hyp[node]["state_change"] == "decrease":
-                node_color_map.append("darkgreen")
-            else:
-                node_color_map.append("lightgrey")
-        edge_color_map = []
-        edge_width_map = []
-        for edge in G.edges:
-            if hyp[edge[1]]["type"] is not None:
-                edge_width_map.append(5)
-                if hyp[edge[1]]["type"] == "correct" and hyp[edge[1]]["causal_rel"] == "inhibition":
-                    edge_color_map.append("green")
-                elif hyp[edge[1]]["type"] == "correct" and hyp[edge[1]]["causal_rel"] == "activation":
-                    edge_color_map.append("red")
-                else:
-                    edge_color_map.append("black")
-            else:
-                edge_width_map.append(1)
-                edge_color_map.append("lightgrey")
+        import matplotlib.pyplot as plt
+
+        from src.neurommsig.render import HYP_FIGURE_SIZE, draw_hyp_network
+
+        inference = self._inference
+        i = self._context.node_index[gene]
+        edges = slice(inference.indptr[i], inference.indptr[i + 1])
         # draw graph
-        fig = plt.figure(figsize=(10, 10), dpi=72)
-        G_pos = nx.spring_layout(G, k=0.1)
-        nx.draw_networkx(
-            G,
-            pos=G_pos,
-            node_color=node_color_map,
-            edge_color=edge_color_map,
-            width=edge_width_map,
-            arrowsize=10,
-            node_size=1500,
-            alpha=0.8,
+        fig, ax = plt.subplots(figsize=HYP_FIGURE_SIZE, dpi=72)
+        draw_hyp_network(
+            ax,
+            gene,
+            inference.nodes[inference.indices[edges]].tolist(),
+            inference.edge_states[edges],
+            inference.types[edges],
+            inference.relation_signs[edges],
         )
         # print to file
         if output:
@@ -299,63 +281,48 @@ class Graph(RCRstat):
             fig.savefig(output, dpi=dpi)
         return plt
 
+    @stage("plot")
+    def export_hyp_networks(self, output: str, **kwargs) -> list:
+        """
+        Plot the HYP networks of many upstream nodes to a multi-page PDF or a directory of images.
+        :param output: a ".pdf" file with one page per HYP network, or a directory of images
+        :param kwargs: keyword arguments of :func:`neurommsig.render.export_hyp_networks`
+        :return: gene symbols of the plotted upstream nodes
+        """
+        from src.neurommsig.render import export_hyp_networks
+
+        return export_hyp_networks(self, output, **kwargs)
+
+    @stage("layout")
+    def get_layout(self) -> np.ndarray:
+        """Return the positions of all nodes, computed once per KAM network and then cached."""
+        return get_layout(self._kam)
+
+    @stage("plot")
     def plot_ori_network(self, output: str = None, dpi: int = 72):
         """Plot pathway network."""
-        fig = plt.figure(figsize=(10, 10), dpi=dpi)
-        G_pos = nx.spring_layout(self._G, k=0.1)
-        nx.draw_networkx(
-            self._G, pos=G_pos, with_labels=True, node_color="orange", edge_color="grey", alpha=0.9
-        )
+        import matplotlib.pyplot as plt
+
+        from src.neurommsig.render import draw_original_network
+
+        fig, ax = plt.subplots(figsize=(10, 10), dpi=dpi)
+        draw_original_network(ax, self.get_layout(), self._inference)
         # print to file
         if output:
             self.__check_output(output)
             fig.savefig(output, dpi=dpi)
         return plt
 
+    @stage("plot")
     def plot_full_network(self, output: str = None, dpi: int = 72):
         """Mapping regulation relationship to pathway network."""
-        G = nx.DiGraph(self._infer_table)
-        # styling the graph
-        node_color_map = []
-        for node in G.nodes:
-            if self._weights[node] > 0:
-                node_color_map.append("yellow")
-            elif self._weights[node] < 0:
-                node_color_map.append("lightblue")
-            else:
-                node_color_map.append("lightgrey")
-        edge_color_map = []
-        edge_width_map = []
-        for edge in G.edges:
-            ups_node = edge[0]
-            downs_node = edge[1]
-            if (
-                self._infer_table[ups_node][downs_node]["type"] == "correct"
-                and self._infer_table[ups_node][downs_node]["causal_rel"] == "inhibition"
-            ):
-                edge_color_map.append("darkgreen")
-                edge_width_map.append(5)
-            elif (
-                self._infer_table[ups_node][downs_node]["type"] == "correct"
-                and self._infer_table[ups_node][downs_node]["causal_rel"] == "activation"
-            ):
-                edge_color_map.append("darkred")
-                edge_width_map.append(5)
-            else:
-                edge_color_map.append("lightgrey")
-                edge_width_map.append(1)
+        import matplotlib.pyplot as plt
+
+        from src.neurommsig.render import draw_full_network
+
         # draw graph
-        fig = plt.figure(figsize=(20, 20), dpi=dpi)
-        G_pos = nx.spring_layout(G, k=0.1)
-        nx.draw_networkx(
-            G,
-            pos=G_pos,
-            width=edge_width_map,
-            node_size=1000,
-            node_color=node_color_map,
-            edge_color=edge_color_map,
-            connectionstyle="arc3, rad = 0.1",
-        )
+        fig, ax = plt.subplots(figsize=(20, 20), dpi=dpi)
+        draw_full_network(ax, self.get_layout(), self._inference)
         # print to file
         if output:
             self.__check_output(output)
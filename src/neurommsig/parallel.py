@@ -0,0 +1,162 @@
+import logging
+import os
+from typing import Iterator, Optional, Union
+
+import pandas as pd
+
+from src.neurommsig.batch import read_contrasts, score_contrasts
+from src.neurommsig.config import RunConfig
+from src.neurommsig.inference import SparseInference
+from src.neurommsig.kam import DirectedKAM
+from src.neurommsig.pool import get_shared, iter_shared
+from src.neurommsig.preprocessing import get_state_matrix
+from src.neurommsig.reader import DataSession
+from src.neurommsig.results import StatTable, StatWriter
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def _score_task(task: tuple) -> StatTable:
+    """
+    Score one pathway against one chunk of contrasts.
+    :param task: pathway index, first and last (exclusive) contrast index
+    :return: statistics table of the chunk
+    """
+    pathway, start, stop = task
+    shared = get_shared()
+    kam = shared["kams"][pathway]
+    states = shared["states"][kam["rows"], start:stop]
+    inference = SparseInference(
+        kam["nodes"], kam["indptr"], kam["indices"], kam["relation_signs"], states
+    )
+    stat_table = score_contrasts(inference, shared["contrasts"][start:stop])
+    stat_table.insert(0, "pathway", kam["name"])
+    return stat_table
+
+
+class ParallelRCRstat:
+    """Get statistics of many pathways and expression contrasts on a process pool.
+
+    Work is sharded into (pathway, chunk of contrasts) tasks. The KAM arrays and the gene x
+    contrast state matrix are handed to each worker once through the pool initializer, so they
+    are inherited on fork and never pickled per task. Results are merged in task order.
+    """
+
+    def __init__(
+        self,
+        pathways: dict,
+        gene_sets: dict,
+        n_workers: Optional[int] = None,
+        chunk_size: int = 64,
+        config: Optional[RunConfig] = None,
+    ):
+        """
+        :param pathways: mapping of pathway name to its KAM network whose HYP networks have the
+            run depth, to its directed KAM network, or to a pathway with "source", "target" and
+            "relation" columns
+        :param gene_sets: mapping of contrast name to its gene set from a GEO experiment
+        :param n_workers: number of worker processes, the number of CPUs if None
+        :param chunk_size: number of contrasts scored per task
+        :param config: thresholds and HYP networks of the run, the defaults if None
+        """
+        config = RunConfig() if config is None else config
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be a positive integer.")
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+        kams = []
+        for name, pathway in pathways.items():
+            if isinstance(pathway, pd.DataFrame):
+                pathway = DirectedKAM.from_pathway(pathway)
+            if isinstance(pathway, DirectedKAM):
+                pathway = pathway.expand(config.depth, config.directed)
+            kam = pathway
+            kams.append(
+                {
+                    "name": name,
+                    "nodes": kam.nodes,
+                    "indptr": kam.indptr,
+                    "indices": kam.indices,
+                    "relation_signs": kam.relation_signs,
+                }
+            )
+        # one state matrix over the nodes of all pathways, each pathway selects its rows
+        genes = list(dict.fromkeys(node for kam in kams for node in kam["nodes"]))
+        states = get_state_matrix(gene_sets, genes, config.p_thred, config.fc_thred)
+        index = {gene: i for i, gene in enumerate(genes)}
+        for kam in kams:
+            kam["rows"] = [index[node] for node in kam["nodes"]]
+        self._shared = {
+            "kams": kams,
+            "states": states.to_numpy(),
+            "contrasts": list(states.columns),
+        }
+
+    @classmethod
+    def from_files(
+        cls,
+        pathway_files: list,
+        contrasts: Union[str, dict],
+        session: Optional[DataSession] = None,
+        config: Optional[RunConfig] = None,
+        **kwargs,
+    ) -> "ParallelRCRstat":
+        """
+        Read pathways and GEO top tables from files.
+        :param pathway_files: paths to pathway files
+        :param contrasts: mapping of contrast name to GEO top table path, or a directory or
+            manifest of GEO top tables
+        :param session: session sharing loaded tables across analyses, a new session if None
+        :param config: mapping file and thresholds of the run, the defaults if None
+        :param kwargs: keyword arguments of :class:`ParallelRCRstat`
+        :return: parallel runner
+        """
+        session = DataSession() if session is None else session
+        config = RunConfig() if config is None else config
+        if isinstance(contrasts, str):
+            contrasts = read_contrasts(contrasts)
+        kams = session.get_kams(pathway_files, config.mapping_file, config.depth, config.directed)
+        pathways = {os.path.splitext(os.path.basename(path))[0]: kam for path, kam in kams.items()}
+        gene_sets = {
+            name: session.get_gene_set(path, config.p_thred, config.fc_thred)
+            for name, path in contrasts.items()
+        }
+        return cls(pathways, gene_sets, config=config, **kwargs)
+
+    def _tasks(self) -> list:
+        """Shard the work into (pathway, first contrast, last contrast) tasks."""
+        n_contrasts = len(self._shared["contrasts"])
+        return [
+            (pathway, start, min(start + self.chunk_size, n_contrasts))
+            for pathway in range(len(self._shared["kams"]))
+            for start in range(0, n_contrasts, self.chunk_size)
+        ]
+
+    def get_stat(self, output: str = None) -> pd.DataFrame:
+        """
+        Get the statistics of all upstream nodes of all pathways in all contrasts.
+        :param output: path to write the combined statistics table, as TSV, Parquet or Arrow
+            depending on its extension
+        :return: statistics table with one row per pathway, contrast and upstream node
+        """
+        return StatTable.concat(self.iter_stat(output)).to_frame()
+
+    def iter_stat(self, output: str = None) -> Iterator[StatTable]:
+        """
+        Score the tasks, yielding and writing the statistics of each one as soon as it is done.
+        :param output: path to stream the combined statistics table to, as TSV, Parquet or Arrow
+            depending on its extension
+        :return: iterator of statistics tables, one per task in task order
+        """
+        tasks = self._tasks()
+        logger.info(f"Scoring {len(tasks)} tasks on {self.n_workers} workers.")
+        results = iter_shared(_score_task, tasks, self._shared, self.n_workers)
+        if not output:
+            yield from results
+            return
+        with StatWriter(output) as writer:
+            for stat_table in results:
+                writer.write(stat_table)
+                yield stat_table
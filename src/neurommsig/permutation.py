@@ -0,0 +1,113 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from src.neurommsig.inference import CausalInference, SparseInference
+from src.neurommsig.pool import get_shared, map_shared
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# number of permutations generated and scored at once
+PERMUTATION_CHUNK_SIZE = 100
+# relative tolerance when comparing permuted and observed statistics
+RELATIVE_TOLERANCE = 1e-9
+
+
+def _permutation_chunk(states: np.ndarray, seed: int, chunk: int, size: int) -> np.ndarray:
+    """Shuffle the node states of one chunk of permutations, seeded by the chunk index."""
+    rng = np.random.default_rng([seed, chunk])
+    return rng.permuted(np.tile(states, (size, 1)), axis=1)
+
+
+def _chunks(n_perm: int) -> list:
+    """Split permutations into (chunk index, chunk size) tasks."""
+    return [
+        (chunk, min(PERMUTATION_CHUNK_SIZE, n_perm - start))
+        for chunk, start in enumerate(range(0, n_perm, PERMUTATION_CHUNK_SIZE))
+    ]
+
+
+def permute_states(states: np.ndarray, n_perm: int, seed: int = 0) -> np.ndarray:
+    """
+    Generate permutations of node state labels.
+    :param states: state change code of each node
+    :param n_perm: number of permutations
+    :param seed: random seed
+    :return: (n_perm x n_nodes) matrix of permuted state codes
+    """
+    return np.vstack(
+        [_permutation_chunk(states, seed, chunk, size) for chunk, size in _chunks(n_perm)]
+        or [np.empty((0, len(states)), dtype=states.dtype)]
+    )
+
+
+def _count_extremes(task: tuple) -> np.ndarray:
+    """
+    Score one chunk of permutations.
+    :param task: chunk index and number of permutations in the chunk
+    :return: number of permutations at least as extreme as observed, per node and statistic
+    """
+    chunk, size = task
+    shared = get_shared()
+    inference = shared["inference"]
+    perms = _permutation_chunk(inference.states, shared["seed"], chunk, size)
+    null = inference.with_states(perms.T)
+    observed = shared["observed"] * (1 + RELATIVE_TOLERANCE)
+    # undefined statistics in a permutation never count as extreme
+    return np.stack(
+        [
+            (null.get_concordance() <= observed[:, [0]]).sum(axis=1),
+            (null.get_richness() <= observed[:, [1]]).sum(axis=1),
+        ],
+        axis=1,
+    )
+
+
+def fdr(pvalues: np.ndarray) -> np.ndarray:
+    """
+    Adjust p-values for multiple testing with the Benjamini-Hochberg procedure.
+    :param pvalues: p-values, NaN values are ignored
+    :return: false discovery rates, NaN where the p-value is NaN
+    """
+    pvalues = np.asarray(pvalues, dtype=float)
+    qvalues = np.full(pvalues.shape, np.nan)
+    tested = np.flatnonzero(~np.isnan(pvalues))
+    order = tested[np.argsort(pvalues[tested])]
+    ranked = pvalues[order] * len(order) / np.arange(1, len(order) + 1)
+    qvalues[order] = np.minimum.accumulate(ranked[::-1])[::-1].clip(max=1)
+    return qvalues
+
+
+def permutation_test(
+    inference: CausalInference, n_perm: int = 1000, seed: int = 0, n_workers: int = 1
+) -> pd.DataFrame:
+    """
+    Estimate empirical p-values of concordance and richness by permuting node state labels.
+    :param inference: observed causal inference with a state vector
+    :param n_perm: number of permutations
+    :param seed: random seed, results do not depend on the number of workers
+    :param n_workers: number of worker processes
+    :return: empirical p-values and false discovery rates per upstream node
+    """
+    if n_perm < 1:
+        raise ValueError("n_perm must be a positive integer.")
+    if n_workers < 1:
+        raise ValueError("n_workers must be a positive integer.")
+    observed = np.stack([inference.get_concordance(), inference.get_richness()], axis=1)
+    # permutations only need the statistics, not the inference of each edge
+    inference = SparseInference.from_inference(inference)
+    shared = {"inference": inference, "observed": observed, "seed": seed}
+    logger.info(f"Scoring {n_perm} permutations on {n_workers} workers.")
+    counts = sum(map_shared(_count_extremes, _chunks(n_perm), shared, n_workers))
+    pvalues = np.where(np.isnan(observed), np.nan, (counts + 1) / (n_perm + 1))
+    return pd.DataFrame(
+        {
+            "concordance_pvalue": pvalues[:, 0],
+            "concordance_fdr": fdr(pvalues[:, 0]),
+            "richness_pvalue": pvalues[:, 1],
+            "richness_fdr": fdr(pvalues[:, 1]),
+        },
+        index=pd.Index(inference.nodes, name="gene"),
+    )
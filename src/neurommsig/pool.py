@@ -0,0 +1,73 @@
+import multiprocessing as mp
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator
+
+# read-only data of the current run, set once per worker process
+_SHARED: dict = dict()
+# read-only data of the task running in this thread, when tasks run in the calling process
+_local = threading.local()
+
+
+def _init_worker(shared: dict):
+    """Install the read-only data of a run in a worker process."""
+    _SHARED.clear()
+    _SHARED.update(shared)
+
+
+def get_shared() -> dict:
+    """Return the read-only data of the current run."""
+    shared = getattr(_local, "shared", None)
+    return _SHARED if shared is None else shared
+
+
+def map_shared(func: Callable, tasks: list, shared: dict, n_workers: int = 1) -> list:
+    """
+    Map a function over tasks on a process pool whose workers hold read-only shared data.
+
+    The shared data is handed to each worker once through the pool initializer, so it is inherited
+    on fork and never pickled per task. Tasks should only carry small indices into it. Forking a
+    process that runs other threads can deadlock the workers, so pools started while other threads
+    are alive, e.g. from the job server, use a forkserver and pickle the shared data once per worker.
+    :param func: module-level function of a task, reading the shared data with :func:`get_shared`
+    :param tasks: picklable tasks
+    :param shared: read-only data of the run
+    :param n_workers: number of worker processes, tasks run in this process if 1
+    :return: results in task order
+    """
+    return list(iter_shared(func, tasks, shared, n_workers))
+
+
+def iter_shared(func: Callable, tasks: list, shared: dict, n_workers: int = 1) -> Iterator:
+    """
+    Like :func:`map_shared`, but yield each result as soon as it and all earlier ones are done.
+    :param func: module-level function of a task, reading the shared data with :func:`get_shared`
+    :param tasks: picklable tasks
+    :param shared: read-only data of the run
+    :param n_workers: number of worker processes, tasks run in this process if 1
+    :return: iterator of results in task order
+    """
+    if n_workers == 1:
+        yield from _iter_local(func, tasks, shared)
+        return
+    methods = mp.get_all_start_methods()
+    if threading.active_count() > 1 and "forkserver" in methods:
+        context = mp.get_context("forkserver")
+    else:
+        context = mp.get_context("fork" if "fork" in methods else None)
+    with ProcessPoolExecutor(
+        max_workers=n_workers, mp_context=context, initializer=_init_worker, initargs=(shared,)
+    ) as executor:
+        yield from executor.map(func, tasks)
+
+
+def _iter_local(func: Callable, tasks: list, shared: dict) -> Iterator:
+    """Run tasks in this process, exposing the shared data to each call in this thread only."""
+    for task in tasks:
+        previous = getattr(_local, "shared", None)
+        _local.shared = shared
+        try:
+            result = func(task)
+        finally:
+            _local.shared = previous
+        yield result
@@ -1,31 +1,170 @@
 import logging
+from typing import Iterable, Optional
 
+import numpy as np
+import pandas as pd
+
+from src.neurommsig.config import RunConfig
 from src.neurommsig.constants import FC_THRED, P_THRED
-from src.neurommsig.reader import DataReader
+from src.neurommsig.inference import STATE_CODES
+from src.neurommsig.profiling import stage
+from src.neurommsig.reader import DataReader, DataSession, regulation_masks
+from src.neurommsig.vocabulary import SymbolVocabulary
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
+def get_state_matrix(
+    gene_sets: dict, nodes: Iterable[str], p_thred: float = P_THRED, fc_thred: float = FC_THRED
+) -> pd.DataFrame:
+    """
+    Encode the state changes of many experiments as a gene x contrast matrix.
+    :param gene_sets: mapping of contrast name to its gene set from a GEO experiment
+    :param nodes: gene symbols of the network nodes, the rows of the matrix
+    :param p_thred: adjusted p-value below which a gene is significant
+    :param fc_thred: absolute log fold change above which a significant gene is regulated
+    :return: matrix of +1 (increase), -1 (decrease) and 0 (no change)
+    """
+    genes = pd.concat(gene_sets, names=["contrast", None])
+    genes = genes.reset_index(level="contrast").reset_index(drop=True)
+    upregu, downregu = regulation_masks(genes, p_thred, fc_thred)
+    regulated = pd.DataFrame(
+        {
+            "upregu": upregu,
+            "downregu": downregu,
+            "gene": genes.gene_symbol,
+            "contrast": genes.contrast,
+        }
+    )[upregu | downregu]
+    # a gene listed as both up- and down-regulated counts as up-regulated
+    flags = regulated.groupby(["gene", "contrast"], sort=False, observed=True)[
+        ["upregu", "downregu"]
+    ].any()
+    states = pd.Series(np.where(flags.upregu, 1, -1), index=flags.index, dtype=np.int8)
+    return (
+        states.unstack("contrast")
+        .reindex(index=list(nodes), columns=list(gene_sets), fill_value=0)
+        .fillna(0)
+        .astype(np.int8)
+    )
+
+
+class RegulationContext:
+    """Regulated genes of an experiment, indexed against the nodes of a network.
+
+    Genes are held as ids of a :class:`SymbolVocabulary`, and the state changes of the nodes as a
+    vector of +1 (increase), -1 (decrease) and 0 (no change) in node index order.
+    """
+
+    def __init__(
+        self,
+        upregu_genes: Iterable[str],
+        downregu_genes: Iterable[str],
+        nodes: Iterable[str] = (),
+        vocabulary: Optional[SymbolVocabulary] = None,
+    ):
+        """
+        :param upregu_genes: up-regulated gene symbols
+        :param downregu_genes: down-regulated gene symbols
+        :param nodes: gene symbols of the network nodes
+        :param vocabulary: vocabulary of gene symbols, a new vocabulary if None
+        """
+        self.vocabulary = SymbolVocabulary() if vocabulary is None else vocabulary
+        self.upregu_ids = set(self.vocabulary.encode(upregu_genes).tolist())
+        self.downregu_ids = set(self.vocabulary.encode(downregu_genes).tolist())
+        self.n_upregu = len(self.upregu_ids)
+        self.n_downregu = len(self.downregu_ids)
+        nodes = list(nodes)
+        self.node_ids = self.vocabulary.encode(nodes)
+        self.node_index = {node: i for i, node in enumerate(nodes)}
+        # a gene listed as both up- and down-regulated counts as up-regulated
+        self.states = np.zeros(len(nodes), dtype=np.int8)
+        self.states[np.isin(self.node_ids, list(self.downregu_ids))] = STATE_CODES["decrease"]
+        self.states[np.isin(self.node_ids, list(self.upregu_ids))] = STATE_CODES["increase"]
+        # full set parameters: number of nodes and number of nodes with a state change
+        self.n_nodes = len(self.node_index)
+        self.n_regulated = int(np.count_nonzero(self.states))
+
+    @property
+    def upregu_genes(self) -> set:
+        """Up-regulated gene symbols."""
+        return set(self.vocabulary.decode(list(self.upregu_ids)).tolist())
+
+    @property
+    def downregu_genes(self) -> set:
+        """Down-regulated gene symbols."""
+        return set(self.vocabulary.decode(list(self.downregu_ids)).tolist())
+
+    def which_state_change(self, gene: str) -> Optional[str]:
+        """
+        Return the state change of a gene.
+        :param gene: gene symbol
+        :return: "increase", "decrease" or None if the gene is not regulated
+        """
+        gene_id = self.vocabulary.get_id(gene)
+        if gene_id in self.upregu_ids:
+            return "increase"
+        elif gene_id in self.downregu_ids:
+            return "decrease"
+        else:
+            return None
+
+    def set_state_change(self, gene: str, state: Optional[str]):
+        """
+        Change the state of a gene, keeping the counts of regulated genes and nodes up to date.
+        :param gene: gene symbol
+        :param state: "increase", "decrease" or None if the gene is not regulated
+        """
+        if state not in ("increase", "decrease", None):
+            raise ValueError(f"Unknown state change {state!r} of {gene}.")
+        was_regulated = self.which_state_change(gene) is not None
+        gene_id = int(self.vocabulary.encode([gene])[0])
+        self.upregu_ids.discard(gene_id)
+        self.downregu_ids.discard(gene_id)
+        if state == "increase":
+            self.upregu_ids.add(gene_id)
+        elif state == "decrease":
+            self.downregu_ids.add(gene_id)
+        self.n_upregu = len(self.upregu_ids)
+        self.n_downregu = len(self.downregu_ids)
+        if gene in self.node_index:
+            self.states[self.node_index[gene]] = STATE_CODES[state]
+            self.n_regulated += (state is not None) - was_regulated
+
+
 class PreProcessing:
     """Pre-processing dataframe of user input."""
 
-    def __init__(self):
-        reader = DataReader()
-        self._gene_set = reader.get_gene_set()
+    def __init__(
+        self,
+        gene_set: Optional[pd.DataFrame] = None,
+        session: Optional[DataSession] = None,
+        config: Optional[RunConfig] = None,
+    ):
+        """
+        :param gene_set: gene set from a GEO experiment, read from the GEO file if not given
+        :param session: session sharing loaded tables and the vocabulary of gene symbols
+        :param config: GEO file and thresholds of the run, the defaults if None
+        """
+        self.__config = RunConfig() if config is None else config
+        self.__session = DataSession() if session is None else session
+        if gene_set is None:
+            gene_set = DataReader.from_config(self.__config, self.__session).get_gene_set()
+        self._gene_set = gene_set
         self._upregu_genes = None
         self._downregu_genes = None
 
         self.__ext_regu_genes()
 
+    @stage("preprocessing")
     def __ext_regu_genes(self):
         """Extract up- and down-regulated genes"""
-        self._upregu_genes = self._gene_set.gene_symbol[
-            (self._gene_set["p_value"] < P_THRED) & (self._gene_set["log_fold_change"] > FC_THRED)
-        ].tolist()
-        self._downregu_genes = self._gene_set.gene_symbol[
-            (self._gene_set["p_value"] < P_THRED) & (self._gene_set["log_fold_change"] < -FC_THRED)
-        ].tolist()
+        upregu, downregu = regulation_masks(
+            self._gene_set, self.__config.p_thred, self.__config.fc_thred
+        )
+        self._upregu_genes = self._gene_set.gene_symbol[upregu].tolist()
+        self._downregu_genes = self._gene_set.gene_symbol[downregu].tolist()
 
     def get_upregu_genes(self):
         """Return up-regulated genes."""
@@ -34,3 +173,14 @@ class PreProcessing:
     def get_downregu_genes(self):
         """Return down-regulated genes."""
         return self._downregu_genes
+
+    @stage("context")
+    def get_context(self, nodes: Iterable[str] = ()) -> RegulationContext:
+        """
+        Return the regulated genes indexed against network nodes.
+        :param nodes: gene symbols of the network nodes
+        :return: regulation context
+        """
+        return RegulationContext(
+            self._upregu_genes, self._downregu_genes, nodes, self.__session.vocabulary
+        )
@@ -0,0 +1,201 @@
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# profilers of a whole recorded run
+PROFILERS = ("cprofile", "pyinstrument")
+
+# recorder of the current thread or task, stages run outside of a recording are not measured
+_recorder: contextvars.ContextVar = contextvars.ContextVar("recorder", default=None)
+# tracemalloc is process-wide: it is started by the first recorder tracing memory and stopped by
+# the last one, unless it was already tracing before
+_tracing_lock = threading.Lock()
+_tracers = {"recorders": 0, "started": False}
+
+
+class StageRecorder:
+    """Time and peak memory of the stages of a run, e.g. reading, KAM building and inference.
+
+    Stages are recorded by :func:`stage` while the recorder is active, see :func:`record`. A stage
+    run inside another one is named by the path of both, e.g. ``"kam/merge"``, and
+    repeated stages are summed into one entry.
+
+    Peak memory is traced for the whole process, so recorders running concurrently in other
+    threads count each other's allocations and reset each other's peaks; measure memory of one run
+    at a time for exact peaks.
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        """
+        :param trace_memory: whether to trace the peak memory allocated by each stage with
+            tracemalloc, which slows down allocations
+        """
+        self.trace_memory = trace_memory
+        self._stages: Dict[str, dict] = dict()
+        # stage path, start time, traced memory at the start and peak so far of each open stage
+        self._open = []
+        self._traces = False
+        self._start = None
+        self.seconds = None
+
+    def start(self):
+        """Start recording."""
+        if self.trace_memory:
+            with _tracing_lock:
+                if _tracers["recorders"] == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _tracers["started"] = True
+                _tracers["recorders"] += 1
+            self._traces = True
+        self._start = time.perf_counter()
+
+    def stop(self):
+        """Stop recording."""
+        self.seconds = time.perf_counter() - self._start
+        if self._traces:
+            with _tracing_lock:
+                _tracers["recorders"] -= 1
+                if _tracers["recorders"] == 0 and _tracers["started"]:
+                    tracemalloc.stop()
+                    _tracers["started"] = False
+            self._traces = False
+
+    def _tracing(self) -> bool:
+        # peaks of nested stages need the peak to be reset, from Python 3.9
+        return tracemalloc.is_tracing() and hasattr(tracemalloc, "reset_peak")
+
+    def enter(self, name: str):
+        """Open a stage."""
+        path = "/".join([frame[0] for frame in self._open[-1:]] + [name])
+        current = None
+        if self._tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if self._open:
+                self._open[-1][3] = max(self._open[-1][3], peak)
+            tracemalloc.reset_peak()
+        self._open.append([path, time.perf_counter(), current, current])
+
+    def exit(self):
+        """Close the innermost open stage and add its measurements."""
+        path, start, current, peak = self._open.pop()
+        seconds = time.perf_counter() - start
+        entry = self._stages.setdefault(path, {"stage": path, "calls": 0, "seconds": 0.0})
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+        if current is not None and self._tracing():
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            entry["peak_mib"] = max(entry.get("peak_mib", 0.0), (peak - current) / 2**20)
+            if self._open:
+                self._open[-1][3] = max(self._open[-1][3], peak)
+
+    def to_dict(self) -> dict:
+        """Return the measurements of all stages, in order of first run."""
+        return {
+            "seconds": self.seconds,
+            "stages": [dict(entry) for entry in self._stages.values()],
+        }
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Measure a stage of a run with the active recorder, doing nothing if none is active.
+    Can also decorate a function or method, measuring every call.
+    :param name: name of the stage
+    """
+    recorder: Optional[StageRecorder] = _recorder.get()
+    if recorder is None:
+        yield
+        return
+    recorder.enter(name)
+    try:
+        yield
+    finally:
+        recorder.exit()
+
+
+def get_recorder() -> Optional[StageRecorder]:
+    """Return the active recorder, None if no run is recorded."""
+    return _recorder.get()
+
+
+@contextmanager
+def record(
+    report: Optional[str] = None,
+    callback: Optional[Callable[[dict], None]] = None,
+    profile: Optional[str] = None,
+    profiler: str = "cprofile",
+    trace_memory: bool = True,
+    labels: Optional[dict] = None,
+) -> Iterator[StageRecorder]:
+    """
+    Record the stages run within the block, e.g. by :class:`neurommsig.neurommsig.RCRstat`.
+    The metrics are reported once the block exits, also when it raises.
+    :param report: path of a JSON file to write the metrics to, not written if None
+    :param callback: function called with the metrics, e.g. to send them to a scheduler
+    :param profile: path to dump a profile of the whole block to, not profiled if None
+    :param profiler: "cprofile" for a pstats dump, or "pyinstrument" for an HTML page if the
+        path ends with ".html" and a text report otherwise
+    :param trace_memory: whether to trace the peak memory allocated by each stage
+    :param labels: values added to the metrics, e.g. the job id and input files
+    :return: the recorder
+    """
+    if profiler not in PROFILERS:
+        raise ValueError(f'Profiler must be one of {", ".join(PROFILERS)}!')
+    recorder = StageRecorder(trace_memory)
+    active = None
+    if profile and profiler == "cprofile":
+        active = cProfile.Profile()
+    elif profile:
+        try:
+            from pyinstrument import Profiler
+        except ImportError as e:
+            raise ImportError("Profiling with pyinstrument requires pyinstrument.") from e
+        active = Profiler()
+    token = _recorder.set(recorder)
+    recorder.start()
+    if isinstance(active, cProfile.Profile):
+        active.enable()
+    elif active is not None:
+        active.start()
+    try:
+        yield recorder
+    finally:
+        if isinstance(active, cProfile.Profile):
+            active.disable()
+        elif active is not None:
+            active.stop()
+        recorder.stop()
+        _recorder.reset(token)
+        metrics = {**(labels or {}), **recorder.to_dict()}
+        if active is not None:
+            _dump_profile(active, profile)
+        if report:
+            directory = os.path.dirname(report)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(report, "w") as file:
+                json.dump(metrics, file, indent=2)
+            logger.info(f"Metrics written to {report}.")
+        if callback is not None:
+            callback(metrics)
+
+
+def _dump_profile(active, path: str):
+    """Write the profile of a recorded run."""
+    if isinstance(active, cProfile.Profile):
+        active.dump_stats(path)
+    else:
+        with open(path, "w") as file:
+            file.write(active.output_html() if path.endswith(".html") else active.output_text())
+    logger.info(f"Profile written to {path}.")
@@ -1,63 +1,454 @@
 import logging
+import os
+from collections import Counter
+from typing import Callable, Optional, Sequence, Tuple
 
+import numpy as np
 import pandas as pd
 
+from src.neurommsig import cache
+from src.neurommsig.config import RunConfig
 from src.neurommsig.constants import (
+    FC_THRED,
     GEO_FILE,
     GEO_FILE_COLS,
+    HYP_DEPTH,
+    HYP_DIRECTED,
     MAPPING_FILE,
     MAPPING_FILE_COLS,
+    P_THRED,
     PATHWAY_FILE,
     PATHWAY_FILE_COLS,
 )
+from src.neurommsig.kam import KAM, DirectedKAM
+from src.neurommsig.mapping import EdgeIndex
+from src.neurommsig.profiling import stage
+from src.neurommsig.vocabulary import SymbolVocabulary
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# number of rows parsed at once when streaming GEO top tables
+GEO_CHUNK_SIZE: int = 100000
+# dtypes of the GEO top table columns, floats stay 64-bit so thresholds compare exactly
+GEO_FILE_DTYPES: dict = {"Gene.symbol": "object", "logFC": "float64", "adj.P.Val": "float64"}
+
+
+def regulation_masks(
+    gene_set: pd.DataFrame, p_thred: float = P_THRED, fc_thred: float = FC_THRED
+) -> Tuple[pd.Series, pd.Series]:
+    """
+    Return masks of up- and down-regulated rows of a gene set.
+    :param gene_set: gene set from a GEO experiment
+    :param p_thred: adjusted p-value below which a gene is significant
+    :param fc_thred: absolute log fold change above which a significant gene is regulated
+    :return: up-regulated and down-regulated masks
+    """
+    significant = gene_set["p_value"] < p_thred
+    upregu = significant & (gene_set["log_fold_change"] > fc_thred)
+    downregu = significant & (gene_set["log_fold_change"] < -fc_thred)
+    return upregu, downregu
+
+
+class DataSession:
+    """Tables loaded from files, shared by all readers and analyses given the same session.
+
+    Every file is parsed at most once per session and every merged pathway and KAM network is
+    derived at most once per pair of pathway and mapping files. Gene symbols of all tables are
+    interned in one :class:`SymbolVocabulary`, as categoricals whose codes are vocabulary ids. Use
+    one session for many analyses in one process, and :meth:`clear` it to release the tables.
+    """
 
-class DataReader:
     def __init__(self):
-        self.__gene_file = GEO_FILE
-        self.__mapping_file = MAPPING_FILE
-        self.__pathway_file = PATHWAY_FILE
+        self._tables = dict()
+        # number of times each file was parsed, by absolute path
+        self.file_reads = Counter()
+        self.vocabulary = SymbolVocabulary()
+
+    def __get(self, kind: str, key: tuple, load: Callable):
+        """Return a memoized table, loading it on first access."""
+        if (kind, key) not in self._tables:
+            self._tables[kind, key] = load()
+        return self._tables[kind, key]
+
+    def __intern(self, table: pd.DataFrame, cols: tuple) -> pd.DataFrame:
+        """Replace the gene symbol columns of a table by categoricals of vocabulary ids."""
+        return table.assign(**{col: self.vocabulary.categorical(table[col]) for col in cols})
+
+    def __read(self, kind: str, path: str, read: Callable, cols: tuple, *args) -> pd.DataFrame:
+        path = os.path.abspath(path)
+
+        def load():
+            self.file_reads[path] += 1
+            with stage(f"read_{kind}"):
+                return self.__intern(read(path, *args), cols)
+
+        return self.__get(kind, (path, *args), load)
+
+    def get_gene_set(
+        self, path: str, p_thred: float = P_THRED, fc_thred: float = FC_THRED
+    ) -> pd.DataFrame:
+        """
+        Return the regulated genes of a GEO top table of differential expression.
+        :param path: path to the GEO top table
+        :param p_thred: adjusted p-value below which a gene is significant
+        :param fc_thred: absolute log fold change above which a significant gene is regulated
+        :return: dataframe with standard column names
+        """
+        return self.__read(
+            "gene_set", path, DataReader.read_geo_file, ("gene_symbol",), p_thred, fc_thred
+        )
+
+    def get_pathway_data(self, path: str) -> pd.DataFrame:
+        """
+        Return the interactions of a pathway file.
+        :param path: path to the pathway file
+        :return: dataframe with "source", "interaction" and "target" columns
+        """
+        return self.__read("pathway_data", path, DataReader.read_pathway_file, ("source", "target"))
+
+    def get_mapping_data(self, path: str) -> pd.DataFrame:
+        """
+        Return a gene interaction map.
+        :param path: path to the gene interaction map
+        :return: dataframe with "source", "target" and "relation" columns
+        """
+        return self.__read("mapping_data", path, DataReader.read_mapping_file, ("source", "target"))
+
+    def get_digest(self, pathway_file: str, mapping_file: str) -> str:
+        """Return the digest of a pathway and a mapping file, keying their cache entries."""
+        key = (os.path.abspath(pathway_file), os.path.abspath(mapping_file))
+        return self.__get("digest", key, lambda: cache.file_digest(*key))
+
+    def get_edge_index(self, mapping_file: str) -> EdgeIndex:
+        """
+        Return the relations of a gene interaction map indexed by (source, target) ids.
+        :param mapping_file: path to the gene interaction map
+        :return: edge index
+        """
+        return self.__get(
+            "edge_index",
+            (os.path.abspath(mapping_file),),
+            lambda: EdgeIndex.from_mapping(self.get_mapping_data(mapping_file)),
+        )
+
+    def get_pathway(self, pathway_file: str, mapping_file: str) -> pd.DataFrame:
+        """
+        Return a pathway with the relations of the gene interaction map.
+        :param pathway_file: path to the pathway file
+        :param mapping_file: path to the gene interaction map
+        :return: dataframe with "source", "target" and "relation" columns
+        """
+        return self.get_pathways([pathway_file], mapping_file)[pathway_file]
+
+    @stage("merge")
+    def get_pathways(self, pathway_files: Sequence[str], mapping_file: str) -> dict:
+        """
+        Return many pathways with the relations of the gene interaction map.
+        The pathways missing from the session and the cache are looked up in the edge index of the
+        map in one batch.
+        :param pathway_files: paths to pathway files
+        :param mapping_file: path to the gene interaction map
+        :return: mapping of pathway file to a dataframe with "source", "target" and "relation"
+            columns
+        """
+        keys = {
+            path: (os.path.abspath(path), os.path.abspath(mapping_file)) for path in pathway_files
+        }
+        missing = []
+        for path, key in keys.items():
+            if ("pathway", key) in self._tables:
+                continue
+            # a cached merged pathway skips parsing the pathway and mapping files
+            pathway = None
+            if cache.is_enabled():
+                pathway = cache.load_pathway(self.get_digest(path, mapping_file))
+            if pathway is None:
+                missing.append(path)
+            else:
+                self._tables["pathway", key] = self.__intern(pathway, ("source", "target"))
+        if missing:
+            pathway_data = [self.get_pathway_data(path) for path in missing]
+            sources, targets = (
+                np.concatenate([data[col].cat.codes.to_numpy(np.int64) for data in pathway_data])
+                for col in ("source", "target")
+            )
+            rows, relations = self.get_edge_index(mapping_file).lookup(sources, targets)
+            # result rows follow pair order, so the rows of each pathway are contiguous
+            offsets = np.cumsum([0] + [len(data) for data in pathway_data])
+            bounds = np.searchsorted(rows, offsets)
+            categories = self.vocabulary.symbols
+            for path, start, stop in zip(missing, bounds[:-1], bounds[1:]):
+                merged = (
+                    pd.DataFrame(
+                        {
+                            "source": sources[rows[start:stop]],
+                            "target": targets[rows[start:stop]],
+                            "relation": relations[start:stop],
+                        }
+                    )
+                    .drop_duplicates()
+                    .reset_index(drop=True)
+                )
+                pathway = merged.assign(
+                    **{
+                        col: pd.Categorical.from_codes(merged[col], categories=categories)
+                        for col in ("source", "target")
+                    }
+                )
+                if cache.is_enabled():
+                    cache.save_pathway(self.get_digest(path, mapping_file), pathway)
+                self._tables["pathway", keys[path]] = pathway
+        return {path: self._tables["pathway", key] for path, key in keys.items()}
+
+    def get_directed_kam(self, pathway_file: str, mapping_file: str) -> DirectedKAM:
+        """
+        Return the directed KAM network of a pathway, keeping every relation of every edge.
+        :param pathway_file: path to the pathway file
+        :param mapping_file: path to the gene interaction map
+        :return: directed KAM network
+        """
+        key = (os.path.abspath(pathway_file), os.path.abspath(mapping_file))
+        return self.__get(
+            "directed_kam",
+            key,
+            lambda: DirectedKAM.from_pathway(self.get_pathway(pathway_file, mapping_file)),
+        )
+
+    def get_kam(
+        self,
+        pathway_file: str,
+        mapping_file: str,
+        depth: int = HYP_DEPTH,
+        directed: bool = HYP_DIRECTED,
+    ) -> KAM:
+        """
+        Return the KAM network of a pathway, from the cache if its files are unchanged.
+        :param pathway_file: path to the pathway file
+        :param mapping_file: path to the gene interaction map
+        :param depth: number of causal steps covered by the HYP networks
+        :param directed: whether HYP networks hold only the targets of an upstream node
+        :return: KAM network
+        """
+        key = (os.path.abspath(pathway_file), os.path.abspath(mapping_file))
+        if depth != 1 or directed:
+            # multi-hop and directed HYP networks follow the edges of the directed KAM network
+            return self.__get(
+                "kam",
+                (*key, depth, directed),
+                lambda: self.get_directed_kam(pathway_file, mapping_file).expand(depth, directed),
+            )
+
+        @stage("kam")
+        def load():
+            if cache.is_enabled():
+                kam = cache.load_kam(self.get_digest(pathway_file, mapping_file))
+                if kam is not None:
+                    return kam
+            kam = self.get_directed_kam(pathway_file, mapping_file).to_kam()
+            if cache.is_enabled():
+                cache.save_kam(self.get_digest(pathway_file, mapping_file), kam)
+            return kam
+
+        return self.__get("kam", key, load)
+
+    def get_kams(
+        self,
+        pathway_files: Sequence[str],
+        mapping_file: str,
+        depth: int = HYP_DEPTH,
+        directed: bool = HYP_DIRECTED,
+    ) -> dict:
+        """
+        Return the KAM networks of many pathways.
+        Networks missing from the session and the cache are derived from pathways joined to the
+        gene interaction map in one batch.
+        :param pathway_files: paths to pathway files
+        :param mapping_file: path to the gene interaction map
+        :param depth: number of causal steps covered by the HYP networks
+        :param directed: whether HYP networks hold only the targets of an upstream node
+        :return: mapping of pathway file to its KAM network
+        """
+        uncached = []
+        for path in pathway_files:
+            key = (os.path.abspath(path), os.path.abspath(mapping_file))
+            if depth != 1 or directed:
+                # these networks are not cached on disk, they need the merged pathway
+                if ("directed_kam", key) not in self._tables:
+                    uncached.append(path)
+                continue
+            if ("kam", key) in self._tables:
+                continue
+            kam = None
+            if cache.is_enabled():
+                kam = cache.load_kam(self.get_digest(path, mapping_file))
+            if kam is None:
+                uncached.append(path)
+            else:
+                self._tables["kam", key] = kam
+        self.get_pathways(uncached, mapping_file)
+        return {path: self.get_kam(path, mapping_file, depth, directed) for path in pathway_files}
+
+    def release(self, pathway_file: str):
+        """
+        Release the tables of a pathway file and the networks derived from it, keeping the gene
+        interaction maps and GEO top tables.
+        :param pathway_file: path to the pathway file
+        """
+        path = os.path.abspath(pathway_file)
+        for kind, key in list(self._tables):
+            if key[:1] == (path,):
+                del self._tables[kind, key]
+
+    def clear(self):
+        """Release all loaded tables, keeping the ids of the vocabulary."""
+        self._tables.clear()
+
+
+class DataReader:
+    def __init__(
+        self,
+        gene_file: Optional[str] = GEO_FILE,
+        pathway_file: str = PATHWAY_FILE,
+        mapping_file: str = MAPPING_FILE,
+        session: Optional[DataSession] = None,
+        p_thred: float = P_THRED,
+        fc_thred: float = FC_THRED,
+        depth: int = HYP_DEPTH,
+        directed: bool = HYP_DIRECTED,
+    ):
+        """
+        :param gene_file: path to a GEO top table, None to only read the pathway
+        :param pathway_file: path to the pathway file
+        :param mapping_file: path to the gene interaction map
+        :param session: session sharing loaded tables, a new session if None
+        :param p_thred: adjusted p-value below which a gene is significant
+        :param fc_thred: absolute log fold change above which a significant gene is regulated
+        :param depth: number of causal steps covered by the HYP networks of :meth:`get_kam`
+        :param directed: whether the HYP networks of :meth:`get_kam` hold only the targets of an
+            upstream node
+        """
+        self.__gene_file = gene_file
+        self.__mapping_file = mapping_file
+        self.__pathway_file = pathway_file
+        self.__session = DataSession() if session is None else session
+        self.__depth = depth
+        self.__directed = directed
 
         try:
-            self._gene_data = self.__read_geo_data()
-            self._pathway_data = self.__read_pathway_data()
-            self._mapping_data = self.__read_mapping_data()
+            self._gene_data = (
+                self.__session.get_gene_set(gene_file, p_thred, fc_thred) if gene_file else None
+            )
             logger.info("Reading data completed.")
         except Exception as e:
             logger.error(e)
             print(e)
 
-    def __read_geo_data(self) -> pd.DataFrame:
+    @classmethod
+    def from_config(
+        cls, config: RunConfig, session: Optional[DataSession] = None, read_genes: bool = True
+    ) -> "DataReader":
+        """
+        Read the input files of a run configuration.
+        :param config: run configuration
+        :param session: session sharing loaded tables, a new session if None
+        :param read_genes: whether to read the GEO top table
+        :return: data reader
+        """
+        return cls(
+            gene_file=config.gene_file if read_genes else None,
+            pathway_file=config.pathway_file,
+            mapping_file=config.mapping_file,
+            session=session,
+            p_thred=config.p_thred,
+            fc_thred=config.fc_thred,
+            depth=config.depth,
+            directed=config.directed,
+        )
+
+    @staticmethod
+    def read_geo_file(
+        path: str,
+        p_thred: float = P_THRED,
+        fc_thred: float = FC_THRED,
+        regulated_only: bool = True,
+        chunksize: int = GEO_CHUNK_SIZE,
+    ) -> pd.DataFrame:
+        """
+        Stream a GEO top table of differential expression in chunks of rows.
+        Only the gene symbol, log fold change and p-value columns are parsed, so peak memory is
+        bounded by the chunk size and the number of rows kept.
+        :param path: path to the GEO top table
+        :param p_thred: adjusted p-value below which a gene is significant
+        :param fc_thred: absolute log fold change above which a significant gene is regulated
+        :param regulated_only: keep only up- and down-regulated genes, filtering each chunk
+        :param chunksize: number of rows parsed at once
+        :return: dataframe with standard column names and categorical gene symbols
+        """
         cols = list(GEO_FILE_COLS.keys())
-        df = pd.read_csv(self.__gene_file, sep="\t")[cols]
-        df.columns = [GEO_FILE_COLS[col] for col in df.columns]
+        chunks = []
+        reader = pd.read_csv(
+            path, sep="\t", usecols=cols, dtype=GEO_FILE_DTYPES, chunksize=chunksize
+        )
+        for chunk in reader:
+            chunk = chunk[cols].rename(columns=GEO_FILE_COLS)
+            if regulated_only:
+                upregu, downregu = regulation_masks(chunk, p_thred, fc_thred)
+                chunk = chunk[upregu | downregu]
+            chunks.append(chunk)
+        if not chunks:
+            return pd.DataFrame(columns=list(GEO_FILE_COLS.values()))
+        df = pd.concat(chunks, ignore_index=True)
+        # only the kept symbols are encoded as categories
+        df["gene_symbol"] = df["gene_symbol"].astype("category")
         return df
 
-    def __read_pathway_data(self) -> pd.DataFrame:
+    @staticmethod
+    def read_pathway_file(path: str) -> pd.DataFrame:
+        """
+        Read the interactions of a pathway file.
+        :param path: path to the pathway file
+        :return: dataframe with standard column names
+        """
         cols = list(PATHWAY_FILE_COLS.keys())
-        df = pd.read_csv(self.__pathway_file, sep="\t", header=None)[cols]
+        df = pd.read_csv(path, sep="\t", header=None)[cols]
         df.columns = [PATHWAY_FILE_COLS[col] for col in df.columns]
         return df
 
-    def __read_mapping_data(self) -> pd.DataFrame:
+    @staticmethod
+    def read_mapping_file(path: str) -> pd.DataFrame:
+        """
+        Read a gene interaction map.
+        :param path: path to the gene interaction map
+        :return: dataframe with standard column names
+        """
         cols = list(MAPPING_FILE_COLS.keys())
-        df = pd.read_csv(self.__mapping_file, sep="\t", index_col=0)[cols]
+        df = pd.read_csv(path, sep="\t", index_col=0)[cols]
         df.columns = [MAPPING_FILE_COLS[col] for col in df.columns]
         return df
 
+    def get_session(self) -> DataSession:
+        """Return the session holding the loaded tables."""
+        return self.__session
+
     def get_gene_set(self) -> pd.DataFrame:
         """Return gene set from a GEO experiment."""
         return self._gene_data
 
+    def get_digest(self) -> str:
+        """Return the digest of the pathway and mapping files, keying their cache entries."""
+        return self.__session.get_digest(self.__pathway_file, self.__mapping_file)
+
     def get_pathway(self) -> pd.DataFrame:
         """Return a pathway."""
-        return (
-            self._pathway_data.merge(self._mapping_data, how="left", on=["source", "target"])[
-                ["source", "target", "relation"]
-            ]
-            .drop_duplicates()
-            .reset_index(drop=True)
+        return self.__session.get_pathway(self.__pathway_file, self.__mapping_file)
+
+    def get_directed_kam(self) -> DirectedKAM:
+        """Return the directed KAM network of the pathway."""
+        return self.__session.get_directed_kam(self.__pathway_file, self.__mapping_file)
+
+    def get_kam(self) -> KAM:
+        """Return the KAM network of the pathway, of the run depth and direction."""
+        return self.__session.get_kam(
+            self.__pathway_file, self.__mapping_file, self.__depth, self.__directed
         )
@@ -0,0 +1,241 @@
+import logging
+import os
+from typing import TYPE_CHECKING, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.neurommsig.inference import TYPE_CORRECT, TYPE_NONE, CausalInference
+from src.neurommsig.layout import draw_network
+from src.neurommsig.pool import get_shared, map_shared
+
+if TYPE_CHECKING:
+    from src.neurommsig.neurommsig import RCRstat
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# image formats of HYP network plots written to a directory
+IMAGE_FORMATS = ("pdf", "svg", "png", "jpg")
+# size in inches of a HYP network plot
+HYP_FIGURE_SIZE: Tuple[int, int] = (10, 10)
+
+
+def star_layout(n_downstream: int) -> np.ndarray:
+    """
+    Place an upstream node at the centre and its downstream nodes evenly on a circle.
+    :param n_downstream: number of downstream nodes
+    :return: (1 + n_downstream) x 2 array of positions, the upstream node first
+    """
+    angles = 2 * np.pi * np.arange(n_downstream) / max(n_downstream, 1)
+    return np.vstack([[0.0, 0.0], np.column_stack([np.cos(angles), np.sin(angles)])])
+
+
+def draw_hyp_network(
+    ax,
+    gene: str,
+    downstream: Sequence[str],
+    edge_states: np.ndarray,
+    types: np.ndarray,
+    relation_signs: np.ndarray,
+):
+    """
+    Draw the HYP network of an upstream node.
+    :param ax: matplotlib axes
+    :param gene: gene symbol of the upstream node
+    :param downstream: gene symbols of the downstream nodes
+    :param edge_states: state change code of each downstream node
+    :param types: inference type code of each edge
+    :param relation_signs: sign of the causal relation of each edge
+    """
+    # colors are looked up by code, negative codes index from the end
+    node_colors = np.array(["lightgrey", "darkred", "darkgreen"])[edge_states]
+    # correct edges take the sign of their relation, other inferred edges are black
+    edge_codes = np.where(types == TYPE_CORRECT, relation_signs, 2)
+    edge_codes[types == TYPE_NONE] = 3
+    edge_colors = np.array(["black", "red", "black", "lightgrey", "green"])[edge_codes]
+    edge_widths = np.where(types == TYPE_NONE, 1, 5)
+    n_downstream = len(downstream)
+    draw_network(
+        ax,
+        star_layout(n_downstream),
+        np.zeros(n_downstream, dtype=np.int64),
+        np.arange(1, n_downstream + 1),
+        node_colors=np.append("orange", node_colors),
+        edge_colors=edge_colors,
+        edge_widths=edge_widths,
+        labels=[gene, *downstream],
+        node_size=1500,
+        alpha=0.8,
+    )
+
+
+def draw_original_network(ax, positions: np.ndarray, inference: CausalInference):
+    """
+    Draw a pathway network without inference results.
+    :param ax: matplotlib axes
+    :param positions: node x 2 array of positions
+    :param inference: causal inference of the network
+    """
+    draw_network(
+        ax,
+        positions,
+        inference.rows,
+        inference.indices,
+        node_colors="orange",
+        edge_colors="grey",
+        labels=inference.nodes,
+        alpha=0.9,
+    )
+
+
+def draw_full_network(ax, positions: np.ndarray, inference: CausalInference):
+    """
+    Draw a pathway network with the weight of each upstream node and the correct edges.
+    :param ax: matplotlib axes
+    :param positions: node x 2 array of positions
+    :param inference: causal inference of the network
+    """
+    # styling the graph, colors are looked up by sign, negative signs index from the end
+    node_colors = np.array(["lightgrey", "yellow", "lightblue"])
+    edge_colors = np.array(["lightgrey", "darkred", "darkgreen"])
+    edge_widths = np.array([1, 5, 5])
+    node_signs = np.sign(inference.total_weights)
+    # correct edges take the sign of their relation
+    edge_signs = np.where(inference.types == TYPE_CORRECT, inference.relation_signs, 0)
+    draw_network(
+        ax,
+        positions,
+        inference.rows,
+        inference.indices,
+        node_colors=node_colors[node_signs],
+        edge_colors=edge_colors[edge_signs],
+        edge_widths=edge_widths[edge_signs],
+        labels=inference.nodes,
+        node_size=1000,
+    )
+
+
+def _draw_shared(ax, node: int, shared: dict):
+    """Draw the HYP network of an upstream node from the shared inference arrays."""
+    edges = slice(shared["indptr"][node], shared["indptr"][node + 1])
+    draw_hyp_network(
+        ax,
+        shared["nodes"][node],
+        shared["nodes"][shared["indices"][edges]].tolist(),
+        shared["edge_states"][edges],
+        shared["types"][edges],
+        shared["relation_signs"][edges],
+    )
+
+
+def _render_task(task: tuple) -> list:
+    """
+    Render the HYP networks of some upstream nodes to a directory, reusing one figure.
+    :param task: upstream node indices
+    :return: paths of the written images
+    """
+    from matplotlib.figure import Figure
+
+    shared = get_shared()
+    # a figure outside pyplot is drawn on the non-interactive Agg canvas and freed with it
+    fig = Figure(figsize=HYP_FIGURE_SIZE, dpi=shared["dpi"])
+    paths = []
+    for node in task:
+        fig.clear()
+        _draw_shared(fig.add_subplot(), node, shared)
+        name = str(shared["nodes"][node]).replace(os.sep, "_")
+        path = os.path.join(shared["output"], f"{name}.{shared['image_format']}")
+        fig.savefig(path, dpi=shared["dpi"])
+        paths.append(path)
+    return paths
+
+
+def select_genes(
+    stat: "RCRstat",
+    genes: Optional[Iterable[str]] = None,
+    conc_thred: Optional[float] = None,
+    rich_thred: Optional[float] = None,
+) -> list:
+    """
+    Select upstream nodes by concordance and richness.
+    :param stat: statistics of a run
+    :param genes: gene symbols of candidate upstream nodes, all upstream nodes if None
+    :param conc_thred: concordance at or below which a node is kept, no filter if None
+    :param rich_thred: richness at or below which a node is kept, no filter if None
+    :return: gene symbols of the selected upstream nodes
+    """
+    frame = stat.get_stat_table().to_frame()
+    keep = np.ones(len(frame), dtype=bool)
+    if genes is not None:
+        keep &= frame["gene"].isin(list(genes)).to_numpy()
+    if conc_thred is not None:
+        keep &= (frame["concordance"] <= conc_thred).to_numpy()
+    if rich_thred is not None:
+        keep &= (frame["richness"] <= rich_thred).to_numpy()
+    return frame["gene"][keep].tolist()
+
+
+def export_hyp_networks(
+    stat: "RCRstat",
+    output: str,
+    genes: Optional[Iterable[str]] = None,
+    conc_thred: Optional[float] = None,
+    rich_thred: Optional[float] = None,
+    image_format: str = "png",
+    dpi: int = 72,
+    n_workers: int = 1,
+    chunk_size: int = 8,
+) -> list:
+    """
+    Plot the HYP networks of many upstream nodes.
+    Figures are reused and drawn on a non-interactive canvas, so memory stays flat however many
+    networks are plotted.
+    :param stat: statistics of a run
+    :param output: a ".pdf" file with one page per HYP network, or a directory of images
+    :param genes: gene symbols of candidate upstream nodes, all upstream nodes if None
+    :param conc_thred: concordance at or below which a node is plotted, no filter if None
+    :param rich_thred: richness at or below which a node is plotted, no filter if None
+    :param image_format: format of the images written to a directory
+    :param dpi: resolution of the images
+    :param n_workers: number of worker processes rendering images to a directory, the pages of a
+        PDF file are always rendered in this process
+    :param chunk_size: number of HYP networks rendered per task
+    :return: gene symbols of the plotted upstream nodes
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f'Image format must be one of {", ".join(IMAGE_FORMATS)}!')
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer.")
+    if n_workers < 1:
+        raise ValueError("n_workers must be a positive integer.")
+    selected = select_genes(stat, genes, conc_thred, rich_thred)
+    inference: CausalInference = stat._inference
+    node_index = {gene: i for i, gene in enumerate(inference.nodes.tolist())}
+    nodes = [node_index[gene] for gene in selected]
+    shared = {
+        "nodes": inference.nodes,
+        "indptr": inference.indptr,
+        "indices": inference.indices,
+        "edge_states": inference.edge_states,
+        "types": inference.types,
+        "relation_signs": inference.relation_signs,
+        "output": output,
+        "image_format": image_format,
+        "dpi": dpi,
+    }
+    logger.info(f"Plotting {len(nodes)} HYP networks.")
+    if output.lower().endswith(".pdf"):
+        from matplotlib.backends.backend_pdf import PdfPages
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=HYP_FIGURE_SIZE, dpi=dpi)
+        with PdfPages(output) as pdf:
+            for node in nodes:
+                fig.clear()
+                _draw_shared(fig.add_subplot(), node, shared)
+                pdf.savefig(fig)
+        return selected
+    os.makedirs(output, exist_ok=True)
+    tasks = [tuple(nodes[start : start + chunk_size]) for start in range(0, len(nodes), chunk_size)]
+    map_shared(_render_task, tasks, shared, n_workers)
+    return selected
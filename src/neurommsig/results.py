@@ -0,0 +1,251 @@
+import logging
+import os
+from typing import Iterable, Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# number of rows rendered and written at once
+STAT_CHUNK_SIZE: int = 100000
+# display format of float columns, applied only when rendering formatted tables
+STAT_FORMATS: dict = {
+    "concordance": "{:.3f}",
+    "richness": "{:.2e}",
+    "concordance_pvalue": "{:.2e}",
+    "concordance_fdr": "{:.2e}",
+    "richness_pvalue": "{:.2e}",
+    "richness_fdr": "{:.2e}",
+}
+# file format of each output extension
+STAT_FILE_FORMATS: dict = {
+    ".tsv": "tsv",
+    ".txt": "tsv",
+    ".tab": "tsv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+}
+
+
+def format_stat(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Render the float columns of a statistics table as rounded strings, missing values as "".
+    :param frame: statistics table with numeric columns
+    :return: statistics table with formatted columns
+    """
+    frame = frame.copy()
+    for col, fmt in STAT_FORMATS.items():
+        if col in frame:
+            values = frame[col].to_numpy(dtype=float)
+            frame[col] = [fmt.format(value) if value == value else "" for value in values]
+    return frame
+
+
+class StatTable:
+    """Statistics of upstream nodes stored as numeric and categorical columns.
+
+    Floats keep full precision and missing statistics are NaN; values are only formatted when
+    rendered with ``formatted=True``. Gene, contrast and pathway names are categorical, so a table
+    never holds one Python string per row.
+    """
+
+    def __init__(self, columns: dict):
+        """
+        :param columns: mapping of column name to a numpy array or a categorical, of equal length
+        """
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("All columns of a statistics table must have the same length.")
+        self._columns = dict(columns)
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "StatTable":
+        """
+        Convert a dataframe, encoding its string columns as categoricals.
+        :param frame: statistics table
+        :return: columnar statistics table
+        """
+        columns = dict()
+        for col, values in frame.items():
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                columns[col] = values.array
+            elif values.dtype == object:
+                columns[col] = pd.Categorical(values)
+            else:
+                columns[col] = values.to_numpy()
+        return cls(columns)
+
+    @classmethod
+    def concat(cls, tables: Iterable["StatTable"]) -> "StatTable":
+        """
+        Stack tables with the same columns.
+        :param tables: statistics tables
+        :return: statistics table with the rows of all tables, in order
+        """
+        tables = list(tables)
+        if not tables:
+            return cls(dict())
+        columns = dict()
+        for col in tables[0].columns:
+            parts = [table[col] for table in tables]
+            if isinstance(parts[0], pd.Categorical):
+                columns[col] = union_categoricals(parts)
+            else:
+                columns[col] = np.concatenate(parts)
+        return cls(columns)
+
+    @property
+    def columns(self) -> list:
+        """Return the column names."""
+        return list(self._columns)
+
+    def __len__(self) -> int:
+        return len(next(iter(self._columns.values()), ()))
+
+    def __getitem__(self, col: str) -> Union[np.ndarray, pd.Categorical]:
+        return self._columns[col]
+
+    def insert(self, loc: int, col: str, values):
+        """
+        Add a column.
+        :param loc: position of the column
+        :param col: column name
+        :param values: array of values, or a single value repeated on every row
+        """
+        if np.ndim(values) == 0:
+            values = pd.Categorical.from_codes(np.zeros(len(self), dtype=np.int8), [values])
+        items = list(self._columns.items())
+        items.insert(loc, (col, values))
+        self._columns = dict(items)
+
+    def to_frame(self, formatted: bool = False, start: int = 0, stop: Optional[int] = None):
+        """
+        Render rows as a dataframe.
+        :param formatted: render float columns as rounded strings
+        :param start: first row
+        :param stop: last row (exclusive), the end of the table if None
+        :return: statistics table
+        """
+        frame = pd.DataFrame({col: values[start:stop] for col, values in self._columns.items()})
+        return format_stat(frame) if formatted else frame
+
+    def iter_frames(
+        self, chunk_size: int = STAT_CHUNK_SIZE, formatted: bool = False
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Render the table as dataframes of at most ``chunk_size`` rows.
+        :param chunk_size: number of rows per dataframe
+        :param formatted: render float columns as rounded strings
+        :return: iterator of dataframes
+        """
+        for start in range(0, len(self), chunk_size):
+            yield self.to_frame(formatted, start, start + chunk_size)
+
+    def to_markdown(self, formatted: bool = True) -> str:
+        """Render the table as markdown."""
+        return self.to_frame(formatted).to_markdown()
+
+    def write(self, path: str, file_format: Optional[str] = None, formatted: bool = False):
+        """
+        Write the table chunk by chunk.
+        :param path: output path
+        :param file_format: "tsv", "parquet" or "arrow", inferred from the extension if None
+        :param formatted: render float columns as rounded strings
+        """
+        with StatWriter(path, file_format, formatted) as writer:
+            writer.write(self)
+
+
+class StatWriter:
+    """Append statistics tables to a TSV, Parquet or Arrow file, one chunk at a time.
+
+    Use as a context manager and :meth:`write` tables as they are computed, so that the rows of a
+    large run never have to be held at once. Parquet and Arrow need the optional ``pyarrow``.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        file_format: Optional[str] = None,
+        formatted: bool = False,
+        chunk_size: int = STAT_CHUNK_SIZE,
+    ):
+        """
+        :param path: output path
+        :param file_format: "tsv", "parquet" or "arrow", inferred from the extension if None
+        :param formatted: render float columns as rounded strings
+        :param chunk_size: number of rows rendered and written at once
+        """
+        if file_format is None:
+            extension = os.path.splitext(path)[-1].lower()
+            file_format = STAT_FILE_FORMATS.get(extension, "tsv")
+        if file_format not in ("tsv", "parquet", "arrow"):
+            raise ValueError(f"Unknown statistics file format {file_format!r}.")
+        self.path = path
+        self.file_format = file_format
+        self.formatted = formatted
+        self.chunk_size = chunk_size
+        self.n_rows = 0
+        self._file = None
+        self._writer = None
+        self._schema = None
+
+    def __enter__(self) -> "StatWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, table: Union[StatTable, pd.DataFrame]):
+        """
+        Append the rows of a table.
+        :param table: statistics table, with the same columns as the tables written before
+        """
+        if isinstance(table, pd.DataFrame):
+            table = StatTable.from_frame(table)
+        frames = table.iter_frames(self.chunk_size, self.formatted)
+        if not len(table):
+            # an empty table still writes the header or schema
+            frames = [table.to_frame(self.formatted)]
+        for frame in frames:
+            self.__write_frame(frame)
+            self.n_rows += len(frame)
+
+    def __write_frame(self, frame: pd.DataFrame):
+        if self.file_format == "tsv":
+            if self._file is None:
+                self._file = open(self.path, "w", newline="")
+                frame.to_csv(self._file, sep="\t", index=False, header=True)
+            else:
+                frame.to_csv(self._file, sep="\t", index=False, header=False)
+            return
+        try:
+            import pyarrow as pa
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError(f"Writing {self.file_format} files requires pyarrow.") from e
+        # names are written as plain strings, categories differ from chunk to chunk
+        frame = frame.astype({col: str for col in frame.columns if frame[col].dtype == "category"})
+        batch = pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+        if self._writer is None:
+            self._schema = batch.schema
+            if self.file_format == "parquet":
+                self._writer = pa.parquet.ParquetWriter(self.path, self._schema)
+            else:
+                self._writer = pa.ipc.new_file(self.path, self._schema)
+        self._writer.write_table(batch)
+
+    def close(self):
+        """Flush and close the file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
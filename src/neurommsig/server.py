@@ -0,0 +1,610 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.neurommsig.batch import score_contrasts
+from src.neurommsig.config import RunConfig
+from src.neurommsig.constants import FC_THRED, GEO_FILE_COLS, P_THRED
+from src.neurommsig.inference import CausalInference, SparseInference
+from src.neurommsig.kam import KAM
+from src.neurommsig.preprocessing import get_state_matrix
+from src.neurommsig.reader import DataSession
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# address of the job server, local only by default
+SERVER_HOST: str = "127.0.0.1"
+SERVER_PORT: int = 8765
+# number of KAM networks kept in memory, the least recently used one is dropped first
+KAM_CACHE_SIZE: int = 16
+# seconds a scoring request waits for others against the same pathway to be scored with it
+BATCH_WINDOW: float = 0.005
+# number of contrasts above which a batch is scored without waiting
+MAX_BATCH_CONTRASTS: int = 64
+# largest request body accepted, in bytes
+MAX_BODY_BYTES: int = 64 * 2**20
+# content type of each image format rendered by the server
+RENDER_FORMATS: dict = {"png": "image/png", "svg": "image/svg+xml"}
+# networks rendered by the server and their figure size in inches
+RENDER_NETWORKS: dict = {"full": (20, 20), "original": (10, 10), "hyp": (10, 10)}
+# highest resolution of a rendered image, a full network is 6000 pixels wide at 300 dpi
+MAX_RENDER_DPI: int = 300
+# standard column names of the genes of a contrast, also accepted under GEO column names
+CONTRAST_COLS = ("gene_symbol", "log_fold_change", "p_value")
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class RequestError(ValueError):
+    """Invalid request, answered with an HTTP error status."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class KAMCache:
+    """KAM networks of the pathways served, loaded on first use and kept in an LRU cache.
+
+    Networks are loaded through one session, so the gene interaction map is parsed and indexed
+    once for all pathways. The tables of a pathway are released once its network is built, and
+    only the :data:`KAM_CACHE_SIZE` most recently used networks stay in memory. Loading a network
+    does not hold up requests for networks already cached.
+    """
+
+    def __init__(
+        self,
+        pathways: Dict[str, str],
+        config: Optional[RunConfig] = None,
+        session: Optional[DataSession] = None,
+        max_size: int = KAM_CACHE_SIZE,
+    ):
+        """
+        :param pathways: mapping of pathway name to pathway file
+        :param config: mapping file, depth and direction of the HYP networks, the defaults if None
+        :param session: session loading the files, a new session if None
+        :param max_size: number of KAM networks kept in memory
+        """
+        self.pathways = dict(pathways)
+        self.config = RunConfig() if config is None else config
+        self.max_size = max_size
+        self.counts = Counter()
+        self.__session = DataSession() if session is None else session
+        self.__kams: "OrderedDict[str, KAM]" = OrderedDict()
+        # guards the LRU cache and the load locks, only held for lookups
+        self.__lock = threading.Lock()
+        # one lock per pathway, so concurrent misses of a pathway load it once
+        self.__load_locks: Dict[str, threading.Lock] = dict()
+        # sessions are not thread-safe, networks of different pathways are loaded one at a time
+        self.__session_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__kams)
+
+    def get(self, name: str) -> KAM:
+        """
+        Return the KAM network of a pathway.
+        :param name: pathway name
+        :return: KAM network
+        """
+        if name not in self.pathways:
+            raise RequestError(f"No pathway named {name}.", status=404)
+        kam = self.__lookup(name)
+        if kam is not None:
+            return kam
+        with self.__lock:
+            load_lock = self.__load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            # loaded by another thread while this one waited
+            kam = self.__lookup(name)
+            if kam is not None:
+                return kam
+            path = self.pathways[name]
+            with self.__session_lock:
+                kam = self.__session.get_kam(
+                    path, self.config.mapping_file, self.config.depth, self.config.directed
+                )
+                self.__session.release(path)
+            with self.__lock:
+                self.counts["misses"] += 1
+                self.__kams[name] = kam
+                if len(self.__kams) > self.max_size:
+                    self.__kams.popitem(last=False)
+            return kam
+
+    def __lookup(self, name: str) -> Optional[KAM]:
+        """Return a cached KAM network and mark it as most recently used, None if not cached."""
+        with self.__lock:
+            kam = self.__kams.get(name)
+            if kam is not None:
+                self.counts["hits"] += 1
+                self.__kams.move_to_end(name)
+            return kam
+
+
+def read_contrast(records: list) -> pd.DataFrame:
+    """
+    Read the genes of an expression contrast sent as JSON.
+    :param records: one object per gene with its symbol, log fold change and adjusted p-value,
+        under the standard or the GEO column names
+    :return: gene set dataframe with standard column names
+    """
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise RequestError("A contrast must be a list of genes, each an object.")
+    gene_set = pd.DataFrame.from_records(records).rename(columns=GEO_FILE_COLS)
+    missing = [col for col in CONTRAST_COLS if col not in gene_set.columns]
+    if records and missing:
+        raise RequestError(f'Contrast genes lack {", ".join(missing)}.')
+    gene_set = gene_set.reindex(columns=list(CONTRAST_COLS))
+    try:
+        return gene_set.astype({"log_fold_change": float, "p_value": float})
+    except (TypeError, ValueError) as e:
+        raise RequestError(f"Invalid contrast values: {e}") from e
+
+
+def read_query(body: bytes) -> dict:
+    """
+    Parse the JSON body of a scoring or rendering request.
+    :param body: request body
+    :return: query naming a pathway
+    """
+    try:
+        query = json.loads(body or b"{}")
+    except json.JSONDecodeError as e:
+        raise RequestError(f"Invalid JSON: {e}") from e
+    if not isinstance(query, dict) or "pathway" not in query:
+        raise RequestError('The request must be an object with a "pathway".')
+    return query
+
+
+def read_number(query: dict, name: str, default, kind=float, maximum=None):
+    """
+    Read a finite number of a query.
+    :param query: parsed request
+    :param name: key of the number
+    :param default: value if the query lacks the number
+    :param kind: float or int
+    :param maximum: largest value accepted, unbounded if None
+    :return: the number
+    """
+    value = query.get(name, default)
+    try:
+        if isinstance(value, bool):
+            raise ValueError(value)
+        number = kind(value)
+    except (TypeError, ValueError, OverflowError) as e:
+        raise RequestError(f'"{name}" must be a number, not {value!r}.') from e
+    if not np.isfinite(number):
+        raise RequestError(f'"{name}" must be finite.')
+    if maximum is not None and not 0 < number <= maximum:
+        raise RequestError(f'"{name}" must be positive and at most {maximum}.')
+    return number
+
+
+def read_contrasts(contrasts: dict) -> Dict[str, pd.DataFrame]:
+    """
+    Read the genes of many expression contrasts sent as JSON.
+    :param contrasts: mapping of contrast name to its genes, see :func:`read_contrast`
+    :return: mapping of contrast name to its gene set
+    """
+    return {str(name): read_contrast(genes) for name, genes in contrasts.items()}
+
+
+def write_stats(pathway: str, frame: pd.DataFrame) -> bytes:
+    """
+    Serialize the statistics of a scoring request as JSON, with null for undefined values.
+    :param pathway: pathway name
+    :param frame: statistics table with one row per contrast and upstream node
+    :return: JSON object with the pathway and one record per row
+    """
+    # pandas writes the records in C, far faster than json.dumps of Python dictionaries
+    stats = frame.to_json(orient="records", double_precision=15)
+    return f'{{"pathway": {json.dumps(pathway)}, "stats": {stats}}}'.encode()
+
+
+def score_batch(kam: KAM, gene_sets: dict, p_thred: float, fc_thred: float) -> pd.DataFrame:
+    """
+    Score many contrasts against one KAM network at once.
+    :param kam: KAM network
+    :param gene_sets: mapping of contrast name to its gene set
+    :param p_thred: adjusted p-value below which a gene is significant
+    :param fc_thred: absolute log fold change above which a significant gene is regulated
+    :return: statistics table with one row per contrast and upstream node
+    """
+    states = get_state_matrix(gene_sets, kam.nodes, p_thred, fc_thred)
+    inference = SparseInference.from_kam(kam, states.values)
+    return score_contrasts(inference, list(states.columns)).to_frame()
+
+
+def render_network(
+    kam: KAM,
+    gene_set: pd.DataFrame,
+    network: str = "full",
+    gene: Optional[str] = None,
+    image_format: str = "png",
+    dpi: int = 72,
+    p_thred: float = P_THRED,
+    fc_thred: float = FC_THRED,
+) -> bytes:
+    """
+    Render a network of a contrast, like the plots of :class:`neurommsig.neurommsig.Graph`.
+    :param kam: KAM network
+    :param gene_set: gene set of the contrast
+    :param network: "full", "original" or "hyp"
+    :param gene: upstream gene of the HYP network
+    :param image_format: "png" or "svg"
+    :param dpi: resolution of the image
+    :param p_thred: adjusted p-value below which a gene is significant
+    :param fc_thred: absolute log fold change above which a significant gene is regulated
+    :return: image file contents
+    """
+    from matplotlib.figure import Figure
+
+    from src.neurommsig.layout import get_layout
+    from src.neurommsig.render import draw_full_network, draw_hyp_network, draw_original_network
+
+    states = get_state_matrix({"contrast": gene_set}, kam.nodes, p_thred, fc_thred)
+    inference = CausalInference.from_kam(kam, states["contrast"].to_numpy())
+    # a figure outside pyplot is drawn on the non-interactive Agg canvas and freed with it
+    fig = Figure(figsize=RENDER_NETWORKS[network], dpi=dpi)
+    ax = fig.add_subplot()
+    if network == "hyp":
+        matches = np.flatnonzero(kam.nodes == gene)
+        if not len(matches):
+            raise RequestError(f"No {gene} in the pathway.")
+        i = matches[0]
+        edges = slice(inference.indptr[i], inference.indptr[i + 1])
+        draw_hyp_network(
+            ax,
+            gene,
+            inference.nodes[inference.indices[edges]].tolist(),
+            inference.edge_states[edges],
+            inference.types[edges],
+            inference.relation_signs[edges],
+        )
+    elif network == "original":
+        draw_original_network(ax, get_layout(kam), inference)
+    else:
+        draw_full_network(ax, get_layout(kam), inference)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=image_format, dpi=dpi)
+    return buffer.getvalue()
+
+
+class JobServer:
+    """Score expression contrasts and render networks over a local HTTP API.
+
+    The server keeps KAM networks warm in a :class:`KAMCache` and runs scoring and rendering in a
+    pool of worker threads, one per CPU by default, at most ``max_concurrency`` jobs at a time.
+    Scoring requests against the same pathway and thresholds arriving within ``batch_window``
+    seconds, or while all slots are busy, are scored together as the columns of one state matrix.
+
+    Routes:
+
+    - ``GET /health``: server status
+    - ``GET /stats``: counts of requests, jobs, contrasts and cache hits
+    - ``GET /pathways``: names of the pathways served
+    - ``POST /score``: ``{"pathway": name, "contrasts": {name: [gene, ...]}}``, with optional
+      ``"p_threshold"`` and ``"fc_threshold"``, returns one statistics row per contrast and
+      upstream node
+    - ``POST /render``: ``{"pathway": name, "contrast": [gene, ...]}``, with optional
+      ``"network"``, ``"gene"``, ``"format"`` and ``"dpi"``, returns a PNG or SVG image
+    """
+
+    def __init__(
+        self,
+        pathways: Dict[str, str],
+        config: Optional[RunConfig] = None,
+        n_workers: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        cache_size: int = KAM_CACHE_SIZE,
+        batch_window: float = BATCH_WINDOW,
+    ):
+        """
+        :param pathways: mapping of pathway name to pathway file, only these are served
+        :param config: mapping file, default thresholds and HYP networks, the defaults if None
+        :param n_workers: number of worker threads, the number of CPUs if None
+        :param max_concurrency: number of jobs run at once, the number of workers if None
+        :param cache_size: number of KAM networks kept in memory
+        :param batch_window: seconds a scoring request waits for others to be scored with it
+        """
+        n_workers = (os.cpu_count() or 1) if n_workers is None else n_workers
+        max_concurrency = n_workers if max_concurrency is None else max_concurrency
+        for name, value in (
+            ("n_workers", n_workers),
+            ("max_concurrency", max_concurrency),
+            ("cache_size", cache_size),
+        ):
+            if value < 1:
+                raise ValueError(f"{name} must be a positive integer.")
+        self.config = RunConfig() if config is None else config
+        self.kams = KAMCache(pathways, self.config, max_size=cache_size)
+        self.n_workers = n_workers
+        self.max_concurrency = max_concurrency
+        self.batch_window = batch_window
+        self.counts = Counter()
+        self.__executor = None
+        self.__semaphore = None
+        self.__batches: Dict[tuple, List[Tuple[dict, asyncio.Future]]] = dict()
+        # keys of the batches whose window has passed while all slots were busy
+        self.__due = set()
+
+    async def start(
+        self, host: str = SERVER_HOST, port: int = SERVER_PORT
+    ) -> asyncio.AbstractServer:
+        """
+        Start serving in the running event loop.
+        :param host: host to listen on
+        :param port: port to listen on, any free port if 0
+        :return: asyncio server, closed by the caller
+        """
+        self.__executor = ThreadPoolExecutor(self.n_workers, thread_name_prefix="neurommsig")
+        self.__semaphore = asyncio.Semaphore(self.max_concurrency)
+        server = await asyncio.start_server(self.__handle, host, port)
+        address = server.sockets[0].getsockname()
+        logger.info(f"Serving {len(self.kams.pathways)} pathways on {address[0]}:{address[1]}.")
+        return server
+
+    def shutdown(self):
+        """Stop the worker threads once their jobs are done."""
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True)
+
+    async def __run(self, func, *args):
+        """Run a job in the worker pool, waiting for a free slot."""
+        try:
+            async with self.__semaphore:
+                self.counts["jobs"] += 1
+                return await self.__offload(func, *args)
+        finally:
+            # batches held back while all slots were busy are scored now
+            for key in list(self.__due):
+                self.__flush(key)
+
+    async def __offload(self, func, *args):
+        """Run a function in the worker pool, keeping the event loop free to accept requests."""
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, func, *args)
+
+    def get_stats(self) -> dict:
+        """Return the counts of requests, jobs, contrasts and cache hits."""
+        return {
+            **self.counts,
+            "cache_hits": self.kams.counts["hits"],
+            "cache_misses": self.kams.counts["misses"],
+            "cached_kams": len(self.kams),
+            "pending_batches": len(self.__batches),
+        }
+
+    async def score(
+        self, pathway: str, contrasts: Dict[str, pd.DataFrame], p_thred: float, fc_thred: float
+    ) -> pd.DataFrame:
+        """
+        Score contrasts against a pathway, batched with other requests for the same pathway.
+        :param pathway: pathway name
+        :param contrasts: mapping of contrast name to its gene set
+        :param p_thred: adjusted p-value below which a gene is significant
+        :param fc_thred: absolute log fold change above which a significant gene is regulated
+        :return: statistics table with one row per contrast and upstream node
+        """
+        key = (pathway, p_thred, fc_thred)
+        future = asyncio.get_running_loop().create_future()
+        batch = self.__batches.setdefault(key, [])
+        batch.append((contrasts, future))
+        if len(batch) == 1:
+            asyncio.get_running_loop().call_later(self.batch_window, self.__flush, key)
+        elif sum(len(request) for request, _ in batch) >= MAX_BATCH_CONTRASTS:
+            self.__flush(key, force=True)
+        return await future
+
+    def __flush(self, key: tuple, force: bool = False):
+        """
+        Score the pending requests of a batch, or hold them back until a slot is free so that
+        requests arriving under load are scored together.
+        """
+        if key not in self.__batches:
+            return
+        if self.__semaphore.locked() and not force:
+            self.__due.add(key)
+            return
+        self.__due.discard(key)
+        asyncio.ensure_future(self.__score_batch(key, self.__batches.pop(key)))
+
+    def __score_job(
+        self, pathway: str, gene_sets: dict, p_thred: float, fc_thred: float
+    ) -> pd.DataFrame:
+        return score_batch(self.kams.get(pathway), gene_sets, p_thred, fc_thred)
+
+    async def __score_batch(self, key: tuple, batch: List[Tuple[dict, asyncio.Future]]):
+        pathway, p_thred, fc_thred = key
+        # contrasts of different requests may share names, each is prefixed by its request
+        gene_sets = {
+            f"{i}:{name}": gene_set
+            for i, (contrasts, _) in enumerate(batch)
+            for name, gene_set in contrasts.items()
+        }
+        self.counts["batches"] += 1
+        self.counts["contrasts"] += len(gene_sets)
+        try:
+            frame = await self.__run(self.__score_job, pathway, gene_sets, p_thred, fc_thred)
+            # contrasts are categories in batch order, so each request owns a range of codes
+            codes = frame["contrast"].cat.codes.to_numpy()
+            requests = np.repeat(np.arange(len(batch)), [len(request) for request, _ in batch])
+            names = np.array([name for contrasts, _ in batch for name in contrasts], dtype=object)
+            frame = frame.assign(contrast=names[codes])
+            requests = requests[codes]
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for i, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(frame[requests == i].reset_index(drop=True))
+
+    async def __dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, str, bytes]:
+        """Answer a request with a status, a content type and a body."""
+        routes = {
+            "/health": "GET",
+            "/stats": "GET",
+            "/pathways": "GET",
+            "/score": "POST",
+            "/render": "POST",
+        }
+        if path not in routes:
+            raise RequestError(f"No route {path}.", status=404)
+        if method != routes[path]:
+            raise RequestError(f"{path} only accepts {routes[path]}.", status=405)
+        if path == "/health":
+            return _json_response({"status": "ok"})
+        if path == "/stats":
+            return _json_response(self.get_stats())
+        if path == "/pathways":
+            return _json_response(sorted(self.kams.pathways))
+
+        query = await self.__offload(read_query, body)
+        p_thred = read_number(query, "p_threshold", self.config.p_thred)
+        fc_thred = read_number(query, "fc_threshold", self.config.fc_thred)
+        if path == "/score":
+            contrasts = query.get("contrasts")
+            if not isinstance(contrasts, dict) or not contrasts:
+                raise RequestError('"contrasts" must map contrast names to lists of genes.')
+            gene_sets = await self.__offload(read_contrasts, contrasts)
+            frame = await self.score(query["pathway"], gene_sets, p_thred, fc_thred)
+            payload = await self.__offload(write_stats, query["pathway"], frame)
+            return 200, "application/json", payload
+
+        network = query.get("network", "full")
+        image_format = query.get("format", "png")
+        if network not in RENDER_NETWORKS:
+            raise RequestError(f'Network must be one of {", ".join(RENDER_NETWORKS)}.')
+        if image_format not in RENDER_FORMATS:
+            raise RequestError(f'Format must be one of {", ".join(RENDER_FORMATS)}.')
+        if network == "hyp" and not query.get("gene"):
+            raise RequestError('A HYP network needs a "gene".')
+        gene_set = await self.__offload(read_contrast, query.get("contrast", []))
+        kam = await self.__run(self.kams.get, query["pathway"])
+        image = await self.__run(
+            render_network,
+            kam,
+            gene_set,
+            network,
+            query.get("gene"),
+            image_format,
+            read_number(query, "dpi", 72, int, MAX_RENDER_DPI),
+            p_thred,
+            fc_thred,
+        )
+        return 200, RENDER_FORMATS[image_format], image
+
+    async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Read one HTTP request from a connection, answer it and close the connection."""
+        try:
+            status, content_type, payload = await self.__answer(reader)
+        except RequestError as e:
+            status, content_type, payload = _json_response({"error": str(e)}, e.status)
+        except Exception as e:
+            logger.exception(e)
+            status, content_type, payload = _json_response({"error": "Internal error."}, 500)
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        try:
+            writer.write(head.encode("latin-1") + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def __answer(self, reader: asyncio.StreamReader) -> Tuple[int, str, bytes]:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise RequestError("Malformed request line.")
+        method, target, _ = request_line
+        headers = dict()
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = headers.get("content-length", "0")
+        if not (length.isascii() and length.isdigit()):
+            raise RequestError("Content-Length must be a non-negative integer.")
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            raise RequestError("Request body too large.", status=413)
+        body = await reader.readexactly(length) if length else b""
+        self.counts["requests"] += 1
+        return await self.__dispatch(method, target.split("?", 1)[0], body)
+
+
+def _json_response(value, status: int = 200) -> Tuple[int, str, bytes]:
+    return status, "application/json", json.dumps(value).encode()
+
+
+def read_pathways(pathways: List[str]) -> Dict[str, str]:
+    """
+    Name pathway files for the server.
+    :param pathways: pathway files, each as "path" named after its file, or as "name=path"
+    :return: mapping of pathway name to pathway file
+    """
+    named = dict()
+    for pathway in pathways:
+        name, _, path = pathway.rpartition("=")
+        named[name or os.path.splitext(os.path.basename(path))[0]] = path
+    return named
+
+
+def serve(
+    pathways: Dict[str, str],
+    config: Optional[RunConfig] = None,
+    host: str = SERVER_HOST,
+    port: int = SERVER_PORT,
+    n_workers: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    cache_size: int = KAM_CACHE_SIZE,
+):
+    """
+    Run a job server until interrupted.
+    :param pathways: mapping of pathway name to pathway file, only these are served
+    :param config: mapping file, default thresholds and HYP networks, the defaults if None
+    :param host: host to listen on
+    :param port: port to listen on
+    :param n_workers: number of worker threads, the number of CPUs if None
+    :param max_concurrency: number of jobs run at once, the number of workers if None
+    :param cache_size: number of KAM networks kept in memory
+    """
+    job_server = JobServer(pathways, config, n_workers, max_concurrency, cache_size)
+
+    async def main():
+        server = await job_server.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        job_server.shutdown()
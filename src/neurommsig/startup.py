@@ -7,10 +7,14 @@ from pathlib import Path
 # Default Directory Paths
 home_dir = Path.home()
 PROJECT_DIR = home_dir.joinpath(".neurommsig")
-os.makedirs(PROJECT_DIR, exist_ok=True)
 
 # Logging Configuration
 LOG_FILE_PATH = os.path.join(PROJECT_DIR, "neurommsig.log")
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", filename=LOG_FILE_PATH
-)
+
+
+def setup_logging():
+    """Create the project directory and log to its log file. Nothing is written on import."""
+    os.makedirs(PROJECT_DIR, exist_ok=True)
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", filename=LOG_FILE_PATH
+    )
@@ -0,0 +1,120 @@
+from typing import Callable
+
+import numpy as np
+
+# maximum number of terms evaluated at once by _log_tail_sum
+MAX_TERMS = 2**22
+
+
+def _log_tail_sum(lo: np.ndarray, hi: np.ndarray, log_term: Callable) -> np.ndarray:
+    """
+    Sum ``exp(log_term(i, j))`` over ``j = lo[i] .. hi[i]`` for every ``i`` in log space.
+    :param lo: first summation index of each sum
+    :param hi: last summation index of each sum
+    :param log_term: function of (sum index array, j array) returning the log of the terms
+    :return: log of each sum, -inf for empty sums
+    """
+    counts = np.maximum(hi - lo + 1, 0)
+    ends = np.cumsum(counts)
+    log_sums = np.full(len(lo), -np.inf)
+    # evaluate blocks of whole sums with a bounded number of terms to bound memory
+    blocks = np.split(np.arange(len(lo)), np.flatnonzero(np.diff(ends // MAX_TERMS)) + 1)
+    for block in blocks:
+        block = block[counts[block] > 0]
+        if not len(block):
+            continue
+        block_counts = counts[block]
+        starts = np.cumsum(block_counts) - block_counts
+        seg = np.repeat(np.arange(len(block)), block_counts)
+        j = lo[block][seg] + np.arange(block_counts.sum()) - starts[seg]
+        terms = log_term(block[seg], j)
+        # log-sum-exp per sum, shifted by the largest term
+        peak = np.maximum.reduceat(terms, starts)
+        sums = np.bincount(seg, weights=np.exp(terms - peak[seg]), minlength=len(block))
+        with np.errstate(divide="ignore"):
+            log_sums[block] = peak + np.log(sums)
+    return log_sums
+
+
+def map_unique(func: Callable, **arrays: np.ndarray) -> np.ndarray:
+    """
+    Evaluate an elementwise function of non-negative integer arrays once per distinct combination.
+    :param func: function of the arrays given as keyword arguments
+    :param arrays: broadcastable non-negative integer arrays
+    :return: function values, shaped like the broadcast arrays
+    """
+    broadcast = np.broadcast_arrays(*(np.asarray(a, dtype=np.int64) for a in arrays.values()))
+    flat = [a.ravel() for a in broadcast]
+    dims = [int(a.max(initial=0)) + 1 for a in flat]
+    if np.prod(dims, dtype=float) < 2**62:
+        keys = np.ravel_multi_index(flat, dims)
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    else:
+        columns = np.stack(flat, axis=1)
+        _, first, inverse = np.unique(columns, axis=0, return_index=True, return_inverse=True)
+    values = func(**{name: a[first] for name, a in zip(arrays, flat)})
+    return values[inverse].reshape(broadcast[0].shape)
+
+
+def concordance(
+    n: np.ndarray, k: np.ndarray, ambiguous: np.ndarray, m: int, p: float = 0.5
+) -> np.ndarray:
+    """
+    Calculate concordance of HYP networks, the binomial tail of observing at least k correct edges.
+    :param n: number of downstream nodes with a state change in each HYP network
+    :param k: number of correct downstream nodes in each HYP network
+    :param ambiguous: number of ambiguous downstream nodes in each HYP network
+    :param m: number of nodes with a state change in the full network
+    :param p: probability of a correct downstream node
+    :return: concordance of each HYP network, NaN where undefined
+    """
+    from scipy.stats import binom
+
+    n, k, ambiguous = (np.asarray(x, dtype=np.int64) for x in (n, k, ambiguous))
+    trials = n - ambiguous
+    defined = (trials >= k) & (k > 0)
+    # P(k <= X <= min(n - ambiguous, m)) for X ~ Binomial(n - ambiguous, p)
+    upper = np.minimum(trials, m)
+    conc = binom.sf(k - 1, trials, p) - binom.sf(upper, trials, p)
+    # the sum is empty when fewer nodes changed state in the full network than k
+    conc = np.where(k > upper, 0.0, conc)
+    return np.where(defined, conc, np.nan)
+
+
+def richness(N: int, m: int, n: np.ndarray, k: np.ndarray) -> np.ndarray:
+    """
+    Calculate richness of HYP networks, summing the factorial ratios of the original RCR statistic
+    over j = k .. min(n, m) in log space, so that hub nodes neither overflow nor lose precision.
+    :param N: number of nodes in the full network
+    :param m: number of nodes with a state change in the full network
+    :param n: number of downstream nodes in each HYP network
+    :param k: number of downstream nodes with a state change in each HYP network
+    :return: richness of each HYP network, NaN where undefined
+    """
+    from scipy.special import gammaln
+
+    shape = np.broadcast(N, m, n, k).shape
+    N, m, n, k = (
+        a.ravel() for a in np.broadcast_arrays(*(np.asarray(x, np.int64) for x in (N, m, n, k)))
+    )
+    defined = (n >= k) & (m >= k)
+    # terms with N - m - n + j < 0 have no factorial and are left out
+    lo = np.maximum(k, n - (N - m))
+    hi = np.where(defined, np.minimum(n, m), lo - 1)
+    log_norm = gammaln(N + 1) + gammaln(N - n + 1) - gammaln(n + 1)
+
+    def log_term(i, j):
+        # j! / (m! (m - j)!) * (n - j)! / ((N - m)! (N - m - n + j)!) / (n! / (N! (N - n)!))
+        return (
+            gammaln(j + 1)
+            - gammaln(m[i] + 1)
+            - gammaln(m[i] - j + 1)
+            + gammaln(n[i] - j + 1)
+            - gammaln(N[i] - m[i] + 1)
+            - gammaln(N[i] - m[i] - n[i] + j + 1)
+            + log_norm[i]
+        )
+
+    with np.errstate(over="ignore"):
+        rich = np.exp(_log_tail_sum(lo, hi, log_term))
+    return np.where(defined, rich, np.nan).reshape(shape)
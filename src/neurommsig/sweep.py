@@ -0,0 +1,149 @@
+import logging
+from functools import partial
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.neurommsig.config import RunConfig
+from src.neurommsig.inference import CausalInference
+from src.neurommsig.kam import KAM, csr_positions
+from src.neurommsig.reader import DataReader, DataSession
+from src.neurommsig.results import StatTable
+from src.neurommsig.stats import concordance, map_unique, richness
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def sweep_thresholds(
+    kam: KAM,
+    gene_set: pd.DataFrame,
+    p_thresholds: Sequence[float],
+    fc_thresholds: Sequence[float],
+) -> pd.DataFrame:
+    """
+    Get the statistics of all upstream nodes for every pair of p-value and fold change thresholds.
+    For each fold change threshold the genes are admitted in order of p-value, and only the
+    upstream nodes of genes whose state changes are updated, by the change of their weight and
+    of their numbers of up- and down-regulated downstream nodes.
+    :param kam: KAM network
+    :param gene_set: gene set from a GEO experiment
+    :param p_thresholds: adjusted p-values below which a gene is significant
+    :param fc_thresholds: absolute log fold changes above which a significant gene is regulated
+    :return: statistics table with one row per pair of thresholds and upstream node
+    """
+    p_thresholds = np.sort(np.asarray(p_thresholds, dtype=float))
+    fc_thresholds = np.asarray(fc_thresholds, dtype=float)
+    n_nodes = len(kam.nodes)
+    inference = CausalInference.from_kam(kam, np.zeros(n_nodes))
+    # reverse adjacency: the edges into each downstream node, with their upstream node and sign
+    order = np.argsort(inference.indices, kind="stable")
+    in_indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(inference.indices, minlength=n_nodes), out=in_indptr[1:])
+    in_rows = inference.rows[order]
+    in_signs = inference.relation_signs[order].astype(np.int64)
+
+    # rows of genes in the network, sorted once by p-value
+    node_index = pd.Index(kam.nodes)
+    genes = node_index.get_indexer(gene_set["gene_symbol"].astype(object))
+    keep = genes >= 0
+    p_values = gene_set["p_value"].to_numpy(dtype=float)[keep]
+    fold_changes = gene_set["log_fold_change"].to_numpy(dtype=float)[keep]
+    by_p = np.argsort(p_values, kind="stable")
+    genes, p_values, fold_changes = genes[keep][by_p], p_values[by_p], fold_changes[by_p]
+
+    shape = (len(fc_thresholds), len(p_thresholds), n_nodes)
+    weights, n_up, n_down = (np.zeros(shape, dtype=np.int64) for _ in range(3))
+    n_regulated = np.zeros(shape[:2], dtype=np.int64)
+    for i, fc_thred in enumerate(fc_thresholds):
+        regulated = np.abs(fold_changes) > fc_thred
+        up_rows = np.zeros(n_nodes, dtype=np.int64)
+        down_rows = np.zeros(n_nodes, dtype=np.int64)
+        states = np.zeros(n_nodes, dtype=np.int64)
+        weight = np.zeros(n_nodes, dtype=np.int64)
+        up, down = np.zeros(n_nodes, dtype=np.int64), np.zeros(n_nodes, dtype=np.int64)
+        m = 0
+        start = 0
+        for j, stop in enumerate(np.searchsorted(p_values, p_thresholds, side="left")):
+            # admit the genes significant at this p-value threshold but not at the previous one
+            admitted = slice(start, stop)
+            start = stop
+            mask = regulated[admitted]
+            touched = genes[admitted][mask]
+            np.add.at(up_rows, touched, fold_changes[admitted][mask] > 0)
+            np.add.at(down_rows, touched, fold_changes[admitted][mask] < 0)
+            touched = np.unique(touched)
+            # an up-regulated row wins over a down-regulated one
+            new_states = np.where(up_rows[touched] > 0, 1, np.where(down_rows[touched] > 0, -1, 0))
+            changed = new_states != states[touched]
+            nodes, old, new = touched[changed], states[touched][changed], new_states[changed]
+            states[nodes] = new
+            m += np.count_nonzero(new) - np.count_nonzero(old)
+            # update the upstream nodes of the changed genes by deltas
+            edges = csr_positions(in_indptr, nodes)
+            counts = np.diff(in_indptr)[nodes]
+            old, new = np.repeat(old, counts), np.repeat(new, counts)
+            upstream = in_rows[edges]
+            np.add.at(weight, upstream, in_signs[edges] * (new - old))
+            np.add.at(up, upstream, (new == 1).astype(np.int64) - (old == 1))
+            np.add.at(down, upstream, (new == -1).astype(np.int64) - (old == -1))
+            weights[i, j], n_up[i, j], n_down[i, j], n_regulated[i, j] = weight, up, down, m
+
+    # statistics of all thresholds at once, computed once per distinct set of counts
+    n = n_up + n_down
+    k = np.where(weights > 0, n_up, np.where(weights < 0, n_down, 0))
+    ambiguous = np.where(weights == 0, n, 0)
+    m = n_regulated[..., np.newaxis]
+    conc = map_unique(concordance, n=n, k=k, ambiguous=ambiguous, m=m)
+    rich = map_unique(partial(richness, n_nodes), m=m, n=np.diff(kam.indptr), k=n)
+    fc_grid, p_grid = np.meshgrid(fc_thresholds, p_thresholds, indexing="ij")
+    return pd.DataFrame(
+        {
+            "p_threshold": np.repeat(p_grid.ravel(), n_nodes),
+            "fc_threshold": np.repeat(fc_grid.ravel(), n_nodes),
+            "gene": pd.Categorical.from_codes(
+                np.tile(np.arange(n_nodes), p_grid.size), categories=kam.nodes
+            ),
+            "weight": weights.ravel(),
+            "concordance": conc.ravel(),
+            "richness": rich.ravel(),
+        }
+    )
+
+
+class SweepRCRstat:
+    """Get statistics of one pathway and expression contrast across a grid of thresholds."""
+
+    def __init__(
+        self,
+        p_thresholds: Sequence[float],
+        fc_thresholds: Sequence[float],
+        session: Optional[DataSession] = None,
+        config: Optional[RunConfig] = None,
+    ):
+        """
+        :param p_thresholds: adjusted p-values below which a gene is significant
+        :param fc_thresholds: absolute log fold changes above which a significant gene is regulated
+        :param session: session sharing loaded tables across analyses, a new session if None
+        :param config: input files of the run, the defaults if None, its thresholds are ignored
+        """
+        config = RunConfig() if config is None else config
+        # the data are read once, keeping the genes regulated at the loosest thresholds
+        config = config.replace(p_thred=max(p_thresholds), fc_thred=min(fc_thresholds))
+        reader = DataReader.from_config(config, session)
+        logger.info(f"Sweeping {len(p_thresholds) * len(fc_thresholds)} pairs of thresholds.")
+        self._stat_table = sweep_thresholds(
+            reader.get_kam(), reader.get_gene_set(), p_thresholds, fc_thresholds
+        )
+
+    def get_stat(self, output: str = None) -> pd.DataFrame:
+        """
+        Get the statistics of all upstream nodes for all pairs of thresholds.
+        :param output: path to write the statistics table, as TSV, Parquet or Arrow depending on
+            its extension
+        :return: statistics table with one row per pair of thresholds and upstream node
+        """
+        if output:
+            StatTable.from_frame(self._stat_table).write(output)
+        return self._stat_table
@@ -1,7 +1,11 @@
 import random
+from typing import Optional
 
+import numpy as np
 import pandas as pd
 
+from src.neurommsig.constants import FC_THRED, P_THRED
+
 
 def make_fake_pathway(gene_set: list, k: int = 10, output_path: str = None) -> pd.DataFrame:
     """
@@ -27,3 +31,93 @@ def make_fake_pathway(gene_set: list, k: int = 10, output_path: str = None) -> p
     if output_path:
         pathway.to_csv(output_path, sep="\t", index=False, header=False)
     return pathway
+
+
+def make_scale_free_pathway(
+    n_edges: int,
+    n_genes: Optional[int] = None,
+    exponent: float = 2.5,
+    seed: int = 0,
+    output_path: str = None,
+) -> pd.DataFrame:
+    """
+    Generate a fake pathway whose node degrees follow a power law, like
+    :func:`make_fake_pathway` but in time linear in the number of edges.
+    Endpoints are drawn with probabilities proportional to fixed gene weights (Chung-Lu model),
+    so a few hub genes take part in many interactions.
+    :param n_edges: number of edges
+    :param n_genes: number of genes, a quarter of the number of edges if None
+    :param exponent: exponent of the degree distribution, above 2
+    :param seed: random seed
+    :param output_path: path to save fake pathway
+    :return: fake pathway dataframe, without self-loops or duplicate edges
+    """
+    rng = np.random.default_rng(seed)
+    n_genes = max(n_edges // 4, 10) if n_genes is None else n_genes
+    weights = np.arange(1, n_genes + 1) ** (-1 / (exponent - 1))
+    weights /= weights.sum()
+    genes = np.char.add("G", rng.permutation(n_genes).astype(str))
+
+    keys = np.empty(0, dtype=np.int64)
+    # draw until enough distinct pairs remain, hubs make duplicates more likely
+    while len(keys) < n_edges:
+        n_draws = 2 * (n_edges - len(keys)) + 10
+        sources = rng.choice(n_genes, n_draws, p=weights)
+        targets = rng.choice(n_genes, n_draws, p=weights)
+        drawn = (sources * n_genes + targets)[sources != targets]
+        keys = np.concatenate([keys, drawn])
+        # keep the first draw of every pair, in draw order
+        keys = keys[np.sort(np.unique(keys, return_index=True)[1])]
+    keys = keys[:n_edges]
+
+    pathway = pd.DataFrame({0: genes[keys // n_genes], 1: "interaction", 2: genes[keys % n_genes]})
+    if output_path:
+        pathway.to_csv(output_path, sep="\t", index=False, header=False)
+    return pathway
+
+
+def make_fake_mapping(
+    pathway: pd.DataFrame, inhibition_ratio: float = 0.3, seed: int = 0, output_path: str = None
+) -> pd.DataFrame:
+    """
+    Generate a fake gene interaction map giving a causal relation to every edge of a fake pathway.
+    :param pathway: fake pathway dataframe
+    :param inhibition_ratio: fraction of inhibitions, the other edges are activations
+    :param seed: random seed
+    :param output_path: path to save fake gene interaction map
+    :return: fake gene interaction map dataframe
+    """
+    rng = np.random.default_rng(seed)
+    relations = np.where(rng.random(len(pathway)) < inhibition_ratio, "inhibition", "activation")
+    mapping = pd.DataFrame(
+        {"source": pathway[0].to_numpy(), "target": pathway[2].to_numpy(), "relation": relations}
+    )
+    if output_path:
+        mapping.to_csv(output_path, sep="\t")
+    return mapping
+
+
+def make_fake_geo(
+    gene_set: list, regulated_ratio: float = 0.2, seed: int = 0, output_path: str = None
+) -> pd.DataFrame:
+    """
+    Generate a fake GEO top table of differential expression.
+    :param gene_set: a list of genes
+    :param regulated_ratio: fraction of genes significantly up- or down-regulated
+    :param seed: random seed
+    :param output_path: path to save fake GEO top table
+    :return: fake GEO top table dataframe
+    """
+    rng = np.random.default_rng(seed)
+    n_genes = len(gene_set)
+    regulated = rng.random(n_genes) < regulated_ratio
+    geo = pd.DataFrame(
+        {
+            "adj.P.Val": np.where(regulated, P_THRED / 10, rng.uniform(P_THRED, 1, n_genes)),
+            "logFC": rng.choice([-1, 1], n_genes) * rng.uniform(FC_THRED + 0.1, 3, n_genes),
+            "Gene.symbol": gene_set,
+        }
+    )
+    if output_path:
+        geo.to_csv(output_path, sep="\t")
+    return geo
@@ -0,0 +1,88 @@
+from typing import Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class SymbolVocabulary:
+    """Dense integer ids of gene symbols, shared by all tables of a session.
+
+    Ids are assigned in order of first appearance and never change. Tables interned with
+    :meth:`categorical` take the vocabulary at that time as their categories, so their
+    categories are always a prefix of :attr:`symbols` and their codes are vocabulary ids: tables
+    interned at different times can be joined on their codes without comparing strings.
+    """
+
+    def __init__(self, symbols: Iterable[str] = ()):
+        """
+        :param symbols: initial gene symbols, in id order
+        """
+        self._ids = dict()
+        self._symbols = []
+        self.__categories = None
+        self.encode(list(symbols))
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._ids
+
+    @property
+    def symbols(self) -> pd.Index:
+        """Gene symbols in id order."""
+        if self.__categories is None or len(self.__categories) != len(self._symbols):
+            self.__categories = pd.Index(self._symbols, dtype=object)
+        return self.__categories
+
+    def get_id(self, symbol: str) -> int:
+        """
+        Return the id of a gene symbol.
+        :param symbol: gene symbol
+        :return: id, -1 for an unknown symbol
+        """
+        return self._ids.get(symbol, -1)
+
+    def encode(self, values: Sequence) -> np.ndarray:
+        """
+        Return the ids of gene symbols, adding unknown symbols to the vocabulary.
+        Each distinct symbol is hashed once, so categorical values cost one lookup per category.
+        :param values: gene symbols, a list, an array, a series or a categorical
+        :return: id of each value, -1 for a missing value
+        """
+        if not hasattr(values, "dtype"):
+            values = np.asarray(values, dtype=object)
+        codes, uniques = pd.factorize(values)
+        ids = np.empty(len(uniques), dtype=np.int64)
+        for i, symbol in enumerate(uniques.tolist()):
+            if symbol not in self._ids:
+                self._ids[symbol] = len(self._symbols)
+                self._symbols.append(symbol)
+            ids[i] = self._ids[symbol]
+        # missing values keep the code -1
+        return np.append(ids, -1)[codes]
+
+    def lookup(self, values: Sequence) -> np.ndarray:
+        """
+        Return the ids of gene symbols without adding unknown symbols.
+        :param values: gene symbols
+        :return: id of each value, -1 for an unknown or missing value
+        """
+        return self.symbols.get_indexer(pd.Index(values, dtype=object))
+
+    def decode(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Return the gene symbols of ids.
+        :param ids: ids, -1 for a missing value
+        :return: object array of gene symbols, NaN for a missing value
+        """
+        return np.append(self.symbols.to_numpy(), np.nan)[np.asarray(ids)]
+
+    def categorical(self, values: Sequence) -> pd.Categorical:
+        """
+        Intern gene symbols as a categorical whose codes are their ids.
+        :param values: gene symbols
+        :return: categorical with the vocabulary as categories
+        """
+        ids = self.encode(values)
+        return pd.Categorical.from_codes(ids, categories=self.symbols)
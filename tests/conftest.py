@@ -0,0 +1,14 @@
+"""Fixtures shared by all tests."""
+
+import pytest
+
+from src.neurommsig import cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path_factory):
+    """Write cache entries of each test to a new directory, never reading the user's cache."""
+    settings = dict(cache._settings)
+    cache.configure(directory=str(tmp_path_factory.mktemp("cache")))
+    yield
+    cache._settings.update(settings)
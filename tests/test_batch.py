@@ -0,0 +1,46 @@
+import os
+
+import pandas as pd
+
+from src.neurommsig.batch import BatchRCRstat, read_contrasts
+from src.neurommsig.constants import GEO_FILE
+from src.neurommsig.neurommsig import RCRstat
+from src.neurommsig.preprocessing import get_state_matrix
+
+
+class TestBatch:
+    """Tests for batch.py."""
+
+    def testReadContrasts(self, tmp_path):
+        """Test for read_contrasts function."""
+        for name in ("b.tsv", "a.txt", "notes.md"):
+            (tmp_path / name).write_text("")
+        assert list(read_contrasts(str(tmp_path))) == ["a", "b"]
+
+        manifest = tmp_path / "manifest.txt"
+        manifest.write_text("a.txt\nsecond\tb.tsv\n\n")
+        assert read_contrasts(str(manifest)) == {
+            "a": os.path.join(str(tmp_path), "a.txt"),
+            "second": os.path.join(str(tmp_path), "b.tsv"),
+        }
+
+    def testGetStateMatrix(self):
+        """Test for get_state_matrix function."""
+        columns = ["gene_symbol", "log_fold_change", "p_value"]
+        gene_sets = {
+            "c1": pd.DataFrame([("SMAD3", 2.0, 0.001), ("DAB2", -2.0, 0.001)], columns=columns),
+            "c2": pd.DataFrame([("SMAD3", -2.0, 0.001), ("SMAD3", 2.0, 0.001)], columns=columns),
+        }
+        states = get_state_matrix(gene_sets, ["SMAD3", "DAB2", "TGFB1"])
+
+        assert states.columns.tolist() == ["c1", "c2"]
+        assert states.to_numpy().tolist() == [[1, 1], [-1, 0], [0, 0]]
+
+    def testBatchRCRstat(self):
+        """Test for BatchRCRstat class."""
+        stat = RCRstat()
+        batch = BatchRCRstat({"first": GEO_FILE, "second": GEO_FILE})
+        stat_table = batch.get_stat().set_index(["contrast", "gene"])
+
+        for contrast in ("first", "second"):
+            assert stat_table.loc[contrast].weight.to_dict() == stat._weights
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from src.neurommsig import cache
+from src.neurommsig.constants import MAPPING_FILE, PATHWAY_FILE
+from src.neurommsig.kam import KAM
+from src.neurommsig.reader import DataReader
+
+
+class TestCache:
+    """Tests for cache.py."""
+
+    def testRoundTrip(self, tmp_path):
+        """Test for reading cached pathways and KAM networks."""
+        cache.configure(directory=str(tmp_path))
+        try:
+            pathway = pd.DataFrame(
+                {
+                    "source": ["SMAD3", "SMAD3", "SMAD4"],
+                    "target": ["SMAD4", "SMAD4", "TGFB1"],
+                    "relation": ["activation", "inhibition", np.nan],
+                }
+            )
+            cache.save_pathway("key", pathway)
+            pd.testing.assert_frame_equal(cache.load_pathway("key"), pathway, check_dtype=False)
+            assert cache.load_pathway("other") is None
+
+            kam = KAM.from_pathway(pathway)
+            cache.save_kam("key", kam)
+            cached = cache.load_kam("key")
+            assert cached.get_hyp_networks() == kam.get_hyp_networks()
+            assert pd.isna(cached.relations).tolist() == [False, False, True, True]
+            assert cached.relations[:2].tolist() == ["ambiguous", "ambiguous"]
+
+            assert cache.clear() == 2
+            assert cache.load_kam("key") is None
+        finally:
+            cache.configure(directory=cache.CACHE_DIR)
+
+    def testDataReader(self, tmp_path):
+        """Test that DataReader invalidates cache entries when source files change."""
+        cache.configure(directory=str(tmp_path))
+        try:
+            pathway_file = tmp_path / "pathway.txt"
+            pathway_file.write_bytes(open(PATHWAY_FILE, "rb").read())
+            reader = DataReader(gene_file=None, pathway_file=str(pathway_file))
+            kam = reader.get_kam()
+
+            cached = DataReader(gene_file=None, pathway_file=str(pathway_file))
+            assert cached.get_kam().get_hyp_networks() == kam.get_hyp_networks()
+            assert cached.get_session().file_reads[str(pathway_file)] == 0
+
+            with open(pathway_file, "a") as file:
+                file.write("\nSMAD3\tactivation\tSMAD7\n")
+            changed = DataReader(gene_file=None, pathway_file=str(pathway_file))
+            assert changed.get_digest() != reader.get_digest()
+            changed.get_kam()
+            assert changed.get_session().file_reads[str(pathway_file)] == 1
+            assert changed.get_digest() == cache.file_digest(str(pathway_file), MAPPING_FILE)
+        finally:
+            cache.configure(directory=cache.CACHE_DIR)
@@ -0,0 +1,94 @@
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+from click.testing import CliRunner
+
+from src.neurommsig.cli import main
+from src.neurommsig.config import RunConfig
+from src.neurommsig.constants import ROOT_DIR
+from src.neurommsig.neurommsig import RCRstat
+from src.neurommsig.reader import DataReader
+
+
+class TestCli:
+    """Tests for cli.py."""
+
+    def testHelp(self):
+        """Test that the command line interface lists its subcommands."""
+        result = CliRunner().invoke(main, ["--help"])
+
+        assert result.exit_code == 0
+        assert "batch" in result.output
+
+    def testLazyImports(self):
+        """Test that plotting, graph and statistics libraries are imported on demand."""
+        code = (
+            "import sys, src.neurommsig.neurommsig; "
+            "print(sorted({'matplotlib', 'networkx', 'scipy'} & set(sys.modules)))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        )
+
+        assert result.stdout.strip() == "[]"
+
+    def testStats(self, tmp_path):
+        """Test that the stats subcommand passes thresholds through a run configuration."""
+        output = tmp_path / "stat.tsv"
+        result = CliRunner().invoke(main, ["stats", "-f", "100", "-o", str(output)])
+
+        assert result.exit_code == 0
+        stat_table = pd.read_csv(output, sep="\t")
+        assert (stat_table.weight == 0).all()
+        assert RCRstat(config=RunConfig(fc_thred=100))._context.n_regulated == 0
+
+    def testStatsDepth(self, tmp_path):
+        """Test that the stats subcommand scores multi-hop HYP networks."""
+        output = tmp_path / "stat.tsv"
+        result = CliRunner().invoke(main, ["stats", "-d", "2", "-o", str(output)])
+
+        assert result.exit_code == 0
+        stat = RCRstat(config=RunConfig(depth=2))
+        assert len(pd.read_csv(output, sep="\t")) == len(stat.get_all_genes())
+        assert len(stat._kam.indices) > len(RCRstat()._kam.indices)
+
+    def testStatsDirected(self, tmp_path):
+        """Test that the stats subcommand scores HYP networks of the targets of each node."""
+        output = tmp_path / "stat.tsv"
+        result = CliRunner().invoke(main, ["stats", "--directed", "-o", str(output)])
+
+        assert result.exit_code == 0
+        stat = RCRstat(config=RunConfig(directed=True))
+        kam = stat._kam
+        assert len(pd.read_csv(output, sep="\t")) == len(stat.get_all_genes())
+        # every pathway edge is scored once, from its source
+        assert len(kam.indices) < len(RCRstat()._kam.indices)
+        directed = DataReader(gene_file=None).get_directed_kam()
+        for source, targets in kam.get_hyp_networks().items():
+            assert targets == directed.successors(source)
+
+    def testProfiler(self, tmp_path):
+        """Test that the run is profiled with pyinstrument."""
+        pytest.importorskip("pyinstrument")
+        profile, output = tmp_path / "run.html", str(tmp_path / "stat.tsv")
+        result = CliRunner().invoke(
+            main, ["--profile", str(profile), "--profiler", "pyinstrument", "stats", "-o", output]
+        )
+
+        assert result.exit_code == 0
+        assert "<html" in profile.read_text()
+
+    def testStatsInvalidCounts(self, tmp_path):
+        """Test that negative permutation and non-positive worker counts are usage errors."""
+        output = str(tmp_path / "stat.tsv")
+        for args in (["-n", "-3"], ["-n", "5", "-w", "0"]):
+            result = CliRunner().invoke(main, ["stats", *args, "-o", output])
+            assert result.exit_code == 2
+
+    def testServeInvalidCounts(self):
+        """Test that the server rejects empty worker pools, concurrency limits and caches."""
+        for option in ("-w", "--max-concurrency", "--cache-size"):
+            result = CliRunner().invoke(main, ["serve", option, "0"])
+            assert result.exit_code == 2
@@ -0,0 +1,87 @@
+import networkx as nx
+import numpy as np
+
+from src.neurommsig.inference import CausalInference, SparseInference
+
+
+class TestCausalInference:
+    """Tests for inference.py."""
+
+    def testCausalInference(self):
+        """Test for CausalInference class."""
+        G = nx.Graph()
+        G.add_edge("TGFB1", "SMAD3", relation="activation")
+        G.add_edge("TGFB1", "SMAD7", relation="inhibition")
+        G.add_edge("TGFB1", "DAB2", relation="ambiguous")
+        hyps = {node: list(G[node]) for node in G.nodes}
+        states = [0, 1, 1, -1]
+        inference = CausalInference.from_hyp_networks(hyps, G, states)
+
+        weight_table = inference.get_weight_table()
+        assert weight_table == {"TGFB1": 0, "SMAD3": 0, "SMAD7": 0, "DAB2": 0}
+
+        infer_table = inference.get_infer_table()
+        assert infer_table["TGFB1"]["SMAD3"] == {
+            "causal_rel": "activation",
+            "state_change": "increase",
+            "weight": 1,
+            "type": "ambiguous",
+        }
+        assert infer_table["TGFB1"]["DAB2"]["weight"] == 0
+        assert infer_table["SMAD3"]["TGFB1"]["type"] is None
+
+        table = inference.to_frame()
+        assert len(table) == 2 * G.number_of_edges()
+        assert table.columns.tolist() == [
+            "upstream",
+            "downstream",
+            "causal_rel",
+            "state_change",
+            "weight",
+            "type",
+        ]
+        assert table["weight"].isna().sum() == 3
+
+    def testUpdateStates(self):
+        """Test for incremental update of node states."""
+        G = nx.Graph()
+        G.add_edge("TGFB1", "SMAD3", relation="activation")
+        G.add_edge("TGFB1", "SMAD7", relation="inhibition")
+        G.add_edge("SMAD3", "SMAD4", relation="activation")
+        G.add_edge("DAB2", "SMAD4", relation="inhibition")
+        hyps = {node: list(G[node]) for node in G.nodes}
+        inference = CausalInference.from_hyp_networks(hyps, G, [0, 1, -1, 0, 0])
+
+        upstream = inference.update_states([3], [1])
+        fresh = CausalInference.from_hyp_networks(hyps, G, [0, 1, -1, 1, 0])
+
+        assert inference.nodes[upstream].tolist() == ["SMAD3", "DAB2"]
+        assert inference.get_weight_table() == fresh.get_weight_table()
+        assert inference.get_infer_table() == fresh.get_infer_table()
+        np.testing.assert_array_equal(inference.get_concordance(), fresh.get_concordance())
+        np.testing.assert_array_equal(inference.get_richness(), fresh.get_richness())
+
+        # a node listed twice takes its last state and is counted once
+        inference.update_states([0, 0, 3], [-1, 1, 1])
+        fresh = CausalInference.from_hyp_networks(hyps, G, [1, 1, -1, 1, 0])
+
+        assert inference.get_weight_table() == fresh.get_weight_table()
+        assert inference.get_infer_table() == fresh.get_infer_table()
+
+    def testSparseInference(self):
+        """Test for SparseInference class against the inference of each edge."""
+        G = nx.Graph()
+        G.add_edge("TGFB1", "SMAD3", relation="activation")
+        G.add_edge("TGFB1", "SMAD7", relation="inhibition")
+        G.add_edge("TGFB1", "DAB2", relation="ambiguous")
+        G.add_edge("SMAD3", "SMAD4", relation="activation")
+        hyps = {node: list(G[node]) for node in G.nodes}
+        states = np.array([[0, 1, 1, -1, 0], [1, 1, -1, 0, -1], [0, 0, 0, 0, 0]]).T
+        inference = CausalInference.from_hyp_networks(hyps, G, states)
+        sparse = SparseInference.from_inference(inference)
+
+        np.testing.assert_array_equal(sparse.total_weights, inference.total_weights)
+        np.testing.assert_array_equal(sparse.get_concordance(), inference.get_concordance())
+        np.testing.assert_array_equal(sparse.get_richness(), inference.get_richness())
+        vector = sparse.with_states(states[:, 0])
+        assert vector.get_weight_table() == inference.with_states(states[:, 0]).get_weight_table()
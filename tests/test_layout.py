@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from src.neurommsig import cache, layout
+from src.neurommsig.kam import KAM
+
+
+class TestLayout:
+    """Tests for layout.py."""
+
+    def testComputeLayout(self, monkeypatch):
+        """Test that exact and grid repulsion give deterministic layouts of linked nodes."""
+        rng = np.random.default_rng(0)
+        pathway = pd.DataFrame(
+            {
+                "source": np.char.add("G", rng.integers(0, 300, 1200).astype(str)),
+                "target": np.char.add("G", rng.integers(0, 300, 1200).astype(str)),
+                "relation": "activation",
+            }
+        )
+        kam = KAM.from_pathway(pathway)
+        exact = layout.compute_layout(kam.indptr, kam.indices)
+        monkeypatch.setattr(layout, "EXACT_REPULSION_MAX_NODES", 0)
+        grid = layout.compute_layout(kam.indptr, kam.indices)
+
+        sources, targets = layout._edge_pairs(kam.indptr, kam.indices)
+        pairs = rng.integers(0, len(kam.nodes), (5000, 2))
+        for positions in (exact, grid):
+            assert positions.shape == (len(kam.nodes), 2)
+            assert np.abs(positions).max() <= 1
+            # linked nodes are placed closer together than random pairs of nodes
+            edge_length = np.linalg.norm(positions[sources] - positions[targets], axis=1).mean()
+            distance = np.linalg.norm(positions[pairs[:, 0]] - positions[pairs[:, 1]], axis=1)
+            assert edge_length < 0.8 * distance.mean()
+        assert np.array_equal(grid, layout.compute_layout(kam.indptr, kam.indices))
+
+    def testGetLayout(self, tmp_path, monkeypatch):
+        """Test that layouts are computed once and then read from memory or the cache."""
+        cache.configure(directory=str(tmp_path))
+        try:
+            pathway = pd.DataFrame(
+                {
+                    "source": ["TGFB1", "SMAD3", "SMAD4"],
+                    "target": ["SMAD3", "SMAD4", "DAB2"],
+                    "relation": ["activation", "inhibition", "activation"],
+                }
+            )
+            kam = KAM.from_pathway(pathway)
+            positions = layout.get_layout(kam)
+            assert layout.get_layout(kam) is positions
+
+            layout._layouts.clear()
+            monkeypatch.setattr(layout, "compute_layout", None)
+            assert np.array_equal(layout.get_layout(kam), positions)
+        finally:
+            layout._layouts.clear()
+            cache.configure(directory=cache.CACHE_DIR)
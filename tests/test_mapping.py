@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from src.neurommsig import cache
+from src.neurommsig.constants import MAPPING_FILE, PATHWAY_FILE
+from src.neurommsig.mapping import EdgeIndex
+from src.neurommsig.reader import DataSession
+
+
+class TestMapping:
+    """Tests for mapping.py."""
+
+    def testEdgeIndex(self):
+        """Test that edge index lookups give the rows of a left join on the map."""
+        index = EdgeIndex(
+            sources=[0, 1, 0, 0, 2],
+            targets=[1, 2, 1, 1, 0],
+            relations=["activation", "inhibition", "inhibition", "activation", np.nan],
+        )
+        rows, relations = index.lookup([2, 0, 1, 1], [0, 1, 0, 2])
+
+        assert len(index) == 4
+        assert rows.tolist() == [0, 1, 1, 2, 3]
+        assert pd.isna(relations).tolist() == [True, False, False, True, False]
+        assert relations[[1, 2, 4]].tolist() == ["activation", "inhibition", "inhibition"]
+
+    def testGetPathways(self, tmp_path):
+        """Test that many pathways are resolved in one call, as one merge per pathway would."""
+        pathway_files = [str(tmp_path / name) for name in ("first.txt", "second.txt")]
+        lines = open(PATHWAY_FILE).read().splitlines()
+        for path, part in zip(pathway_files, (lines[::2], lines[1::3])):
+            with open(path, "w") as file:
+                file.write("\n".join(part) + "\n")
+        cache.configure(enabled=False)
+        try:
+            session = DataSession()
+            pathways = session.get_pathways(pathway_files, MAPPING_FILE)
+
+            assert list(pathways) == pathway_files
+            mapping_data = session.get_mapping_data(MAPPING_FILE).astype(object)
+            for path, pathway in pathways.items():
+                expected = (
+                    session.get_pathway_data(path)
+                    .astype(object)
+                    .merge(mapping_data, how="left", on=["source", "target"])[
+                        ["source", "target", "relation"]
+                    ]
+                    .drop_duplicates()
+                )
+                assert pathway.astype(object).fillna("").values.tolist() == (
+                    expected.fillna("").values.tolist()
+                )
+                assert session.get_pathway(path, MAPPING_FILE) is pathway
+            kams = session.get_kams(pathway_files, MAPPING_FILE)
+            assert set(session.file_reads.values()) == {1}
+            assert (
+                kams[pathway_files[0]].nodes.tolist()
+                == pd.unique(
+                    pathways[pathway_files[0]][["source", "target"]].to_numpy().ravel()
+                ).tolist()
+            )
+        finally:
+            cache.configure(enabled=True)
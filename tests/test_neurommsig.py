@@ -1,8 +1,10 @@
 import os
 
+import pandas as pd
 import pytest
 
-from src.neurommsig.neurommsig import RCR, RCRstat, Graph
+from src.neurommsig.kam import KAM, DirectedKAM
+from src.neurommsig.neurommsig import RCR, RCRstat, Graph, derive_kam
 
 
 class TestNeurommsig:
@@ -31,3 +33,128 @@ class TestNeurommsig:
 
         assert os.path.exists(output_path) is True
         os.remove(output_path)
+
+    def testUpdateStates(self):
+        """Test for incremental update of gene states."""
+        stat = RCRstat()
+        gene = stat.get_all_genes()[0]
+        state = "decrease" if stat._context.which_state_change(gene) == "increase" else "increase"
+        changed = stat.update_states({gene: state})
+        fresh = stat._infer()
+
+        assert stat._weights == fresh.get_weight_table()
+        stat._inference = fresh
+        assert stat._concs == stat._cal_concordance()
+        assert stat._richs == stat._cal_richness()
+        assert set(changed) <= set(stat._weights)
+        with pytest.raises(ValueError):
+            stat.update_states({"NOT_A_GENE": "increase"})
+
+    def testDeriveKam(self):
+        """Test for derive_kam function."""
+        pathway = pd.DataFrame(
+            [
+                ("SMAD3", "SMAD4", "activation"),
+                ("SMAD3", "SMAD4", "inhibition"),
+                ("SMAD4", "TGFB1", "inhibition"),
+                ("TGFB1", "DAB2", "activation"),
+            ],
+            columns=["source", "target", "relation"],
+        )
+        G = derive_kam(pathway)
+
+        assert G["SMAD3"]["SMAD4"]["relation"] == "ambiguous"
+        assert G["SMAD4"]["SMAD3"]["relation"] == "ambiguous"
+        assert G["SMAD4"]["TGFB1"]["relation"] == "inhibition"
+        assert G["TGFB1"]["DAB2"]["relation"] == "activation"
+
+    def testDirectedKam(self):
+        """Test for DirectedKAM class."""
+        pathway = pd.DataFrame(
+            [
+                ("SMAD3", "SMAD4", "activation"),
+                ("SMAD3", "SMAD4", "inhibition"),
+                ("SMAD4", "TGFB1", "inhibition"),
+                ("TGFB1", "SMAD4", "activation"),
+                ("TGFB1", "DAB2", "activation"),
+            ],
+            columns=["source", "target", "relation"],
+        )
+        kam = DirectedKAM.from_pathway(pathway)
+
+        assert kam.successors("SMAD3") == ["SMAD4"]
+        assert kam.predecessors("SMAD4") == ["SMAD3", "TGFB1"]
+        assert kam.get_relations("SMAD3", "SMAD4") == ["activation", "inhibition"]
+        assert kam.get_relations("SMAD4", "SMAD3") == []
+
+        undirected = kam.to_kam()
+        expected = KAM.from_graph(derive_kam(pathway))
+        assert undirected.get_hyp_networks() == expected.get_hyp_networks()
+        assert undirected.relations.tolist() == expected.relations.tolist()
+        assert undirected.get_relation("SMAD4", "TGFB1") == "activation"
+
+        directed = kam.to_kam(directed=True)
+        assert directed.get_hyp_networks() == {
+            "SMAD3": ["SMAD4"],
+            "SMAD4": ["TGFB1"],
+            "TGFB1": ["SMAD4", "DAB2"],
+            "DAB2": [],
+        }
+        assert directed.get_relation("SMAD3", "SMAD4") == "ambiguous"
+        assert directed.get_relation("SMAD4", "TGFB1") == "inhibition"
+        assert directed.get_relation("TGFB1", "SMAD4") == "activation"
+        assert KAM.from_pathway(pathway, directed=True).get_hyp_networks() == (
+            directed.get_hyp_networks()
+        )
+
+    def testExpandKam(self):
+        """Test for multi-hop HYP networks."""
+        pathway = pd.DataFrame(
+            [
+                ("TGFB1", "SMAD3", "activation"),
+                ("SMAD3", "SMAD4", "inhibition"),
+                ("TGFB1", "SMAD7", "activation"),
+                ("SMAD7", "DAB2", "activation"),
+                ("SMAD4", "DAB2", "activation"),
+                ("DAB2", "PML", "binding"),
+                ("PML", "SPTBN1", "activation"),
+            ],
+            columns=["source", "target", "relation"],
+        )
+        kam = DirectedKAM.from_pathway(pathway)
+        expanded = kam.expand(2)
+        hyps = expanded.get_hyp_networks()
+        relations = dict(
+            zip(hyps["TGFB1"], expanded.relations[expanded.indptr[0] : expanded.indptr[1]])
+        )
+
+        assert kam.expand(1).get_hyp_networks() == kam.to_kam().get_hyp_networks()
+        assert hyps["TGFB1"] == ["SMAD3", "SMAD7", "SMAD4", "DAB2"]
+        assert relations == {
+            "SMAD3": "activation",
+            "SMAD7": "activation",
+            "SMAD4": "inhibition",
+            "DAB2": "activation",
+        }
+        assert expanded.get_relation("SMAD3", "DAB2") == "inhibition"
+        deep = kam.expand(3).get_hyp_networks()
+        # SMAD4 -> DAB2 is not followed backwards from DAB2, nor TGFB1 -> SMAD3 from upstream
+        # TGFB1, and the binding DAB2 - PML is not a causal step
+        assert deep["SMAD7"] == ["TGFB1", "DAB2"]
+        assert deep["SMAD3"] == ["TGFB1", "SMAD4", "DAB2"]
+        # directed HYP networks also start from the targets only
+        assert kam.expand(2, directed=True).get_hyp_networks()["SMAD3"] == ["SMAD4", "DAB2"]
+        # shortest paths of opposite signs make the relation ambiguous
+        conflicting = pd.DataFrame(
+            [
+                ("TGFB1", "SMAD3", "activation"),
+                ("SMAD3", "DAB2", "activation"),
+                ("TGFB1", "SMAD7", "inhibition"),
+                ("SMAD7", "DAB2", "activation"),
+            ],
+            columns=["source", "target", "relation"],
+        )
+        expanded = DirectedKAM.from_pathway(conflicting).expand(2)
+        assert expanded.get_relation("TGFB1", "DAB2") == "ambiguous"
+        with pytest.raises(ValueError):
+            kam.expand(0)
@@ -0,0 +1,34 @@
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from src.neurommsig.parallel import ParallelRCRstat
+from src.neurommsig.utils import make_fake_pathway
+
+
+class TestParallel:
+    """Tests for parallel.py."""
+
+    def testParallelRCRstat(self):
+        """Test for ParallelRCRstat class."""
+        gene_set = ["SMAD3", "SMAD4", "TGFBR2", "SPTBN1", "PML", "TGFB1", "DAB2"]
+        pathway = make_fake_pathway(gene_set=gene_set, k=15)
+        pathway.columns = ["source", "relation", "target"]
+        pathway["relation"] = ["activation", "inhibition", "activation"] * 5
+        pathways = {"first": pathway, "second": pathway.iloc[:8]}
+        gene_sets = {
+            f"contrast{i}": pd.DataFrame(
+                {
+                    "gene_symbol": gene_set,
+                    "log_fold_change": [(-1) ** (i + j) * 2.0 for j in range(len(gene_set))],
+                    "p_value": 0.001,
+                }
+            )
+            for i in range(5)
+        }
+
+        serial = ParallelRCRstat(pathways, gene_sets, n_workers=1).get_stat()
+        parallel = ParallelRCRstat(pathways, gene_sets, n_workers=2, chunk_size=2).get_stat()
+
+        assert_frame_equal(serial, parallel)
+        assert serial.pathway.unique().tolist() == ["first", "second"]
+        assert serial.contrast.unique().tolist() == list(gene_sets)
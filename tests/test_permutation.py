@@ -0,0 +1,50 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from src.neurommsig.inference import CausalInference
+from src.neurommsig.permutation import fdr, permutation_test, permute_states
+
+
+class TestPermutation:
+    """Tests for permutation.py."""
+
+    def testPermuteStates(self):
+        """Test for permute_states function."""
+        states = np.array([1, 1, -1, 0, 0, 0], dtype=np.int8)
+        perms = permute_states(states, n_perm=250, seed=1)
+
+        assert perms.shape == (250, 6)
+        assert (np.sort(perms, axis=1) == np.sort(states)).all()
+        assert (perms == permute_states(states, n_perm=250, seed=1)).all()
+
+    def testFdr(self):
+        """Test for fdr function."""
+        qvalues = fdr([0.01, np.nan, 0.04, 0.03, 0.5])
+
+        assert np.allclose(qvalues, [0.04, np.nan, 0.16 / 3, 0.16 / 3, 0.5], equal_nan=True)
+
+    def testPermutationTest(self):
+        """Test for permutation_test function."""
+        G = nx.gnm_random_graph(30, 80, seed=0)
+        nx.set_edge_attributes(G, "activation", "relation")
+        hyps = {node: list(G[node]) for node in G.nodes}
+        states = np.random.default_rng(0).choice([-1, 0, 0, 1], size=len(hyps))
+        inference = CausalInference.from_hyp_networks(hyps, G, states)
+
+        serial = permutation_test(inference, n_perm=300, seed=2)
+        parallel = permutation_test(inference, n_perm=300, seed=2, n_workers=2)
+
+        assert serial.equals(parallel)
+        assert serial.columns.tolist() == [
+            "concordance_pvalue",
+            "concordance_fdr",
+            "richness_pvalue",
+            "richness_fdr",
+        ]
+        pvalues = serial.richness_pvalue.dropna()
+        assert ((pvalues >= 1 / 301) & (pvalues <= 1)).all()
+        with pytest.raises(ValueError):
+            permutation_test(inference, n_perm=-3)
+        with pytest.raises(ValueError):
+            permutation_test(inference, n_perm=10, n_workers=0)
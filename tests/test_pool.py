@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from src.neurommsig.pool import get_shared, map_shared
+
+
+def _read_shared(task: int) -> tuple:
+    """Read the shared data of a task."""
+    return get_shared()["name"], task
+
+
+class TestPool:
+    """Tests for pool.py."""
+
+    def testMapSharedInProcess(self):
+        """Test for map_shared function running tasks in this process."""
+        results = map_shared(_read_shared, [0, 1], {"name": "a"})
+
+        assert results == [("a", 0), ("a", 1)]
+        # the shared data is not kept alive after the run
+        assert get_shared() == {}
+
+    def testMapSharedThreads(self):
+        """Test for map_shared function called from concurrent threads."""
+        names = [str(i) for i in range(8)]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(
+                executor.map(
+                    lambda name: map_shared(_read_shared, range(50), {"name": name}), names
+                )
+            )
+
+        for name, result in zip(names, results):
+            assert {shared for shared, _ in result} == {name}
+
+    def testMapSharedWorkers(self):
+        """Test for map_shared function on a process pool."""
+        assert map_shared(_read_shared, [0, 1], {"name": "a"}, n_workers=2) == [("a", 0), ("a", 1)]
+
+    def testMapSharedWorkersFromThread(self):
+        """Test for map_shared function starting a process pool while other threads run."""
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(map_shared, _read_shared, [0, 1], {"name": "a"}, 2)
+
+        assert future.result() == [("a", 0), ("a", 1)]
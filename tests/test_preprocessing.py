@@ -0,0 +1,20 @@
+from src.neurommsig.preprocessing import RegulationContext
+
+
+class TestPreprocessing:
+    """Tests for preprocessing.py."""
+
+    def testRegulationContext(self):
+        """Test for RegulationContext class."""
+        context = RegulationContext(
+            upregu_genes=["SMAD3", "SMAD7", "SMAD3"],
+            downregu_genes=["DAB2"],
+            nodes=["TGFB1", "SMAD3", "DAB2"],
+        )
+
+        assert context.which_state_change("SMAD3") == "increase"
+        assert context.which_state_change("DAB2") == "decrease"
+        assert context.which_state_change("TGFB1") is None
+        assert (context.n_upregu, context.n_downregu) == (2, 1)
+        assert (context.n_nodes, context.n_regulated) == (3, 2)
+        assert context.node_index["DAB2"] == 2
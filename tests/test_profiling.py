@@ -0,0 +1,75 @@
+import json
+import pstats
+import threading
+import tracemalloc
+
+import pytest
+
+from src.neurommsig import cache, profiling
+from src.neurommsig.neurommsig import RCRstat
+
+
+class TestProfiling:
+    """Tests for profiling.py."""
+
+    def testStage(self):
+        """Test that nested and repeated stages are named by their path and summed."""
+
+        @profiling.stage("inner")
+        def inner():
+            return [0] * 100000
+
+        assert inner() == [0] * 100000
+        reports = []
+        with profiling.record(callback=reports.append, labels={"job": 1}) as recorder:
+            assert profiling.get_recorder() is recorder
+            with profiling.stage("outer"):
+                inner()
+                inner()
+        assert profiling.get_recorder() is None
+
+        metrics = reports[0]
+        stages = {entry["stage"]: entry for entry in metrics["stages"]}
+        assert metrics["job"] == 1
+        assert list(stages) == ["outer/inner", "outer"]
+        assert stages["outer/inner"]["calls"] == 2
+        assert stages["outer"]["seconds"] >= stages["outer/inner"]["seconds"]
+        assert metrics["seconds"] >= stages["outer"]["seconds"]
+        if "peak_mib" in stages["outer"]:
+            assert stages["outer"]["peak_mib"] >= stages["outer/inner"]["peak_mib"] > 0.5
+
+    def testRecord(self, tmp_path):
+        """Test that a run reports its stages to a JSON file and dumps a profile."""
+        report, profile = tmp_path / "metrics.json", tmp_path / "run.prof"
+        cache.configure(enabled=False)
+        try:
+            with pytest.raises(RuntimeError):
+                with profiling.record(report=str(report), profile=str(profile)):
+                    RCRstat().get_stat(str(tmp_path / "stat.tsv"))
+                    raise RuntimeError("Job failed.")
+        finally:
+            cache.configure(enabled=True)
+
+        stages = [entry["stage"] for entry in json.loads(report.read_text())["stages"]]
+        for name in ("read_gene_set", "kam/merge", "kam", "inference", "richness", "write"):
+            assert name in stages
+        assert pstats.Stats(str(profile)).total_calls > 0
+
+    def testConcurrentRecords(self):
+        """Test that memory is traced until the last of concurrent recordings stops."""
+        first, second = threading.Event(), threading.Event()
+
+        def run():
+            with profiling.record():
+                first.set()
+                second.wait()
+
+        assert not tracemalloc.is_tracing()
+        thread = threading.Thread(target=run)
+        thread.start()
+        first.wait()
+        with profiling.record():
+            second.set()
+            thread.join()
+            assert tracemalloc.is_tracing()
+        assert not tracemalloc.is_tracing()
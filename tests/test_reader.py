@@ -0,0 +1,44 @@
+from src.neurommsig import cache
+from src.neurommsig.constants import GEO_FILE, MAPPING_FILE, PATHWAY_FILE
+from src.neurommsig.neurommsig import RCRstat
+from src.neurommsig.reader import DataReader, DataSession
+
+
+class TestReader:
+    """Tests for reader.py."""
+
+    def testDataSession(self, tmp_path):
+        """Test that analyses sharing a DataSession read each file once."""
+        cache.configure(directory=str(tmp_path))
+        try:
+            session = DataSession()
+            first = RCRstat(session)
+            second = RCRstat(session)
+
+            assert set(session.file_reads) == {GEO_FILE, PATHWAY_FILE, MAPPING_FILE}
+            assert set(session.file_reads.values()) == {1}
+            assert first._weights == second._weights
+            assert first._concs == second._concs
+
+            session.clear()
+            assert RCRstat(session)._weights == first._weights
+        finally:
+            cache.configure(directory=cache.CACHE_DIR)
+
+    def testReadGeoFile(self, tmp_path):
+        """Test for streaming a GEO top table with the regulation filter."""
+        path = tmp_path / "geo.tsv"
+        path.write_text(
+            "ID\tadj.P.Val\tlogFC\tGene.symbol\tGene.title\n"
+            "1\t0.001\t2.0\tSMAD3\tx\n"
+            "2\t0.5\t2.0\tSMAD4\tx\n"
+            "3\t0.001\t0.1\tSMAD7\tx\n"
+            "4\t0.001\t-2.0\tDAB2\tx\n"
+            "5\t0.001\t3.0\tSMAD3\tx\n"
+        )
+        gene_set = DataReader.read_geo_file(str(path), chunksize=2)
+
+        assert gene_set.columns.tolist() == ["gene_symbol", "log_fold_change", "p_value"]
+        assert gene_set.gene_symbol.tolist() == ["SMAD3", "DAB2", "SMAD3"]
+        assert gene_set.gene_symbol.cat.categories.tolist() == ["DAB2", "SMAD3"]
+        assert len(DataReader.read_geo_file(str(path), regulated_only=False)) == 5
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+from click.testing import CliRunner
+
+from src.neurommsig.cli import main
+from src.neurommsig.neurommsig import Graph
+from src.neurommsig.render import select_genes
+
+
+class TestRender:
+    """Tests for render.py."""
+
+    def testSelectGenes(self):
+        """Test for select_genes function."""
+        graph = Graph()
+        stat_table = graph.get_stat_table().to_frame()
+        genes = select_genes(graph, conc_thred=0.5, rich_thred=0.5)
+
+        expected = stat_table[(stat_table.concordance <= 0.5) & (stat_table.richness <= 0.5)]
+        assert genes == expected.gene.tolist()
+        assert select_genes(graph, genes=["SMAD2", "NOT_A_GENE"]) == ["SMAD2"]
+
+    def testExportHypNetworks(self, tmp_path):
+        """Test that HYP networks are plotted to a directory on a pool and to a PDF file."""
+        graph = Graph()
+        genes = graph.get_all_genes()[:5]
+        plotted = graph.export_hyp_networks(
+            str(tmp_path / "hyps"), genes=genes, n_workers=2, chunk_size=2
+        )
+
+        assert plotted == genes
+        assert sorted(os.listdir(tmp_path / "hyps")) == sorted(f"{gene}.png" for gene in genes)
+
+        output = tmp_path / "hyps.pdf"
+        result = CliRunner().invoke(
+            main, ["plot-hyps", "-o", str(output), "--gene", genes[0], "--gene", genes[1]]
+        )
+        assert result.exit_code == 0
+        assert output.read_bytes().count(b"/Type /Page ") == 2
+
+        with pytest.raises(ValueError):
+            graph.export_hyp_networks(str(tmp_path / "none"), genes=genes, n_workers=0)
+        result = CliRunner().invoke(main, ["plot-hyps", "-o", str(output), "-w", "0"])
+        assert result.exit_code == 2
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.neurommsig.results import StatTable, StatWriter
+
+
+def make_stat_table(contrast: str) -> StatTable:
+    """Make a small statistics table of one contrast."""
+    return StatTable(
+        {
+            "contrast": pd.Categorical([contrast] * 3),
+            "gene": pd.Categorical(["SMAD3", "DAB2", "TGFB1"]),
+            "weight": np.array([2, 0, -1]),
+            "concordance": np.array([0.123456789, np.nan, 1.0]),
+            "richness": np.array([1.23456789e-5, 0.5, 1.0]),
+        }
+    )
+
+
+class TestResults:
+    """Tests for results.py."""
+
+    def testStatTable(self):
+        """Test for StatTable class."""
+        stat_table = StatTable.concat([make_stat_table("c1"), make_stat_table("c2")])
+        frame = stat_table.to_frame()
+
+        assert len(stat_table) == 6
+        assert frame.contrast.tolist() == ["c1"] * 3 + ["c2"] * 3
+        assert frame.concordance.iloc[0] == 0.123456789
+        formatted = stat_table.to_frame(formatted=True)
+        assert formatted.concordance.tolist()[:2] == ["0.123", ""]
+        assert formatted.richness.iloc[0] == "1.23e-05"
+        with pytest.raises(ValueError):
+            StatTable({"gene": np.array(["SMAD3"]), "weight": np.array([1, 2])})
+
+    def testStatWriter(self, tmp_path):
+        """Test for streaming statistics tables to a TSV file."""
+        output = tmp_path / "stat.tsv"
+        with StatWriter(str(output), chunk_size=2) as writer:
+            writer.write(make_stat_table("c1"))
+            writer.write(make_stat_table("c2").to_frame())
+
+        frame = pd.read_csv(output, sep="\t")
+        assert writer.n_rows == 6
+        assert frame.contrast.tolist() == ["c1"] * 3 + ["c2"] * 3
+        assert frame.concordance.iloc[0] == 0.123456789
+        assert np.isnan(frame.concordance.iloc[1])
+
+    @pytest.mark.parametrize("extension", [".parquet", ".arrow"])
+    def testStatWriterArrow(self, tmp_path, extension):
+        """Test for streaming statistics tables to Parquet and Arrow files."""
+        feather = pytest.importorskip("pyarrow.feather")
+        parquet = pytest.importorskip("pyarrow.parquet")
+
+        output = str(tmp_path / f"stat{extension}")
+        stat_table = StatTable.concat([make_stat_table("c1"), make_stat_table("c2")])
+        with StatWriter(output, chunk_size=4) as writer:
+            writer.write(make_stat_table("c1"))
+            writer.write(make_stat_table("c2"))
+
+        read = parquet.read_table if extension == ".parquet" else feather.read_table
+        frame = read(output).to_pandas()
+        expected = stat_table.to_frame().astype({"contrast": str, "gene": str})
+        pd.testing.assert_frame_equal(frame, expected)
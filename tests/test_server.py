@@ -0,0 +1,154 @@
+import asyncio
+import json
+import os
+import threading
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+from src.neurommsig import cache
+from src.neurommsig.constants import GEO_FILE, MAPPING_FILE, PATHWAY_FILE
+from src.neurommsig.reader import DataSession
+from src.neurommsig.server import JobServer, KAMCache, read_contrast, read_pathways, score_batch
+
+
+async def request(port: int, method: str, path: str, body=None, length=None) -> tuple:
+    """
+    Send one HTTP request to a local server and return its status, headers and body, with the
+    Content-Length header set to the length of the body unless given.
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = b"" if body is None else json.dumps(body).encode()
+    length = len(payload) if length is None else length
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Length: {length}\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    lines = head.decode().split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:])
+    return int(lines[0].split()[1]), headers, content
+
+
+class SlowSession:
+    """Session whose networks are placeholders, loading the "slow" pathway until released."""
+
+    def __init__(self):
+        self.loads = Counter()
+        self.loading = threading.Event()
+        self.loaded = threading.Event()
+
+    def get_kam(self, path: str, *args) -> str:
+        self.loads[path] += 1
+        if path == "slow":
+            self.loading.set()
+            self.loaded.wait(timeout=10)
+        return f"kam of {path}"
+
+    def release(self, path: str):
+        pass
+
+
+class TestServer:
+    """Tests for server.py."""
+
+    def testServer(self):
+        """Test that concurrent requests are scored in one batch as they would be one by one."""
+        genes = pd.read_csv(GEO_FILE, sep="\t")[["Gene.symbol", "logFC", "adj.P.Val"]]
+        records = genes.to_dict(orient="records")
+        contrasts = [{"all": records}, {"all": records[:40], "none": []}, {"all": records[::2]}]
+        cache.configure(enabled=False)
+        # a window long enough for the concurrent requests to be parsed and batched on any machine
+        job_server = JobServer(read_pathways([PATHWAY_FILE]), n_workers=2, batch_window=0.5)
+        name = "TGF-beta_receptor_pathway"
+
+        async def main():
+            server = await job_server.start(port=0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                scores = await asyncio.gather(
+                    *[
+                        request(port, "POST", "/score", {"pathway": name, "contrasts": contrast})
+                        for contrast in contrasts
+                    ]
+                )
+                image = await request(
+                    port, "POST", "/render", {"pathway": name, "contrast": records, "format": "svg"}
+                )
+                errors = [
+                    await request(port, "POST", "/score", {"pathway": "other", "contrasts": {}}),
+                    await request(port, "POST", "/score", {"pathway": name, "contrasts": {"a": 1}}),
+                    await request(port, "GET", "/score"),
+                    await request(port, "GET", "/missing"),
+                    await request(port, "POST", "/score", {"pathway": name, "p_threshold": "low"}),
+                    await request(port, "POST", "/render", {"pathway": name, "dpi": "high"}),
+                    await request(port, "POST", "/render", {"pathway": name, "dpi": 10**6}),
+                    await request(
+                        port, "POST", "/score", {"pathway": name, "contrasts": {"a": [1]}}
+                    ),
+                    await request(port, "POST", "/render", {"pathway": name, "contrast": [None]}),
+                    await request(port, "POST", "/score", {"pathway": name}, length="-5"),
+                    await request(port, "POST", "/score", {"pathway": name}, length="many"),
+                ]
+                stats = json.loads((await request(port, "GET", "/stats"))[2])
+            finally:
+                server.close()
+                await server.wait_closed()
+            return scores, image, errors, stats
+
+        try:
+            scores, image, errors, stats = asyncio.run(main())
+        finally:
+            job_server.shutdown()
+            cache.configure(enabled=True)
+
+        kam = DataSession().get_kam(PATHWAY_FILE, MAPPING_FILE)
+        for contrast, (status, headers, content) in zip(contrasts, scores):
+            assert status == 200
+            assert headers["Content-Type"] == "application/json"
+            result = pd.DataFrame(json.loads(content)["stats"])
+            gene_sets = {key: read_contrast(value) for key, value in contrast.items()}
+            expected = score_batch(kam, gene_sets, 0.01, 0.5).astype({"contrast": str})
+            pd.testing.assert_frame_equal(result, expected.astype({"gene": str}), check_dtype=False)
+        assert image[0] == 200 and image[1]["Content-Type"] == "image/svg+xml"
+        assert image[2].lstrip().startswith(b"<?xml")
+        assert [status for status, _, _ in errors] == [400, 400, 405, 404] + [400] * 7
+        assert stats["batches"] == 1 and stats["contrasts"] == 4
+        assert stats["cache_misses"] == 1
+
+    def testKamCacheLoad(self):
+        """Test that loading a pathway neither blocks hits of others nor runs twice."""
+        session = SlowSession()
+        kams = KAMCache({"slow": "slow", "fast": "fast"}, session=session)
+        assert kams.get("fast") == "kam of fast"
+        results = []
+        loaders = [threading.Thread(target=lambda: results.append(kams.get("slow"))) for _ in "ab"]
+        for loader in loaders:
+            loader.start()
+        assert session.loading.wait(timeout=10)
+
+        hit = threading.Thread(target=lambda: results.append(kams.get("fast")))
+        hit.start()
+        hit.join(timeout=5)
+        assert not hit.is_alive() and results == ["kam of fast"]
+        session.loaded.set()
+        for loader in loaders:
+            loader.join()
+
+        assert results == ["kam of fast"] + ["kam of slow"] * 2
+        assert session.loads == {"fast": 1, "slow": 1}
+        assert kams.counts == {"hits": 2, "misses": 2}
+
+    def testWorkers(self):
+        """Test that the server runs one worker per CPU by default and rejects empty pools."""
+        pathways = read_pathways([PATHWAY_FILE])
+        job_server = JobServer(pathways)
+
+        assert job_server.n_workers == job_server.max_concurrency == (os.cpu_count() or 1)
+        for counts in ({"n_workers": 0}, {"max_concurrency": 0}, {"cache_size": 0}):
+            with pytest.raises(ValueError):
+                JobServer(pathways, **counts)
@@ -0,0 +1,57 @@
+from math import comb, factorial
+
+import numpy as np
+
+from src.neurommsig.neurommsig import RCRstat
+from src.neurommsig.stats import concordance, richness
+
+
+def original_richness(N: int, m: int, n: int, k: int) -> float:
+    """Richness as computed before it was vectorized, from factorials of Python ints."""
+    return sum(
+        (factorial(j) / (factorial(m) * factorial(m - j)))
+        * (factorial(n - j) / (factorial(N - m) * factorial(N - m - n + j)))
+        / (factorial(n) / (factorial(N) * factorial(N - n)))
+        for j in range(k, min(n, m) + 1)
+    )
+
+
+class TestStats:
+    """Tests for stats.py."""
+
+    def testConcordance(self):
+        """Test for concordance function."""
+        n, k, ambiguous, m = 10, 7, 2, 8
+        expected = sum(
+            comb(n - ambiguous, j) * 0.5 ** (n - ambiguous)
+            for j in range(k, min(n - ambiguous, m) + 1)
+        )
+        concs = concordance(n=[n, 3, 300], k=[k, 0, 250], ambiguous=[ambiguous, 0, 0], m=m + 500)
+
+        assert np.isclose(concs[0], expected, rtol=0, atol=1e-12)
+        assert np.isnan(concs[1])
+        assert 0 < concs[2] < 1e-20
+        # fewer state changes in the full network than correct nodes give an empty sum
+        assert concordance(n=[10], k=[5], ambiguous=[0], m=3)[0] == 0
+
+    def testRichness(self):
+        """Test that richness keeps the values of the original factorial sums."""
+        cases = [(50, 20, 10, 6), (50, 20, 10, 0), (20, 8, 15, 4), (30, 12, 3, 3), (60, 25, 40, 10)]
+        N, m, n, k = (np.array(x) for x in zip(*cases))
+        expected = [original_richness(*case) for case in cases]
+        richs = richness(N=N, m=m, n=n, k=k)
+
+        assert np.allclose(richs, expected, rtol=1e-12, atol=0)
+        assert np.isnan(richness(N=50, m=20, n=[2], k=[3])).all()
+        # hub nodes with degree far above 170 do not raise
+        assert (richness(N=2000, m=300, n=[500], k=[90]) > 0).all()
+
+    def testRichnessPathway(self):
+        """Test richness of every HYP network of the test pathway against the original sums."""
+        stat = RCRstat()
+        infer_table = stat._inference.get_infer_table()
+        N, m = len(infer_table), stat._context.n_regulated
+        for gene, hyp in infer_table.items():
+            n = len(hyp)
+            k = sum(node["state_change"] is not None for node in hyp.values())
+            assert np.isclose(stat._richs[gene], original_richness(N, m, n, k), rtol=1e-12, atol=0)
@@ -0,0 +1,25 @@
+import numpy as np
+
+from src.neurommsig.config import RunConfig
+from src.neurommsig.neurommsig import RCRstat
+from src.neurommsig.sweep import SweepRCRstat
+
+
+class TestSweep:
+    """Tests for sweep.py."""
+
+    def testSweepRCRstat(self):
+        """Test that a threshold sweep matches scoring each pair of thresholds."""
+        p_thresholds, fc_thresholds = [0.05, 0.001, 0.01], [1.0, 0.5]
+        stat_table = SweepRCRstat(p_thresholds, fc_thresholds).get_stat()
+
+        assert len(stat_table) == 6 * stat_table.gene.nunique()
+        for (p_thred, fc_thred), table in stat_table.groupby(["p_threshold", "fc_threshold"]):
+            stat = RCRstat(config=RunConfig(p_thred=p_thred, fc_thred=fc_thred))
+            table = table.set_index("gene")
+            assert table.weight.to_dict() == stat._weights
+            concs = table.concordance.dropna()
+            assert concs.to_dict().keys() == stat._concs.keys()
+            assert np.allclose(concs, [stat._concs[gene] for gene in concs.index])
+            richs = table.richness.dropna()
+            assert np.allclose(richs, [stat._richs[gene] for gene in richs.index])
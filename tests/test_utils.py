@@ -0,0 +1,35 @@
+import pandas as pd
+
+from src.neurommsig.reader import DataReader, regulation_masks
+from src.neurommsig.utils import make_fake_geo, make_fake_mapping, make_scale_free_pathway
+
+
+class TestUtils:
+    """Tests for utils.py."""
+
+    def testMakeScaleFreePathway(self, tmp_path):
+        """Test that synthetic pathways have distinct edges and hub genes, and read back."""
+        path = str(tmp_path / "pathway.txt")
+        pathway = make_scale_free_pathway(5000, output_path=path)
+        degrees = pd.concat([pathway[0], pathway[2]]).value_counts()
+
+        assert len(pathway) == 5000
+        assert not pathway.duplicated(subset=[0, 2]).any()
+        assert (pathway[0] != pathway[2]).all()
+        assert degrees.max() > 10 * degrees.median()
+        assert pathway.equals(make_scale_free_pathway(5000))
+        assert DataReader.read_pathway_file(path)["source"].tolist() == pathway[0].tolist()
+
+    def testMakeFakeInputs(self, tmp_path):
+        """Test that synthetic maps and GEO top tables read back in the expected formats."""
+        pathway = make_scale_free_pathway(200)
+        mapping_path, geo_path = str(tmp_path / "mapping.tsv"), str(tmp_path / "geo.tsv")
+        mapping = make_fake_mapping(pathway, output_path=mapping_path)
+        genes = sorted(set(pathway[0]) | set(pathway[2]))
+        make_fake_geo(genes, regulated_ratio=0.5, output_path=geo_path)
+
+        assert DataReader.read_mapping_file(mapping_path).equals(mapping)
+        gene_set = DataReader.read_geo_file(geo_path, regulated_only=False)
+        upregu, downregu = regulation_masks(gene_set)
+        assert len(gene_set) == len(genes)
+        assert 0 < (upregu | downregu).sum() < len(genes)
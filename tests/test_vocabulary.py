@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from src.neurommsig.constants import GEO_FILE, MAPPING_FILE, PATHWAY_FILE
+from src.neurommsig.reader import DataSession
+from src.neurommsig.vocabulary import SymbolVocabulary
+
+
+class TestVocabulary:
+    """Tests for vocabulary.py."""
+
+    def testSymbolVocabulary(self):
+        """Test for SymbolVocabulary class."""
+        vocabulary = SymbolVocabulary(["SMAD3"])
+        ids = vocabulary.encode(pd.Series(["DAB2", "SMAD3", np.nan, "DAB2"]))
+
+        assert ids.tolist() == [1, 0, -1, 1]
+        assert vocabulary.lookup(["DAB2", "TGFB1"]).tolist() == [1, -1]
+        assert vocabulary.decode(ids)[:2].tolist() == ["DAB2", "SMAD3"]
+        assert len(vocabulary) == 2
+
+        first = vocabulary.categorical(["SMAD3", "DAB2"])
+        second = vocabulary.categorical(["TGFB1", "SMAD3"])
+        assert first.codes.tolist() == [0, 1]
+        assert second.codes.tolist() == [2, 0]
+        assert first.categories.tolist() == second.categories.tolist()[:2]
+
+    def testDataSession(self):
+        """Test that the tables of a session share the ids of their gene symbols."""
+        session = DataSession()
+        gene_set = session.get_gene_set(GEO_FILE)
+        pathway_data = session.get_pathway_data(PATHWAY_FILE)
+        pathway = session.get_pathway(PATHWAY_FILE, MAPPING_FILE)
+        vocabulary = session.vocabulary
+
+        for values in (gene_set.gene_symbol, pathway_data.source, pathway.target):
+            assert values.cat.codes.tolist() == vocabulary.lookup(values.astype(object)).tolist()
+        merged = (
+            pathway_data.astype(object)
+            .merge(session.get_mapping_data(MAPPING_FILE).astype(object), how="left")[
+                ["source", "target", "relation"]
+            ]
+            .drop_duplicates()
+        )
+        assert pathway.astype(object).values.tolist() == merged.values.tolist()